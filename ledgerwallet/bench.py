@@ -0,0 +1,209 @@
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import ledgerwallet
+from ledgerwallet.client import MAX_LOAD_SIZE, LedgerClient, install_app_commands
+from ledgerwallet.manifest import AppManifest
+from ledgerwallet.simpleserver import SimpleServer
+from ledgerwallet.utils import LedgerIns, LedgerSecureIns, get_device_name, percentile
+
+BENCH_PING = "ping"
+BENCH_SECURE = "secure"
+BENCH_HANDSHAKE = "handshake"
+BENCH_LOAD = "load"
+BENCH_LIST = "list"
+BENCHMARKS = (BENCH_PING, BENCH_SECURE, BENCH_HANDSHAKE, BENCH_LOAD, BENCH_LIST)
+
+PERCENTILES = (50, 90, 99)
+
+
+class BenchResult(object):
+    """Latencies of the operations of a benchmark, in seconds.
+
+    `payload_bytes` is the amount of data carried by the operations, from
+    which the throughput is derived.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        samples: List[float],
+        payload_bytes: int = 0,
+        parameters: Optional[Dict] = None,
+    ):
+        self.name = name
+        self.samples = sorted(samples)
+        self.payload_bytes = payload_bytes
+        self.parameters = parameters or {}
+
+    @property
+    def mean(self) -> float:
+        return sum(self.samples) / len(self.samples)
+
+    def percentile(self, percent: float) -> float:
+        return percentile(self.samples, percent)
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Payload bytes per second, None for benchmarks without payload."""
+        if self.payload_bytes == 0:
+            return None
+        return self.payload_bytes / sum(self.samples)
+
+    def to_dict(self) -> Dict:
+        result = {
+            "name": self.name,
+            "parameters": self.parameters,
+            "count": len(self.samples),
+            "mean_ms": self.mean * 1000,
+        }
+        for percent in PERCENTILES:
+            result["p{}_ms".format(percent)] = self.percentile(percent) * 1000
+        result["max_ms"] = self.samples[-1] * 1000
+        result["bytes_per_s"] = self.throughput
+        return result
+
+
+def _measure(operation: Callable[[], object], count: int) -> List[float]:
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_ping(client: LedgerClient, count: int) -> BenchResult:
+    """Round-trip of a raw GET_VERSION APDU."""
+    apdu = bytes([client.cla, LedgerIns.GET_VERSION, 0, 0, 0])
+    return BenchResult(BENCH_PING, _measure(lambda: client.raw_exchange(apdu), count))
+
+
+def bench_secure(client: LedgerClient, count: int) -> BenchResult:
+    """Round-trip of a GET_VERSION APDU in the secure channel."""
+    # Open the secure channel first, it is measured by bench_handshake
+    client.apdu_secure_exchange(LedgerSecureIns.GET_VERSION)
+    return BenchResult(
+        BENCH_SECURE,
+        _measure(
+            lambda: client.apdu_secure_exchange(LedgerSecureIns.GET_VERSION), count
+        ),
+    )
+
+
+def bench_handshake(client: LedgerClient, count: int) -> BenchResult:
+    """Establishment of a secure channel.
+
+    It requires a direct connection: the secure channel of a daemon is opened
+    by the daemon, with its own key.
+    """
+    from ledgerwallet.crypto.scp import SCP
+
+    private_key = client.private_key
+    if private_key is None:
+        raise ValueError(
+            "The handshake benchmark cannot run through a daemon (use --no-daemon)"
+        )
+    secrets = []
+    with client._session_lock:
+        samples = _measure(
+            lambda: secrets.append(client.authenticate(SimpleServer(private_key))),
+            count,
+        )
+        # Keep the last channel, the previous ones have been closed by the device
+        client.scp = SCP(secrets[-1])
+    return BenchResult(BENCH_HANDSHAKE, samples)
+
+
+def bench_list(client: LedgerClient, count: int) -> BenchResult:
+    """Listing of the installed apps."""
+    apps = []
+    samples = _measure(lambda: apps.append(list(client.apps)), count)
+    return BenchResult(BENCH_LIST, samples, parameters={"apps": len(apps[-1])})
+
+
+def bench_load(
+    client: LedgerClient, app_manifest: AppManifest, load_size: int
+) -> BenchResult:
+    """LOAD APDU of the installation of an app, with a given chunk size.
+
+    The app is installed, then deleted. It must not be already installed.
+    """
+    if not 0 < load_size <= MAX_LOAD_SIZE:
+        raise ValueError(
+            "LOAD chunks must be of 1 to {} bytes, not {}".format(
+                MAX_LOAD_SIZE, load_size
+            )
+        )
+    if any(app.name == app_manifest.app_name for app in client.apps):
+        raise ValueError(
+            "{} is already installed, the benchmark would delete it".format(
+                app_manifest.app_name
+            )
+        )
+    target_id = client.get_version_info().target_id
+    app_manifest.assert_compatible_device(target_id)
+    samples = []
+    payload_bytes = 0
+    try:
+        for ins, data in install_app_commands(app_manifest, str(target_id), load_size):
+            start = time.perf_counter()
+            client.apdu_secure_exchange(ins, data)
+            if ins == LedgerSecureIns.LOAD:
+                samples.append(time.perf_counter() - start)
+                # Data is prefixed by its offset
+                payload_bytes += len(data) - 2
+    finally:
+        if any(app.name == app_manifest.app_name for app in client.apps):
+            client.delete_app(app_manifest.app_name)
+    return BenchResult(
+        BENCH_LOAD, samples, payload_bytes, parameters={"load_size": load_size}
+    )
+
+
+def run_benchmarks(
+    client: LedgerClient,
+    benchmarks: Sequence[str] = BENCHMARKS,
+    count: int = 20,
+    app_manifest: Optional[AppManifest] = None,
+    load_sizes: Sequence[int] = (),
+) -> List[BenchResult]:
+    """Run benchmarks against a device.
+
+    The load benchmark needs an app manifest, and runs once per load size (by
+    default, the maximum size supported by the device).
+    """
+    results = []
+    for name in benchmarks:
+        if name == BENCH_PING:
+            results.append(bench_ping(client, count))
+        elif name == BENCH_SECURE:
+            results.append(bench_secure(client, count))
+        elif name == BENCH_HANDSHAKE:
+            results.append(bench_handshake(client, count))
+        elif name == BENCH_LIST:
+            results.append(bench_list(client, count))
+        elif name == BENCH_LOAD:
+            if app_manifest is None:
+                raise ValueError("The load benchmark requires an app manifest")
+            for load_size in load_sizes or [client.capabilities.max_load_size]:
+                results.append(bench_load(client, app_manifest, load_size))
+        else:
+            raise ValueError("Unknown benchmark: {}".format(name))
+    return results
+
+
+def bench_report(client: LedgerClient, results: List[BenchResult]) -> Dict:
+    """JSON-serializable report of benchmark results."""
+    version_info = client.get_version_info()
+    device = getattr(client, "device", None)
+    return {
+        "ledgerwallet": ledgerwallet.__version__,
+        "device": {
+            "name": get_device_name(version_info.target_id),
+            "target_id": "{:#010x}".format(version_info.target_id),
+            "se_version": version_info.se_version,
+            "transport": type(device).__name__ if device is not None else "daemon",
+        },
+        "results": [result.to_dict() for result in results],
+    }
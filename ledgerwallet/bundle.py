@@ -0,0 +1,133 @@
+import mmap
+import struct
+from typing import Iterator, Tuple
+
+from ledgerwallet.capabilities import DEFAULT_LOAD_SIZE
+from ledgerwallet.client import MAX_LOAD_SIZE, LedgerClient, install_app_commands
+from ledgerwallet.manifest import AppManifest
+from ledgerwallet.transport.dump import DUMP_BUFFER_SIZE
+from ledgerwallet.utils import LedgerSecureIns, get_device_name, serialize
+
+BUNDLE_MAGIC = b"LWBUNDLE"
+BUNDLE_VERSION = 1
+
+# Version, target ID, size of LOAD chunks, followed by the app name
+BUNDLE_HEADER = struct.Struct(">BIH")
+# INS, length of the data
+COMMAND_HEADER = struct.Struct(">BH")
+
+
+class BundleFormatError(Exception):
+    pass
+
+
+def build_bundle(
+    app_manifest: AppManifest,
+    target_id: str,
+    filename: str,
+    load_size: int = DEFAULT_LOAD_SIZE,
+):
+    """Compile the installation of an app on a target into a bundle.
+
+    A bundle holds the secure commands of the installation (CREATE_APP, then
+    SET_LOAD_OFFSET and LOAD chunks, which include the app parameters, and
+    COMMIT), ready to be sent in the secure channel. LOAD chunks are of
+    `load_size` bytes, up to MAX_LOAD_SIZE.
+    """
+    if not 0 < load_size <= MAX_LOAD_SIZE:
+        raise ValueError(
+            "LOAD chunks must be of 1 to {} bytes, not {}".format(
+                MAX_LOAD_SIZE, load_size
+            )
+        )
+    # Use the target ID as written in the manifest, which may be a section key
+    devices = {int(device, 16): device for device in app_manifest.get_target_ids()}
+    device = devices.get(int(target_id, 16))
+    if device is None:
+        raise ValueError(
+            "Manifest has no installation information about {}".format(
+                get_device_name(int(target_id, 16))
+            )
+        )
+    commands = install_app_commands(app_manifest, device, load_size)
+    with open(filename, "wb", buffering=DUMP_BUFFER_SIZE) as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(BUNDLE_HEADER.pack(BUNDLE_VERSION, int(target_id, 16), load_size))
+        f.write(serialize(app_manifest.app_name.encode()))
+        for ins, data in commands:
+            f.write(COMMAND_HEADER.pack(ins, len(data)) + data)
+
+
+class Bundle(object):
+    """Installation bundle, memory-mapped."""
+
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            try:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise BundleFormatError("Empty bundle")
+
+        try:
+            offset = len(BUNDLE_MAGIC)
+            if self.buffer[:offset] != BUNDLE_MAGIC:
+                raise BundleFormatError("Not an installation bundle")
+            version, self.target_id, self.load_size = BUNDLE_HEADER.unpack_from(
+                self.buffer, offset
+            )
+            if version != BUNDLE_VERSION:
+                raise BundleFormatError("Unsupported bundle version {}".format(version))
+            offset += BUNDLE_HEADER.size
+            name_length = self.buffer[offset]
+            self.app_name = self.buffer[offset + 1 : offset + 1 + name_length].decode()
+            self._commands_offset = offset + 1 + name_length
+        except (struct.error, IndexError, UnicodeDecodeError):
+            self.close()
+            raise BundleFormatError("Truncated bundle")
+        except BundleFormatError:
+            self.close()
+            raise
+
+    def commands(self) -> Iterator[Tuple[int, bytes]]:
+        offset = self._commands_offset
+        end = len(self.buffer)
+        while offset < end:
+            if offset + COMMAND_HEADER.size > end:
+                raise BundleFormatError("Truncated bundle")
+            ins, length = COMMAND_HEADER.unpack_from(self.buffer, offset)
+            offset += COMMAND_HEADER.size
+            if offset + length > end:
+                raise BundleFormatError("Truncated bundle")
+            yield ins, self.buffer[offset : offset + length]
+            offset += length
+
+    def load_bytes(self) -> int:
+        return sum(
+            len(data) for ins, data in self.commands() if ins == LedgerSecureIns.LOAD
+        )
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def install_bundle(client: LedgerClient, bundle: Bundle):
+    version_info = client.get_version_info()
+    if version_info.target_id != bundle.target_id:
+        raise ValueError(
+            "Bundle has been built for {}, not for the current device: {}".format(
+                get_device_name(bundle.target_id),
+                get_device_name(version_info.target_id),
+            )
+        )
+    if bundle.load_size > MAX_LOAD_SIZE:
+        raise ValueError(
+            "Bundle LOAD chunks of {} bytes do not fit in a secure APDU (max {})"
+            .format(bundle.load_size, MAX_LOAD_SIZE)
+        )
+    client.run_secure_commands(bundle.commands())
@@ -0,0 +1,86 @@
+from typing import Dict, Optional
+
+from ledgerwallet.utils import DeviceNames, get_device_name
+
+# Maximum size of the data field of a short APDU
+MAX_APDU_DATA_SIZE = 0xFF
+# Size of the data loaded by each LOAD APDU during app install
+DEFAULT_LOAD_SIZE = 0x80
+
+
+def supports_scp_v2(target_id: int) -> bool:
+    return target_id & 0xF >= 2
+
+
+def supports_custom_scp(target_id: int) -> bool:
+    # Custom secure channels cannot be established on Nano X: operations which
+    # need one (such as listing apps) must go through a remote server.
+    return get_device_name(target_id) != DeviceNames.LEDGER_NANO_X.value
+
+
+def supports_api_level(target_id: int) -> bool:
+    """Return True if CREATE_APP is prefixed by the API level of the app."""
+    return get_device_name(target_id) == DeviceNames.LEDGER_NANO_SP.value
+
+
+class DeviceCapabilities(object):
+    """What a device supports, as far as the host needs to know.
+
+    Capabilities are derived once from the GET_VERSION response (and a timed
+    round-trip) and can be persisted, so that later runs do not need to
+    rediscover them.
+
+    APDU and LOAD sizes are not probed: the dashboard has no command reporting
+    them, and probing with oversized LOAD APDU would require installing an
+    app. They default to the limits all devices accept.
+    """
+
+    def __init__(
+        self,
+        target_id: int,
+        scp_v2: bool,
+        custom_scp: bool,
+        custom_ca: bool,
+        api_level: bool,
+        max_apdu_size: int = MAX_APDU_DATA_SIZE,
+        max_load_size: int = DEFAULT_LOAD_SIZE,
+        rtt: Optional[float] = None,
+    ):
+        self.target_id = target_id
+        self.scp_v2 = scp_v2
+        self.custom_scp = custom_scp
+        self.custom_ca = custom_ca
+        self.api_level = api_level
+        self.max_apdu_size = max_apdu_size
+        self.max_load_size = max_load_size
+        self.rtt = rtt
+
+    @classmethod
+    def from_version_info(
+        cls, version_info, rtt: Optional[float] = None
+    ) -> "DeviceCapabilities":
+        target_id = int(version_info.target_id)
+        return cls(
+            target_id,
+            scp_v2=supports_scp_v2(target_id),
+            custom_scp=supports_custom_scp(target_id),
+            custom_ca=bool(version_info.flags.get("trust_custom_ca", False)),
+            api_level=supports_api_level(target_id),
+            rtt=rtt,
+        )
+
+    @classmethod
+    def from_dict(cls, capabilities: Dict) -> "DeviceCapabilities":
+        return cls(**capabilities)
+
+    def to_dict(self) -> Dict:
+        return {
+            "target_id": self.target_id,
+            "scp_v2": self.scp_v2,
+            "custom_scp": self.custom_scp,
+            "custom_ca": self.custom_ca,
+            "api_level": self.api_level,
+            "max_apdu_size": self.max_apdu_size,
+            "max_load_size": self.max_load_size,
+            "rtt": self.rtt,
+        }
@@ -1,6 +1,10 @@
+import functools
 import logging
 import struct
-from typing import Optional, Union
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Tuple, Union
 
 from construct import (
     Bytes,
@@ -15,22 +19,38 @@ from construct import (
     len_,
     this,
 )
-from intelhex import IntelHex
 
+from ledgerwallet.capabilities import DeviceCapabilities
+from ledgerwallet.concurrency import Priority, PriorityLock
 from ledgerwallet.crypto.ecc import PrivateKey
-from ledgerwallet.crypto.scp import SCP, FakeSCP
 from ledgerwallet.hsmscript import HsmScript
-from ledgerwallet.hsmserver import HsmServer
 from ledgerwallet.ledgerserver import LedgerServer
 from ledgerwallet.manifest import AppManifest
-from ledgerwallet.proto.listApps_pb2 import AppList
+from ledgerwallet.metrics import ExchangeObserver, SecureExchange
 from ledgerwallet.simpleserver import SimpleServer
-from ledgerwallet.transport import FileDevice, enumerate_devices
-from ledgerwallet.utils import LedgerIns, LedgerSecureIns, VersionInfo, serialize
+from ledgerwallet.tracing import span, traced
+from ledgerwallet.transport import FileDevice, enumerate_devices, lock_device
+from ledgerwallet.utils import (
+    LedgerIns,
+    LedgerSecureIns,
+    compiled,
+    parse_version_info,
+    serialize,
+)
+
+if TYPE_CHECKING:
+    from intelhex import IntelHex
+
+    from ledgerwallet.crypto.scp import SCP, FakeSCP
+    from ledgerwallet.hsmserver import HsmServer
 
 LOAD_SEGMENT_CHUNK_HEADER_LENGTH = 3
 MIN_PADDING_LENGTH = 1
 SCP_MAC_LENGTH = 0xE
+# Largest LOAD chunk whose secure APDU (INS, offset, padding and MAC) fits
+MAX_LOAD_SIZE = (
+    0xF0 - LOAD_SEGMENT_CHUNK_HEADER_LENGTH - MIN_PADDING_LENGTH - SCP_MAC_LENGTH
+)
 
 MAX_CHUNK_SIZE = (
     0x10000  # Maximum size of a chunk that can be loaded at once during app install
@@ -57,6 +77,8 @@ ApduListAppsResponse = Struct(
 
 
 class AppInfo(object):
+    __slots__ = ("name", "flags", "code_data_hash", "full_hash", "data")
+
     def __init__(
         self,
         name: str,
@@ -73,6 +95,14 @@ class AppInfo(object):
 
 
 class MemoryInfo:
+    __slots__ = (
+        "system_size",
+        "applications_size",
+        "free_size",
+        "used_app_slots",
+        "num_app_slots",
+    )
+
     def __init__(
         self,
         system_size: int,
@@ -106,34 +136,217 @@ class NoLedgerDeviceException(Exception):
 LOG = logging.getLogger("ledgerwallet")
 
 
+def _in_session(method):
+    """Run a method while holding the secure channel of the client.
+
+    Secure channel state (SCP IV chains, authentication in progress) must not be
+    touched by other threads until the whole exchange sequence is over.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._session_lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _remote_server(script: HsmScript, url: str) -> "HsmServer":
+    # requests and the protobuf modules are only needed by remote commands
+    from ledgerwallet.hsmserver import HsmServer
+
+    return HsmServer(script, url)
+
+
+def _load_chunk_commands(
+    hex_file: "IntelHex", segment, offset: int, max_load_size: int
+) -> Iterator[Tuple[int, bytes]]:
+    start_addr, end_addr = segment
+    segment_load_address = start_addr - hex_file.minaddr()
+
+    yield (
+        LedgerSecureIns.SET_LOAD_OFFSET,
+        struct.pack(">I", segment_load_address + offset),
+    )
+
+    load_size = min(end_addr - start_addr - offset, MAX_CHUNK_SIZE)
+    # max_load_size = 0xf0 - LOAD_SEGMENT_CHUNK_HEADER_LENGTH - MIN_PADDING_LENGTH - SCP_MAC_LENGTH # noqa
+
+    load_address = start_addr + offset
+    chunk_offset = start_addr
+    while load_size > 0:
+        chunk_size = min(load_size, max_load_size)
+        data = hex_file.gets(load_address, chunk_size)
+        data = struct.pack(">H", chunk_offset - start_addr) + data
+
+        yield LedgerSecureIns.LOAD, data
+        load_address += chunk_size
+        chunk_offset += chunk_size
+        load_size -= chunk_size
+
+
+def install_app_commands(
+    app_manifest: AppManifest, device: str, max_load_size: int
+) -> Iterator[Tuple[int, bytes]]:
+    """Secure commands installing an app, as (INS, data) tuples.
+
+    They are built lazily, while previous ones are being exchanged.
+    """
+    from intelhex import IntelHex
+
+    hex_file = IntelHex(app_manifest.get_binary(device))
+    code_length = hex_file.maxaddr() - hex_file.minaddr() + 1
+    data_length = app_manifest.data_size(device)
+
+    code_length -= data_length
+    assert code_length % 64 == 0  # code length must be aligned
+
+    flags = app_manifest.get_application_flags(device)  # not handled yet
+
+    params = app_manifest.serialize_parameters(device)
+    main_address = hex_file.start_addr["EIP"] - hex_file.minaddr()
+
+    level = app_manifest.get_api_level(device)
+    if level is not None:
+        data = struct.pack(
+            ">BIIIII",
+            level,
+            code_length,
+            data_length,
+            len(params),
+            flags,
+            main_address,
+        )
+    else:
+        data = struct.pack(
+            ">IIIII", code_length, data_length, len(params), flags, main_address
+        )
+    yield LedgerSecureIns.CREATE_APP, data
+
+    hex_file.puts(hex_file.maxaddr() + 1, params)
+    for segment in hex_file.segments():
+        start_addr, end_addr = segment
+        # Load each segment by chunks of 64kB
+        for offset in range(0, end_addr - start_addr, MAX_CHUNK_SIZE):
+            yield from _load_chunk_commands(hex_file, segment, offset, max_load_size)
+    yield LedgerSecureIns.COMMIT, b""
+
+
 class LedgerClient(object):
-    def __init__(self, device=None, cla=0xE0, private_key=None):
-        self.scp = None
+    # Notified of each exchanged APDU, see add_observer
+    _observers: Tuple[ExchangeObserver, ...] = ()
+    # Key of the host in the secure channel, None when the channel is not
+    # established by this client
+    private_key: Optional[PrivateKey]
+
+    def __init__(
+        self,
+        device=None,
+        cla=0xE0,
+        private_key=None,
+        target_id=None,
+        capabilities: Optional[DeviceCapabilities] = None,
+        lock: bool = True,
+        lock_timeout: Optional[float] = None,
+    ):
+        self.scp: Optional[Union["SCP", "FakeSCP"]] = None
         if device is None:
             devices = enumerate_devices()
             if len(devices) == 0:
                 raise NoLedgerDeviceException("No Ledger device has been found.")
             device = devices[0]
         elif type(device) == FileDevice:
+            from ledgerwallet.crypto.scp import FakeSCP
+
             self.scp = FakeSCP()
 
         self.device = device
         self.cla = cla
-        self._target_id = None
+        self._init_locks()
+        # May be seeded with a cached value to avoid a GET_VERSION round-trip
+        self._target_id = target_id
+        self._capabilities = capabilities
+        if capabilities is not None and target_id is None:
+            self._target_id = capabilities.target_id
         if private_key is None:
             self.private_key = PrivateKey()
         else:
             self.private_key = PrivateKey(private_key)
-        self.device.open()
+
+        # Prevent other processes from interleaving their APDUs with ours
+        self.lock = lock_device(self.device, lock_timeout) if lock else None
+        try:
+            self.device.open()
+        except BaseException:
+            self.release_lock()
+            raise
+
+    def _init_locks(self):
+        # Serializes device I/O, one APDU at a time
+        self._io_lock = PriorityLock()
+        # Held during secure channel operations, which span several APDUs
+        self._session_lock = threading.RLock()
+        self._lane = threading.local()
+
+    @contextmanager
+    def priority(self, priority: Priority):
+        """Exchange APDUs of the current thread with the given priority."""
+        previous = getattr(self._lane, "priority", Priority.NORMAL)
+        self._lane.priority = priority
+        try:
+            yield
+        finally:
+            self._lane.priority = previous
+
+    def release_lock(self):
+        if self.lock is not None:
+            self.lock.release()
 
     def close(self):
         self.device.close()
+        self.release_lock()
+
+    def add_observer(self, observer: ExchangeObserver):
+        """Notify an observer of the APDUs exchanged from now on.
+
+        Exchanges are only timed while an observer is registered.
+        """
+        self._observers = self._observers + (observer,)
+
+    def remove_observer(self, observer: ExchangeObserver):
+        self._observers = tuple(o for o in self._observers if o is not observer)
+
+    def _observe_exchange(
+        self, exchange: Callable[[bytes], bytes], data: bytes
+    ) -> bytes:
+        start = time.perf_counter()
+        try:
+            output_data = exchange(data)
+        except Exception as e:
+            duration = time.perf_counter() - start
+            for observer in self._observers:
+                observer.on_exchange_error(data, e, duration)
+            raise
+        duration = time.perf_counter() - start
+        for observer in self._observers:
+            observer.on_exchange(data, output_data, duration)
+        return output_data
+
+    def _notify_secure_exchange(self, exchange: SecureExchange):
+        for observer in self._observers:
+            observer.on_secure_exchange(exchange)
 
     def raw_exchange(self, data: bytes) -> bytes:
-        LOG.debug("=> " + data.hex())
-        output_data = bytes(self.device.exchange(data))
-        if len(output_data) > 0:
-            LOG.debug("<= " + output_data.hex())
+        with self._io_lock.hold(getattr(self._lane, "priority", Priority.NORMAL)):
+            LOG.debug("=> " + data.hex())
+            if self._observers:
+                output_data = self._observe_exchange(
+                    lambda data: bytes(self.device.exchange(data)), data
+                )
+            else:
+                output_data = bytes(self.device.exchange(data))
+            if len(output_data) > 0:
+                LOG.debug("<= " + output_data.hex())
         return output_data
 
     def apdu_exchange(self, ins, data=b"", p1=0, p2=0):
@@ -168,124 +381,148 @@ class LedgerClient(object):
 
         return response[:-2]
 
+    @_in_session
     def apdu_secure_exchange(self, ins, data=b"", p1=0, p2=0):
         if self.scp is None:
+            # cryptography is only loaded when a secure channel is needed
+            from ledgerwallet.crypto.scp import SCP
+
+            if self.private_key is None:
+                raise ValueError("A private key is required to open a secure channel")
             server = SimpleServer(self.private_key)
             secret = self.authenticate(server)
             self.scp = SCP(secret)
 
-        data = self.apdu_exchange(
-            LedgerIns.SECUINS, self.scp.wrap(bytes([ins]) + data), p1, p2
+        if not self._observers:
+            data = self.apdu_exchange(
+                LedgerIns.SECUINS, self.scp.wrap(bytes([ins]) + data), p1, p2
+            )
+            return self.scp.unwrap(data)
+
+        start = time.perf_counter()
+        command = bytes([ins]) + data
+        wrapped_command = self.scp.wrap(command)
+        try:
+            response = self.apdu_exchange(LedgerIns.SECUINS, wrapped_command, p1, p2)
+        except CommException as e:
+            self._notify_secure_exchange(
+                SecureExchange(
+                    ins,
+                    len(command),
+                    len(wrapped_command),
+                    0,
+                    0,
+                    e.sw,
+                    time.perf_counter() - start,
+                )
+            )
+            raise
+        output_data = self.scp.unwrap(response)
+        self._notify_secure_exchange(
+            SecureExchange(
+                ins,
+                len(command),
+                len(wrapped_command),
+                len(output_data),
+                len(response),
+                0x9000,
+                time.perf_counter() - start,
+            )
         )
-        return self.scp.unwrap(data)
+        return output_data
 
+    @traced("authenticate")
+    @_in_session
     def authenticate(self, server: LedgerServer):
-        self.reset()
-        if self.target_id & 0xF < 2:
-            raise Exception("Target ID does not support SCP V2")
+        with span("authenticate.reset"):
+            self.reset()
+            if not self.capabilities.scp_v2:
+                raise Exception("Target ID does not support SCP V2")
 
         # Exchange nonce
-        server_nonce = server.get_nonce()
-        data = self.apdu_exchange(LedgerIns.INITIALIZE_AUTHENTICATION, server_nonce)
-        device_nonce = data[4:12]
-        server.send_nonce(device_nonce)
+        with span("authenticate.nonce"):
+            server_nonce = server.get_nonce()
+            data = self.apdu_exchange(LedgerIns.INITIALIZE_AUTHENTICATION, server_nonce)
+            device_nonce = data[4:12]
+            server.send_nonce(device_nonce)
 
         # Get server certificate chain
-        server_chain = server.receive_certificate_chain()
-        for i in range(len(server_chain)):
-            if i == len(server_chain) - 1:
-                self.apdu_exchange(
-                    LedgerIns.VALIDATE_CERTIFICATE, server_chain[i], p1=0x80
-                )
-            else:
-                self.apdu_exchange(LedgerIns.VALIDATE_CERTIFICATE, server_chain[i])
+        with span("authenticate.server_certificates"):
+            server_chain = server.receive_certificate_chain()
+            for i in range(len(server_chain)):
+                if i == len(server_chain) - 1:
+                    self.apdu_exchange(
+                        LedgerIns.VALIDATE_CERTIFICATE, server_chain[i], p1=0x80
+                    )
+                else:
+                    self.apdu_exchange(LedgerIns.VALIDATE_CERTIFICATE, server_chain[i])
 
         # Walk the client chain
-        client_chain = []
-        for i in range(2):
-            if i == 0:
-                certificate = self.apdu_exchange(LedgerIns.GET_CERTIFICATE)
-            else:
-                certificate = self.apdu_exchange(LedgerIns.GET_CERTIFICATE, p1=0x80)
-            if len(certificate) == 0:
-                break
-            client_chain.append(certificate)
-        server.send_certificate_chain(client_chain)
+        with span("authenticate.device_certificates"):
+            client_chain = []
+            for i in range(2):
+                if i == 0:
+                    certificate = self.apdu_exchange(LedgerIns.GET_CERTIFICATE)
+                else:
+                    certificate = self.apdu_exchange(LedgerIns.GET_CERTIFICATE, p1=0x80)
+                if len(certificate) == 0:
+                    break
+                client_chain.append(certificate)
+            server.send_certificate_chain(client_chain)
 
         # Mutual authentication done, retrieve shared secret
-        self.apdu_exchange(LedgerIns.MUTUAL_AUTHENTICATE)
-        return server.get_shared_secret()
-
-    def _load_chunk(self, hex_file: IntelHex, segment, offset: int):
-        start_addr, end_addr = segment
-        segment_load_address = start_addr - hex_file.minaddr()
-
-        self.apdu_secure_exchange(
-            LedgerSecureIns.SET_LOAD_OFFSET,
-            struct.pack(">I", segment_load_address + offset),
-        )
-
-        load_size = min(end_addr - start_addr - offset, MAX_CHUNK_SIZE)
-        # max_load_size = 0xf0 - LOAD_SEGMENT_CHUNK_HEADER_LENGTH - MIN_PADDING_LENGTH - SCP_MAC_LENGTH # noqa
-        max_load_size = 0x80
-
-        load_address = start_addr + offset
-        chunk_offset = start_addr
-        while load_size > 0:
-            chunk_size = min(load_size, max_load_size)
-            data = hex_file.gets(load_address, chunk_size)
-            data = struct.pack(">H", chunk_offset - start_addr) + data
+        with span("authenticate.mutual_authenticate"):
+            self.apdu_exchange(LedgerIns.MUTUAL_AUTHENTICATE)
+            return server.get_shared_secret()
 
-            self.apdu_secure_exchange(LedgerSecureIns.LOAD, data)
-            load_address += chunk_size
-            chunk_offset += chunk_size
-            load_size -= chunk_size
-
-    def _load_segment(self, hex_file: IntelHex, segment):
-        start_addr, end_addr = segment
-        # Load each segment by chunks of 64kB
-        for offset in range(0, end_addr - start_addr, MAX_CHUNK_SIZE):
-            self._load_chunk(hex_file, segment, offset)
+    @_in_session
+    def run_secure_commands(self, commands: Iterable[Tuple[int, bytes]]):
+        """Exchange a sequence of (INS, data) commands in the secure channel."""
+        for ins, data in commands:
+            self.apdu_secure_exchange(ins, data)
 
+    @_in_session
     def install_app(self, app_manifest: AppManifest):
-        version_info = self.get_version_info()
-        device = str(version_info.target_id)
-
-        app_manifest.assert_compatible_device(version_info.target_id)
-
-        hex_file = IntelHex(app_manifest.get_binary(device))
-        code_length = hex_file.maxaddr() - hex_file.minaddr() + 1
-        data_length = app_manifest.data_size(device)
-
-        code_length -= data_length
-        assert code_length % 64 == 0  # code length must be aligned
-
-        flags = app_manifest.get_application_flags(device)  # not handled yet
-
-        params = app_manifest.serialize_parameters(device)
-        main_address = hex_file.start_addr["EIP"] - hex_file.minaddr()
-
-        level = app_manifest.get_api_level(device)
-        if level is not None:
-            data = struct.pack(
-                ">BIIIII",
-                level,
-                code_length,
-                data_length,
-                len(params),
-                flags,
-                main_address,
+        with span("install_app", app=app_manifest.app_name):
+            version_info = self.get_version_info()
+            app_manifest.assert_compatible_device(version_info.target_id)
+            commands = install_app_commands(
+                app_manifest,
+                str(version_info.target_id),
+                self.capabilities.max_load_size,
             )
-        else:
-            data = struct.pack(
-                ">IIIII", code_length, data_length, len(params), flags, main_address
-            )
-        self.apdu_secure_exchange(LedgerSecureIns.CREATE_APP, data)
-
-        hex_file.puts(hex_file.maxaddr() + 1, params)
-        for segment in hex_file.segments():
-            self._load_segment(hex_file, segment)
-        self.apdu_secure_exchange(LedgerSecureIns.COMMIT)
+            # Commands are built lazily: the binary, parameters and icons are
+            # processed when the first one is requested
+            with span("install_app.prepare"):
+                ins, data = next(commands)
+            with span("install_app.create_app"):
+                self.apdu_secure_exchange(ins, data)
+
+            # Each segment (or 64 kB chunk of a segment) starts with a
+            # SET_LOAD_OFFSET command
+            segment = None
+            try:
+                for ins, data in commands:
+                    if ins in (
+                        LedgerSecureIns.SET_LOAD_OFFSET,
+                        LedgerSecureIns.COMMIT,
+                    ):
+                        if segment is not None:
+                            segment.end()
+                        if ins == LedgerSecureIns.SET_LOAD_OFFSET:
+                            segment = span(
+                                "install_app.segment",
+                                offset=struct.unpack(">I", data)[0],
+                            )
+                        else:
+                            segment = span("install_app.commit")
+                    self.apdu_secure_exchange(ins, data)
+            except BaseException as e:
+                if segment is not None:
+                    segment.end(e)
+                raise
+            if segment is not None:
+                segment.end()
 
     def delete_app(self, app: Union[str, bytes]):
         if isinstance(app, str):
@@ -297,11 +534,12 @@ class LedgerClient(object):
         else:
             raise TypeError("app parameter must be string or digest")
 
+    @_in_session
     def install_remote_app(
         self, app_path, key_path, url=LEDGER_HSM_URL, key=LEDGER_HSM_KEY
     ):
         script = HsmScript("distributeFirmware11", {"persoKey": key, "scpv2": "dummy"})
-        server = HsmServer(script, url)
+        server = _remote_server(script, url)
         self.authenticate(server)
 
         application_data = server.query(
@@ -318,13 +556,15 @@ class LedgerClient(object):
     ):
         return self.install_remote_app(app_path, key_path, url, key)
 
+    @traced("upgrade_firmware")
+    @_in_session
     def upgrade_firmware(
         self, firmware_name, firmware_key, url=LEDGER_HSM_URL, key=LEDGER_HSM_KEY
     ):
         script = HsmScript(
             "distributeFirmware11_scan", {"persoKey": key, "scpv2": "dummy"}
         )
-        server = HsmServer(script, url)
+        server = _remote_server(script, url)
         self.authenticate(server)
 
         response = b""
@@ -345,9 +585,11 @@ class LedgerClient(object):
             self.raw_exchange(application_data[offset : offset + 5 + apdu_len])
             offset += 5 + apdu_len
 
+    @traced("genuine_check")
+    @_in_session
     def genuine_check(self, url=LEDGER_HSM_URL, key=LEDGER_HSM_KEY):
         script = HsmScript("checkGenuine", {"persoKey": key, "scpv2": "dummy"})
-        server = HsmServer(script, url)
+        server = _remote_server(script, url)
         self.authenticate(server)
 
         client_data = b""
@@ -360,9 +602,10 @@ class LedgerClient(object):
         # custom_ca = client_data[1]
         return True
 
+    @_in_session
     def endorse(self, key_id: int, url=LEDGER_HSM_URL, key=LEDGER_HSM_KEY):
         script = HsmScript("signEndorsement", {"persoKey": key})
-        server = HsmServer(script, url)
+        server = _remote_server(script, url)
         self.authenticate(server)
         server.query()  # Commit agreement
 
@@ -381,14 +624,19 @@ class LedgerClient(object):
         return self.apdu_secure_exchange(LedgerSecureIns.RESET_CUSTOM_CERTIFICATE)
 
     def get_version_info(self):
-        data = self.apdu_exchange(LedgerIns.GET_VERSION)
-        version_info = VersionInfo.parse(data)
+        start = time.perf_counter()
+        with self.priority(Priority.HIGH):
+            data = self.apdu_exchange(LedgerIns.GET_VERSION)
+        rtt = time.perf_counter() - start
+        version_info = parse_version_info(data)
         self._target_id = version_info.target_id
+        if self._capabilities is None:
+            self._capabilities = DeviceCapabilities.from_version_info(version_info, rtt)
         return version_info
 
     def get_version_info_secure(self):
         data = self.apdu_secure_exchange(LedgerSecureIns.GET_VERSION)
-        version_info = VersionInfo.parse(data)
+        version_info = parse_version_info(data)
         self._target_id = version_info.target_id
         return version_info
 
@@ -410,9 +658,26 @@ class LedgerClient(object):
             self.get_version_info()
         return self._target_id
 
+    def probe_capabilities(self) -> DeviceCapabilities:
+        """Rebuild the capability profile of the device, ignoring any cached one."""
+        self._capabilities = None
+        return self.capabilities
+
+    @property
+    def capabilities(self) -> DeviceCapabilities:
+        if self._capabilities is None:
+            self.get_version_info()
+        assert self._capabilities is not None
+        return self._capabilities
+
     def list_apps_remote(self, url=LEDGER_HSM_URL, key=LEDGER_HSM_KEY):
+        yield from self._list_apps_remote(url, key)
+
+    @traced("list_apps_remote")
+    @_in_session
+    def _list_apps_remote(self, url, key):
         script = HsmScript("listApps", {"persoKey": key, "scpv2": "dummy"})
-        server = HsmServer(script, url)
+        server = _remote_server(script, url)
         self.authenticate(server)
 
         application_data = server.query(params={"scpv2": "dummy"})
@@ -423,21 +688,36 @@ class LedgerClient(object):
             application_data = server.query(client_data[:-2], params={"scpv2": "dummy"})
         application_data = server.query(params={"scpv2": "dummy"})
 
+        from ledgerwallet.proto.listApps_pb2 import AppList
+
         apps = AppList()
         apps.ParseFromString(application_data)
-        for app in apps.list:
-            yield AppInfo(app.name, app.flags & 0xFFFF, app.hashCodeData, app.hash)
+        return [
+            AppInfo(app.name, app.flags & 0xFFFF, app.hashCodeData, app.hash)
+            for app in apps.list
+        ]
 
     @property
     def apps(self):
+        yield from self._list_apps()
+
+    @_in_session
+    def _list_apps(self):
+        # LIST_APPS_CONTINUE must follow LIST_APPS without any other secure APDU
+        # in between: all the pages are retrieved at once.
+        apps = []
+        list_apps_response = compiled(ApduListAppsResponse)
         data = self.apdu_secure_exchange(LedgerSecureIns.LIST_APPS)
         while len(data) != 0:
-            response = ApduListAppsResponse.parse(data)
+            response = list_apps_response.parse(data)
             for app in response.apps:
-                yield AppInfo(
-                    app.name, app.flags & 0xFFFF, app.code_data_hash, app.full_hash
+                apps.append(
+                    AppInfo(
+                        app.name, app.flags & 0xFFFF, app.code_data_hash, app.full_hash
+                    )
                 )
             data = self.apdu_secure_exchange(LedgerSecureIns.LIST_APPS_CONTINUE)
+        return apps
 
     def run_app(self, app_name: str):
         return self.apdu_exchange(LedgerIns.RUN_APP, app_name.encode())
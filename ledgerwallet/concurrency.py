@@ -0,0 +1,59 @@
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+class PriorityLock(object):
+    """Reentrant lock granted by priority, then in arrival order.
+
+    When the lock is released, the waiting thread with the highest priority
+    gets it, so that short requests are not stuck behind a long queue of
+    lower priority ones.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._owner: Optional[int] = None
+        self._count = 0
+        self._waiters: List[Tuple[int, int, int]] = []
+        self._counter = itertools.count()
+
+    def acquire(self, priority: Priority = Priority.NORMAL):
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._count += 1
+                return
+            entry = (int(priority), next(self._counter), me)
+            heapq.heappush(self._waiters, entry)
+            while self._owner is not None or self._waiters[0] is not entry:
+                self._condition.wait()
+            heapq.heappop(self._waiters)
+            self._owner = me
+            self._count = 1
+
+    def release(self):
+        with self._condition:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("cannot release un-acquired lock")
+            self._count -= 1
+            if self._count == 0:
+                self._owner = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def hold(self, priority: Priority = Priority.NORMAL):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import time
+from typing import Callable, Dict, Optional
+
+from ledgerwallet.client import CommException, LedgerClient
+from ledgerwallet.concurrency import Priority
+from ledgerwallet.metrics import SecureExchange
+from ledgerwallet.transport.device import Device
+
+DAEMON_SOCKET_FILENAME = "daemon.sock"
+
+LOG = logging.getLogger("ledgerwallet")
+
+
+class DaemonException(Exception):
+    pass
+
+
+def _encode_error(exception: Exception) -> Dict:
+    error = {"type": type(exception).__name__, "message": str(exception)}
+    if isinstance(exception, CommException):
+        error["message"] = exception.message
+        error["sw"] = exception.sw
+    return error
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                response = {"result": self.server.daemon.dispatch(request)}
+            except Exception as exception:
+                response = {"error": _encode_error(exception)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class _DaemonServer(socketserver.UnixStreamServer):
+    # Connections are served one at a time: APDUs of two commands must never
+    # be interleaved on the device.
+    pass
+
+
+def _is_listening(socket_path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+class LedgerDaemon(object):
+    """Keep a device open and its secure channel established between commands.
+
+    Commands are received as JSON lines on a Unix socket, and forwarded to a
+    LedgerClient which is only created once. Once a secure channel has been
+    established, secure APDUs from later commands reuse it and no handshake is
+    performed.
+    """
+
+    def __init__(self, client_factory: Callable[[], LedgerClient], socket_path: str):
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonException("Unix sockets are not supported on this platform")
+        self.client_factory = client_factory
+        self.socket_path = socket_path
+        self.client: Optional[LedgerClient] = None
+        self.server: Optional[_DaemonServer] = None
+
+    def get_client(self) -> LedgerClient:
+        if self.client is None:
+            self.client = self.client_factory()
+        return self.client
+
+    def drop_client(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+        self.client = None
+
+    def dispatch(self, request: Dict):
+        method = request.get("method")
+        params = request.get("params", {})
+        if method == "ping":
+            return None
+        if method == "reset_session":
+            if self.client is not None:
+                self.client.scp = None
+            return None
+        if method not in ("raw_exchange", "apdu_secure_exchange"):
+            raise DaemonException("Unknown method {}".format(method))
+
+        client = self.get_client()
+        data = bytes.fromhex(params.get("data", ""))
+        try:
+            if method == "raw_exchange":
+                response = client.raw_exchange(data)
+            else:
+                response = client.apdu_secure_exchange(
+                    params["ins"], data, params.get("p1", 0), params.get("p2", 0)
+                )
+        except CommException:
+            # The device may have dropped the secure channel
+            client.scp = None
+            raise
+        except (OSError, ValueError, AssertionError):
+            # The device has probably been disconnected (or has re-enumerated
+            # after an app has been started): open it again on next request.
+            LOG.debug("Device lost, it will be opened again")
+            self.drop_client()
+            raise
+        except Exception:
+            # Such as an invalid MAC: the secure channel cannot be trusted anymore
+            client.scp = None
+            raise
+        return response.hex()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            if _is_listening(self.socket_path):
+                raise DaemonException(
+                    "A daemon is already listening on {}".format(self.socket_path)
+                )
+            # Stale socket left by a daemon which has been killed
+            os.unlink(self.socket_path)
+        # The socket gives access to the device: only the owner may connect
+        old_umask = os.umask(0o077)
+        try:
+            self.server = _DaemonServer(self.socket_path, _DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon = self  # type: ignore[attr-defined]
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.drop_client()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class DaemonDevice(Device):
+    """Connection to a LedgerDaemon, exchanging APDUs with its device."""
+
+    def __init__(self, socket_path: str):
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonException("Unix sockets are not supported on this platform")
+        self.socket_path = socket_path
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(socket_path)
+        except OSError:
+            self.socket.close()
+            raise
+        self.stream = self.socket.makefile("rwb")
+        self.response = b""
+
+    @classmethod
+    def enumerate_devices(cls):
+        return []
+
+    def open(self):
+        pass
+
+    def call(self, method: str, **params):
+        request = {"method": method, "params": params}
+        self.stream.write(json.dumps(request).encode() + b"\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise DaemonException("Connection to the daemon has been lost")
+        response = json.loads(line)
+        if "error" in response:
+            error = response["error"]
+            if error["type"] == "CommException":
+                raise CommException(error["message"], error["sw"])
+            raise DaemonException("{}: {}".format(error["type"], error["message"]))
+        return response["result"]
+
+    def write(self, data: bytes):
+        self.response = self.exchange(data)
+
+    def read(self, timeout: int = 0) -> bytes:
+        return self.response
+
+    def exchange(self, data: bytes, timeout: int = 0) -> bytes:
+        return bytes.fromhex(self.call("raw_exchange", data=data.hex()))
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+
+class DaemonClient(LedgerClient):
+    """LedgerClient forwarding APDUs to a LedgerDaemon.
+
+    High level operations (install, list, ...) still run in the current
+    process, but each APDU costs a single local round-trip: the device is
+    already open and the daemon's secure channel is reused.
+    """
+
+    device: DaemonDevice
+
+    def __init__(self, socket_path: str, cla=0xE0):
+        # The daemon serializes the APDUs of its clients, and holds the lock
+        # of the device
+        super().__init__(DaemonDevice(socket_path), cla=cla, lock=False)
+        # The secure channel is established by the daemon, with its own key
+        self.private_key = None
+
+    def _call(self, method: str, **params):
+        with self._io_lock.hold(getattr(self._lane, "priority", Priority.NORMAL)):
+            return self.device.call(method, **params)
+
+    def _apdu_secure_exchange(self, ins, data, p1, p2) -> bytes:
+        return bytes.fromhex(
+            self._call(
+                "apdu_secure_exchange", ins=int(ins), data=data.hex(), p1=p1, p2=p2
+            )
+        )
+
+    def apdu_secure_exchange(self, ins, data=b"", p1=0, p2=0):
+        if not self._observers:
+            return self._apdu_secure_exchange(ins, data, p1, p2)
+
+        # The secure channel is held by the daemon: the size of wrapped APDU
+        # is unknown here
+        start = time.perf_counter()
+        try:
+            output_data = self._apdu_secure_exchange(ins, data, p1, p2)
+        except CommException as e:
+            self._notify_secure_exchange(
+                SecureExchange(
+                    ins, 1 + len(data), None, 0, None, e.sw, time.perf_counter() - start
+                )
+            )
+            raise
+        self._notify_secure_exchange(
+            SecureExchange(
+                ins,
+                1 + len(data),
+                None,
+                len(output_data),
+                None,
+                0x9000,
+                time.perf_counter() - start,
+            )
+        )
+        return output_data
+
+    def authenticate(self, server):
+        # A new secure channel replaces the one held by the daemon
+        self._call("reset_session")
+        return super().authenticate(server)
+
+    def ping(self):
+        self._call("ping")
@@ -5,6 +5,7 @@ import requests
 from ledgerwallet.hsmscript import HsmScript
 from ledgerwallet.ledgerserver import LedgerServer
 from ledgerwallet.proto.LedgerHSMServer_pb2 import Request, Response
+from ledgerwallet.tracing import span
 from ledgerwallet.utils import serialize
 
 
@@ -46,15 +47,17 @@ class HsmServer(LedgerServer):
         if data is not None:
             request.parameters = data
 
-        req = self.session.post(self.url, request.SerializeToString())
-        response = Response()
-        # TODO: handle errors
-        response.ParseFromString(req.content)
-
-        self.last_request_id = response.id.encode() if response.id else b""
-        if len(response.exception) != 0:
-            raise Exception(f"HSM Error: {response.exception}")
-        return response.response
+        with span("HsmServer.query", script=self.script.name) as query_span:
+            req = self.session.post(self.url, request.SerializeToString())
+            query_span.set_attribute("response_bytes", len(req.content))
+            response = Response()
+            # TODO: handle errors
+            response.ParseFromString(req.content)
+
+            self.last_request_id = response.id.encode() if response.id else b""
+            if len(response.exception) != 0:
+                raise Exception(f"HSM Error: {response.exception}")
+            return response.response
 
     def send_nonce(self, nonce: bytes):
         assert len(nonce) == 8
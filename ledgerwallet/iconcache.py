@@ -0,0 +1,176 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# Bump when the output of an icon encoder changes, to invalidate cached icons
+ICON_ENCODING_VERSION = 1
+
+DEFAULT_MAX_DISK_SIZE = 64 << 20
+DEFAULT_MEMORY_ENTRIES = 256
+
+
+def get_icon_cache_dir() -> Optional[str]:
+    """Directory of the persistent icon cache, None when it is disabled.
+
+    It is set by LEDGERWALLET_ICON_CACHE_DIR (an empty value disables it), and
+    defaults to a directory of the user cache.
+    """
+    cache_dir = os.environ.get("LEDGERWALLET_ICON_CACHE_DIR")
+    if cache_dir is None:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        cache_dir = os.path.join(base_dir, "ledgerwallet", "icons")
+    return cache_dir or None
+
+
+def icon_cache_key(
+    image: bytes, encoder: str, api_level: Optional[int], compression: str
+) -> str:
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image).digest())
+    digest.update(
+        "{}:{}:{}:{}".format(
+            ICON_ENCODING_VERSION, encoder, api_level, compression
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+class IconCache(object):
+    """Cache of converted icons, in memory and on disk.
+
+    The memory layer keeps the most recently used icons of the process. The
+    disk layer is shared between runs; once it exceeds `max_disk_size`, least
+    recently used icons are evicted.
+
+    The size of the disk layer is measured once, then estimated from the icons
+    written by this cache: the directory is only walked again to evict icons.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_disk_size: int = DEFAULT_MAX_DISK_SIZE,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ):
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key: str, value: bytes):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: bytes):
+        self._remember(key, value)
+        if self.directory is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+            with self._lock:
+                if self._disk_size is not None:
+                    self._disk_size += len(value)
+                full = self._disk_size is None or self._disk_size > self.max_disk_size
+            if full:
+                self._evict()
+        except OSError:
+            # The cache is an optimization, conversions still work without it
+            pass
+
+    def get_or_convert(self, key: str, convert: Callable[[], bytes]) -> bytes:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = convert()
+        self.put(key, value)
+        return value
+
+    def _evict(self):
+        assert self.directory is not None
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+        if total_size > self.max_disk_size:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total_size -= size
+                if total_size <= self.max_disk_size:
+                    break
+        with self._lock:
+            self._disk_size = total_size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_size = None
+        if self.directory is None:
+            return
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+
+
+_default_cache: Optional[IconCache] = None
+
+
+def get_icon_cache() -> IconCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IconCache(get_icon_cache_dir())
+    return _default_cache
@@ -1,11 +1,16 @@
 import configparser
+import hashlib
+import json
+import logging
 import os
 import re
+import shlex
 import sys
+import time
 from json import JSONDecodeError
+from typing import Any, Callable, Dict, Optional, Union
 
 import click
-from tabulate import tabulate
 
 if sys.version_info >= (3, 11):
     from tomllib import TOMLDecodeError
@@ -13,19 +18,61 @@ else:
     from toml.decoder import TomlDecodeError as TOMLDecodeError
 
 from ledgerwallet import utils
+from ledgerwallet.bench import (
+    BENCH_HANDSHAKE,
+    BENCH_LOAD,
+    BENCHMARKS,
+    bench_report,
+    run_benchmarks,
+)
+from ledgerwallet.bundle import Bundle, BundleFormatError, build_bundle, install_bundle
+from ledgerwallet.capabilities import DEFAULT_LOAD_SIZE, DeviceCapabilities
 from ledgerwallet.client import (
     LEDGER_HSM_KEY,
     LEDGER_HSM_URL,
+    MAX_LOAD_SIZE,
     CommException,
     LedgerClient,
     LedgerIns,
     NoLedgerDeviceException,
 )
 from ledgerwallet.crypto.ecc import PrivateKey
-from ledgerwallet.manifest import AppManifest
+from ledgerwallet.daemon import DAEMON_SOCKET_FILENAME, DaemonClient, LedgerDaemon
+from ledgerwallet.manifest import AppManifest, IconCompression
 from ledgerwallet.manifest_json import AppManifestJson
 from ledgerwallet.manifest_toml import AppManifestToml
-from ledgerwallet.transport import FileDevice
+from ledgerwallet.metrics import ApduMetrics, serve_prometheus, write_prometheus
+from ledgerwallet.offline import dump_install_all_targets, target_dump_filename
+from ledgerwallet.profiling import HostDeviceProfile
+from ledgerwallet.registry import (
+    REGISTRY_FILENAME,
+    DeviceNotFoundException,
+    DeviceRegistry,
+)
+from ledgerwallet.trace_analysis import analyze_file
+from ledgerwallet.tracing import TraceFormat, Tracer, set_tracer, write_trace
+from ledgerwallet.transport import (
+    DeviceLock,
+    DeviceLockTimeout,
+    FileDevice,
+    enumerate_devices,
+)
+from ledgerwallet.transport.dump import (
+    DUMP_BUFFER_SIZE,
+    DumpCompression,
+    DumpFormat,
+    DumpFormatError,
+    read_dump,
+)
+from ledgerwallet.transport.lock import describe_holder
+from ledgerwallet.transport.record import (
+    RecordingDevice,
+    ReplayDevice,
+    ReplayMismatch,
+    TraceFormatError,
+    TraceWriter,
+    read_exchanges,
+)
 
 
 class ManifestFormatError(Exception):
@@ -59,10 +106,48 @@ def remote_options(func):
     return func
 
 
-def get_private_key() -> bytes:
+_dump_options = [
+    click.option(
+        "--dump-format",
+        type=click.Choice([f.value for f in DumpFormat]),
+        default=DumpFormat.HEX.value,
+        help="Format of the offline dump: hex lines, or length-prefixed binary.",
+    ),
+    click.option(
+        "--compress",
+        type=click.Choice([c.value for c in DumpCompression]),
+        help="Compress the offline dump.",
+    ),
+]
+
+
+def dump_options(func):
+    for option in reversed(_dump_options):
+        func = option(func)
+    return func
+
+
+icon_compression_option = click.option(
+    "--icon-compression",
+    type=click.Choice([c.value for c in IconCompression]),
+    default=IconCompression.DEFAULT.value,
+    help="'max' searches the smallest compression of NBGL icons and reports savings.",
+)
+
+
+def get_app_path() -> str:
     app_path = click.get_app_dir("ledgerctl")
     if not os.path.exists(app_path):
         os.makedirs(app_path)
+    return app_path
+
+
+def get_registry() -> DeviceRegistry:
+    return DeviceRegistry(os.path.join(get_app_path(), REGISTRY_FILENAME))
+
+
+def get_private_key() -> bytes:
+    app_path = get_app_path()
 
     cfg_file = os.path.join(app_path, "config.ini")
     try:
@@ -88,42 +173,328 @@ def get_private_key() -> bytes:
     return private_key
 
 
-def get_file_device(output_file, target_id="0x33000004"):
+def load_manifest(
+    manifest: str, icon_compression: IconCompression = IconCompression.DEFAULT
+) -> AppManifest:
+    if icon_compression != IconCompression.DEFAULT:
+        # Display icon compression savings
+        logger = logging.getLogger("ledgerwallet")
+        if logger.getEffectiveLevel() > logging.INFO:
+            logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+    try:
+        app_manifest: AppManifest = AppManifestToml(manifest)
+    except TOMLDecodeError as toml_error:
+        try:
+            app_manifest = AppManifestJson(manifest)
+            click.echo(
+                "[WARNING] JSON files will be deprecated in future version", err=True
+            )
+        except JSONDecodeError as json_error:
+            raise ManifestFormatError(toml_error, json_error)
+    app_manifest.icon_compression = IconCompression(icon_compression)
+    return app_manifest
+
+
+def echo_install_error(e: CommException):
+    if e.sw == 0x6985:
+        click.echo("Operation has been canceled by the user.")
+    elif e.sw == 0x6A80:
+        click.echo("An application with the same name is already installed.")
+    elif e.sw == 0x6A81:
+        click.echo("Application is already installed.")
+    else:
+        raise e
+
+
+def get_file_device(
+    output_file, target_id="0x33000004", dump_format=DumpFormat.HEX, compression=None
+):
     try:
-        return LedgerClient(FileDevice(target_id, out=output_file))
+        return LedgerClient(
+            FileDevice(
+                target_id,
+                out=output_file,
+                dump_format=dump_format,
+                compression=compression,
+            )
+        )
     except NoLedgerDeviceException as exception:
         click.echo(exception)
         sys.exit(0)
+    except DumpFormatError as exception:
+        click.echo(exception)
+        sys.exit(1)
+
+
+def open_dump_file(filename: str):
+    try:
+        return open(filename, "wb", buffering=DUMP_BUFFER_SIZE)
+    except OSError:
+        click.echo("Unable to open file {} for dump.".format(filename))
+        sys.exit(1)
+
+
+def get_daemon_socket_path(device_label: Optional[str] = None) -> str:
+    if device_label is None:
+        filename = DAEMON_SOCKET_FILENAME
+    elif re.fullmatch(r"\w[\w.-]{0,31}", device_label, re.ASCII):
+        filename = "daemon-{}.sock".format(device_label)
+    else:
+        # Labels are free-form, but must not escape the app directory nor
+        # exceed the length limit of socket paths
+        digest = hashlib.sha256(device_label.encode()).hexdigest()[:16]
+        filename = "daemon-{}.sock".format(digest)
+    return os.path.join(get_app_path(), filename)
+
+
+def open_client(
+    device_label: Optional[str] = None,
+    lock_timeout: Optional[float] = None,
+    record: Optional[Union[str, TraceWriter]] = None,
+) -> LedgerClient:
+    kwargs: Dict[str, Any] = {}
+    relocated = None
+    if device_label is not None:
+        registry = get_registry()
+        device = registry.find_device(device_label)
+        if registry.is_relocated(device_label, device):
+            # Matched on the serial number and product shared by a whole model:
+            # cached values may belong to another device
+            relocated = device
+        else:
+            entry = registry.get(device_label)
+            kwargs.update(target_id=entry.target_id, capabilities=entry.capabilities)
+    else:
+        devices = enumerate_devices()
+        if len(devices) == 0:
+            raise NoLedgerDeviceException("No Ledger device has been found.")
+        device = devices[0]
+    if record is not None:
+        device = RecordingDevice(device, record)
+    client = LedgerClient(
+        device, private_key=get_private_key(), lock_timeout=lock_timeout, **kwargs
+    )
+    if relocated is not None:
+        assert device_label is not None
+        try:
+            registry.confirm_device(
+                device_label, relocated, client.get_version_info().target_id
+            )
+        except BaseException:
+            client.close()
+            raise
+    return client
 
 
 @click.group()
 @click.option("-v", "--verbose", is_flag=True, help="Display exchanged APDU.")
+@click.option(
+    "-d",
+    "--device",
+    "device_label",
+    envvar="LEDGERCTL_DEVICE",
+    help="Label of a registered device to use (see 'ledgerctl device').",
+)
+@click.option(
+    "--no-daemon",
+    is_flag=True,
+    help="Connect to the device directly, even if 'ledgerctl daemon' is running.",
+)
+@click.option(
+    "--lock-timeout",
+    type=float,
+    envvar="LEDGERCTL_LOCK_TIMEOUT",
+    help="Seconds to wait for a device used by another process (default: forever).",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record exchanged APDU and their timing to a trace file.",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write APDU latency metrics to a file, in the Prometheus text format.",
+)
+@click.option(
+    "--trace-spans",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the timing of operations (authentication, install, ...) to a file.",
+)
+@click.option(
+    "--trace-spans-format",
+    type=click.Choice([f.value for f in TraceFormat]),
+    default=TraceFormat.CHROME.value,
+    show_default=True,
+    help="Chrome trace event JSON (chrome://tracing, Perfetto) or OTLP/JSON.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help=(
+        "Profile the command, and report the time spent on the host and waiting "
+        "for the device."
+    ),
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True),
+    default="ledgerctl.prof",
+    show_default=True,
+    help="File of the --profile profile, in the pstats format (e.g. for snakeviz).",
+)
 @click.pass_context
-def cli(ctx, verbose):
+def cli(
+    ctx,
+    verbose,
+    device_label,
+    no_daemon,
+    lock_timeout,
+    record,
+    metrics_file,
+    trace_spans,
+    trace_spans_format,
+    profile,
+    profile_output,
+):
     if verbose:
         utils.enable_apdu_log()
 
+    # Shared by the clients of the command, and flushed when it ends
+    trace_writer = None
+    if record is not None:
+        trace_writer = TraceWriter(record)
+        ctx.call_on_close(trace_writer.close)
+    ctx.meta["trace_writer"] = trace_writer
+
+    # Registered on every client of the command
+    observers = []
+
+    if trace_spans is not None:
+        tracer = Tracer("ledgerctl")
+        set_tracer(tracer)
+        command_span = tracer.start_span(
+            "ledgerctl {}".format(ctx.invoked_subcommand or "")
+        )
+
+        def write_spans():
+            command_span.end()
+            set_tracer(None)
+            write_trace(tracer, trace_spans, TraceFormat(trace_spans_format))
+
+        ctx.call_on_close(write_spans)
+
+    metrics = None
+    if metrics_file is not None:
+        metrics = ApduMetrics()
+        observers.append(metrics)
+        ctx.call_on_close(lambda: write_prometheus(metrics, metrics_file))
+    ctx.meta["metrics"] = metrics
+    ctx.meta["observers"] = observers
+
+    if profile:
+        host_device_profile = HostDeviceProfile()
+        observers.append(host_device_profile.timer)
+
+        def write_profile():
+            host_device_profile.stop()
+            host_device_profile.dump(profile_output)
+            click.echo(host_device_profile.summary(), err=True)
+            click.echo("Profile written to {}".format(profile_output), err=True)
+
+        ctx.call_on_close(write_profile)
+        host_device_profile.start()
+
+    def connect() -> LedgerClient:
+        client: Optional[LedgerClient] = None
+        socket_path = get_daemon_socket_path(device_label)
+        # APDU can only be recorded by the process talking to the device
+        if not no_daemon and record is None and os.path.exists(socket_path):
+            try:
+                client = DaemonClient(socket_path)
+            except OSError:
+                # Stale socket left by a daemon which has been killed
+                pass
+        if client is None:
+            client = open_client(device_label, lock_timeout, trace_writer)
+        for observer in observers:
+            client.add_observer(observer)
+        return client
+
     def get_client():
         try:
-            return LedgerClient(private_key=get_private_key())
+            return connect()
+        except (DeviceNotFoundException, DeviceLockTimeout) as exception:
+            click.echo(exception)
+            sys.exit(1)
         except NoLedgerDeviceException as exception:
             click.echo(exception)
             sys.exit(0)
 
     ctx.obj = get_client
+    # Raises instead of exiting, for the shell to wait for the device
+    ctx.meta["connect"] = connect
 
 
-@cli.command(help="Send raw data to the device.")
-@click.argument("input_file", type=click.File("r"))
+@cli.command(help="Send raw data (hex or binary dump, maybe compressed) to the device.")
+@click.argument("input_file", type=click.File("rb"))
+@click.option(
+    "--keep-going",
+    is_flag=True,
+    help="Send the remaining APDU when the device returns an error status word.",
+)
+@click.option("-q", "--quiet", is_flag=True, help="Do not display the responses.")
 @click.pass_obj
-def send(get_client, input_file):
+def send(get_client, input_file, keep_going, quiet):
     client = get_client()
-    while True:
-        chunk = input_file.readline()
-        if not chunk:
-            break
-        response = client.raw_exchange(bytes.fromhex(chunk.rstrip()))
-        click.echo(response.hex())
+    count = errors = total_bytes = 0
+    rtts = []
+    start = time.perf_counter()
+    try:
+        # Transports are request/response, so APDU cannot be pipelined. The
+        # dump is streamed instead of being loaded at once.
+        for apdu in read_dump(input_file):
+            sent = time.perf_counter()
+            response = client.raw_exchange(apdu)
+            rtts.append(time.perf_counter() - sent)
+            count += 1
+            total_bytes += len(apdu) + len(response)
+            if not quiet:
+                click.echo(response.hex())
+            status_word = int.from_bytes(response[-2:], "big")
+            if status_word != 0x9000 and (status_word >> 8) != 0x61:
+                errors += 1
+                click.echo(
+                    "APDU #{} failed with status word {:04x}".format(
+                        count, status_word
+                    ),
+                    err=True,
+                )
+                if not keep_going:
+                    break
+    except DumpFormatError as exception:
+        click.echo(exception, err=True)
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - start
+    if count > 0:
+        rtts.sort()
+        click.echo(
+            "{} APDU in {:.3f}s: {:.1f} APDU/s, {:.0f} bytes/s,"
+            " RTT p50 {:.2f} ms, p99 {:.2f} ms".format(
+                count,
+                elapsed,
+                count / elapsed,
+                total_bytes / elapsed,
+                utils.percentile(rtts, 50) * 1000,
+                utils.percentile(rtts, 99) * 1000,
+            ),
+            err=True,
+        )
+    if errors > 0:
+        sys.exit(1)
 
 
 @cli.command(help="Check if device is genuine.")
@@ -141,12 +512,14 @@ def genuine_check(get_client, url, key):
 @remote_options
 @click.pass_obj
 def list_apps(get_client, remote, url, key):
+    from tabulate import tabulate
+
     client = get_client()
     rows = []
 
-    # Always list apps using a remote server on Nano X, as custom SCP channels
-    # cannot be established
-    if client.target_id == 0x33000004:
+    # Always list apps using a remote server when custom SCP channels cannot be
+    # established (Nano X)
+    if not client.capabilities.custom_scp:
         remote = True
     for app in client.list_apps_remote(url, key) if remote else client.apps:
         rows.append(
@@ -178,46 +551,78 @@ def list_apps(get_client, remote, url, key):
     is_flag=False,
     flag_value="out.apdu",
 )
+@click.option(
+    "--all-targets",
+    is_flag=True,
+    help="With --offline, dump one file per target of the manifest, in parallel.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(1),
+    help="Number of processes building dumps with --all-targets.",
+)
+@dump_options
+@icon_compression_option
 @click.pass_obj
-def install_app(get_client, manifest: AppManifest, force, offline):
-    try:
-        app_manifest: AppManifest = AppManifestToml(manifest)
-    except TOMLDecodeError as toml_error:
+def install_app(
+    get_client,
+    manifest: str,
+    force,
+    offline,
+    all_targets,
+    jobs,
+    dump_format,
+    compress,
+    icon_compression,
+):
+    app_manifest = load_manifest(manifest, icon_compression)
+
+    if all_targets:
+        if not offline:
+            click.echo("--all-targets requires --offline.")
+            sys.exit(1)
         try:
-            app_manifest = AppManifestJson(manifest)
+            dumps = dump_install_all_targets(
+                app_manifest, offline, dump_format, compress, force, jobs
+            )
+        except (OSError, DumpFormatError) as exception:
+            click.echo(exception)
+            sys.exit(1)
+        for target_id, filename in dumps.items():
             click.echo(
-                "[WARNING] JSON files will be deprecated in future version", err=True
+                "Dumped APDU installation file for {} ({}) to {}".format(
+                    utils.get_device_name(int(target_id, 16)), target_id, filename
+                )
             )
-        except JSONDecodeError as json_error:
-            raise ManifestFormatError(toml_error, json_error)
+        return
 
     try:
         if offline:
-            try:
-                dump_file = open(offline, "w")
-            except OSError:
-                click.echo("Unable to open file {} for dump.".format(offline))
-                sys.exit(1)
+            dump_file = open_dump_file(offline)
             click.echo("Dumping APDU installation file to {}".format(offline))
-            client = get_file_device(dump_file, app_manifest.target_id)
+            client = get_file_device(
+                dump_file, app_manifest.target_id, dump_format, compress
+            )
             if force:
                 client.delete_app(app_manifest.app_name)
         else:
             client = get_client()
             if force:
                 client.delete_app(app_manifest.app_name)
-                client.close()
+                # The client of a shell or a batch is shared by its commands
+                session = click.get_current_context().meta.get("shell_session")
+                if session is not None:
+                    session.disconnect()
+                else:
+                    client.close()
                 client = get_client()
         client.install_app(app_manifest)
+        if offline:
+            # Flush the dump, and the compression trailer if any
+            client.close()
     except CommException as e:
-        if e.sw == 0x6985:
-            click.echo("Operation has been canceled by the user.")
-        elif e.sw == 0x6A80:
-            click.echo("An application with the same name is already installed.")
-        elif e.sw == 0x6A81:
-            click.echo("Application is already installed.")
-        else:
-            raise
+        echo_install_error(e)
 
 
 @cli.command("remote-install", help="Install an application from a remote server.")
@@ -246,25 +651,26 @@ def install_remote_app(get_client, app_path, key_path, url, key):
     is_flag=False,
     flag_value="out_delete.apdu",
 )
+@dump_options
 @click.pass_obj
-def delete_app(get_client, app, by_hash, offline):
+def delete_app(get_client, app, by_hash, offline, dump_format, compress):
     if by_hash:
         data = bytes.fromhex(app)
     else:
         data = app
 
     if offline:
-        try:
-            dump_file = open(offline, "w")
-        except OSError:
-            click.echo("Unable to open file {} for dump.".format(offline))
-            sys.exit(1)
+        dump_file = open_dump_file(offline)
         click.echo("Dumping APDU delete command file to {}".format(offline))
-        client = get_file_device(dump_file)
+        client = get_file_device(
+            dump_file, dump_format=dump_format, compression=compress
+        )
     else:
         client = get_client()
     try:
         client.delete_app(data)
+        if offline:
+            client.close()
     except CommException as e:
         if e.sw == 0x6985:
             click.echo("Operation has been canceled by the user.")
@@ -391,6 +797,708 @@ def info(get_client):
         click.echo("Device is running in RECOVERY mode.")
 
 
+@cli.group(help="Manage the registry of known devices.")
+def device():
+    pass
+
+
+@device.command("add", help="Register the connected device under a label.")
+@click.argument("label")
+@click.option(
+    "--path",
+    help="Name of the device to register, as shown by 'ledgerctl device scan'.",
+)
+@click.pass_context
+def device_add(ctx, label, path):
+    devices = enumerate_devices()
+    if path is not None:
+        devices = [dev for dev in devices if dev.get_name() == path]
+    if len(devices) == 0:
+        click.echo("No Ledger device has been found.")
+        sys.exit(1)
+    if len(devices) > 1:
+        click.echo("Several devices are connected, select one with --path.")
+        sys.exit(1)
+
+    try:
+        client = LedgerClient(
+            devices[0], lock_timeout=ctx.find_root().params["lock_timeout"]
+        )
+    except DeviceLockTimeout as exception:
+        click.echo(exception)
+        sys.exit(1)
+    try:
+        start = time.perf_counter()
+        version_info = client.apdu_exchange(LedgerIns.GET_VERSION)
+        rtt = time.perf_counter() - start
+    finally:
+        client.close()
+    capabilities = DeviceCapabilities.from_version_info(
+        utils.parse_version_info(version_info), rtt
+    )
+    entry = get_registry().register(label, devices[0], version_info, capabilities)
+    click.echo(
+        "Registered {} ({}) as '{}'.".format(
+            utils.get_device_name(entry.target_id), entry.path, label
+        )
+    )
+
+
+@device.command("scan", help="List connected devices.")
+def device_scan():
+    for dev in enumerate_devices():
+        holder = DeviceLock(dev.get_name()).holder()
+        if holder is None:
+            click.echo(dev.get_name())
+        else:
+            click.echo(
+                "{} (in use by {})".format(dev.get_name(), describe_holder(holder))
+            )
+
+
+@device.command("list", help="List registered devices.")
+def device_list():
+    from tabulate import tabulate
+
+    rows = []
+    for entry in get_registry().list():
+        rows.append(
+            [
+                entry.label,
+                utils.get_device_name(entry.target_id) if entry.target_id else "",
+                entry.transport,
+                entry.serial_number or "",
+                entry.path,
+            ]
+        )
+    if len(rows) == 0:
+        click.echo("There is no registered device.")
+    else:
+        click.echo(tabulate(rows, ("Label", "Device", "Transport", "Serial", "Path")))
+
+
+@device.command("info", help="Display the cached profile of a registered device.")
+@click.argument("label")
+def device_info(label):
+    try:
+        entry = get_registry().get(label)
+    except DeviceNotFoundException as exception:
+        click.echo(exception)
+        sys.exit(1)
+    click.echo("Device: {} ({})".format(utils.get_device_name(entry.target_id), label))
+    click.echo("Path: {}:{}".format(entry.transport, entry.path))
+    if entry.capabilities is None:
+        click.echo("No capability profile has been cached.")
+        return
+    for name, value in entry.capabilities.to_dict().items():
+        click.echo("- {}: {}".format(name, value))
+
+
+@device.command("remove", help="Remove a device from the registry.")
+@click.argument("label")
+def device_remove(label):
+    try:
+        get_registry().remove(label)
+    except DeviceNotFoundException as exception:
+        click.echo(exception)
+        sys.exit(1)
+
+
+@cli.command(
+    help="Keep the device open and serve other ledgerctl commands from this process."
+)
+@click.option("--socket", "socket_path", help="Path of the Unix socket to listen on.")
+@click.option(
+    "--metrics-port",
+    type=int,
+    help="Serve APDU latency metrics over HTTP on this port, for Prometheus.",
+)
+@click.option(
+    "--metrics-address",
+    default="127.0.0.1",
+    show_default=True,
+    help="Address to serve metrics on.",
+)
+@click.pass_context
+def daemon(ctx, socket_path, metrics_port, metrics_address):
+    device_label = ctx.find_root().params["device_label"]
+    lock_timeout = ctx.find_root().params["lock_timeout"]
+    trace_writer = ctx.meta["trace_writer"]
+    if socket_path is None:
+        socket_path = get_daemon_socket_path(device_label)
+
+    observers = list(ctx.meta["observers"])
+    # Shared with --metrics-file, written when the daemon stops
+    metrics = ctx.meta["metrics"]
+    if metrics is None and metrics_port is not None:
+        metrics = ApduMetrics()
+        observers.append(metrics)
+
+    def client_factory() -> LedgerClient:
+        client = open_client(device_label, lock_timeout, trace_writer)
+        for observer in observers:
+            client.add_observer(observer)
+        return client
+
+    ledger_daemon = LedgerDaemon(client_factory, socket_path)
+    try:
+        # Open the device right away to report errors before serving
+        ledger_daemon.get_client()
+    except (
+        DeviceNotFoundException,
+        DeviceLockTimeout,
+        NoLedgerDeviceException,
+    ) as exception:
+        click.echo(exception)
+        sys.exit(1)
+    if metrics_port is not None:
+        try:
+            metrics_server = serve_prometheus(metrics, metrics_port, metrics_address)
+        except OSError as exception:
+            click.echo("Cannot serve metrics: {}".format(exception))
+            sys.exit(1)
+        click.echo(
+            "Serving metrics on http://{}:{}/metrics".format(
+                metrics_address, metrics_server.server_address[1]
+            )
+        )
+    click.echo("Listening on {}".format(socket_path))
+    try:
+        ledger_daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+# Commands which cannot be nested in a shell or a batch
+NOT_IN_SHELL = ("shell", "batch", "daemon")
+RECONNECT_INTERVAL = 0.5
+
+
+class ShellSession(object):
+    """Device connection shared by the commands of a shell or a batch.
+
+    `run` makes the device re-enumerate: when `reconnect_timeout` is set, the
+    connection is closed after it, and opened again by the next command,
+    waiting for the device to come back.
+    """
+
+    def __init__(self, ctx: click.Context, reconnect_timeout: Optional[float]):
+        self.open_client: Callable = ctx.obj
+        self.connect: Callable[[], LedgerClient] = ctx.meta["connect"]
+        self.reconnect_timeout = reconnect_timeout
+        self.client: Optional[LedgerClient] = None
+        self.reconnecting = False
+        ctx.meta["shell_session"] = self
+
+    def get_client(self):
+        if self.client is None:
+            if self.reconnecting:
+                self.client = self._reopen()
+                self.reconnecting = False
+            else:
+                self.client = self.open_client()
+        return self.client
+
+    def _reopen(self) -> LedgerClient:
+        assert self.reconnect_timeout is not None
+        deadline = time.monotonic() + self.reconnect_timeout
+        while True:
+            try:
+                return self.connect()
+            except (NoLedgerDeviceException, DeviceNotFoundException):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(RECONNECT_INTERVAL)
+
+    def disconnect(self, reconnect: bool = False):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+        self.reconnecting = reconnect
+
+    def after_command(self, name: str, error: Optional[Exception]):
+        if self.reconnect_timeout is None or isinstance(self.client, DaemonClient):
+            return
+        if name == "run" or isinstance(error, OSError):
+            self.disconnect(reconnect=True)
+
+
+def run_shell_command(ctx: click.Context, session: ShellSession, line: str) -> bool:
+    """Run a command line in a shell session. Return False if it failed."""
+    try:
+        args = shlex.split(line, comments=True)
+    except ValueError as exception:
+        click.echo("Invalid command line: {}".format(exception), err=True)
+        return False
+    if len(args) == 0:
+        return True
+    name, args = args[0], args[1:]
+    root = ctx.find_root()
+    command = cli.get_command(root, name)
+    if command is None:
+        click.echo("Unknown command: {}".format(name), err=True)
+        return False
+    if name in NOT_IN_SHELL:
+        click.echo("'{}' cannot be run from a shell or a batch.".format(name), err=True)
+        return False
+
+    error: Optional[Exception] = None
+    success = False
+    try:
+        with command.make_context(
+            name, args, parent=root, obj=session.get_client
+        ) as command_ctx:
+            command.invoke(command_ctx)
+        success = True
+    except click.exceptions.Exit as exit:
+        success = exit.exit_code == 0
+    except SystemExit as exit:
+        success = exit.code in (None, 0)
+    except click.ClickException as exception:
+        exception.show()
+    except click.Abort:
+        click.echo("Aborted.", err=True)
+    except CommException as exception:
+        error = exception
+        click.echo(
+            "{} (status word {:04x})".format(exception.message, exception.sw), err=True
+        )
+    except Exception as exception:
+        error = exception
+        click.echo("{}: {}".format(type(exception).__name__, exception), err=True)
+    session.after_command(name, error)
+    return success
+
+
+def echo_shell_help():
+    click.echo("Commands:")
+    for name in cli.list_commands(click.get_current_context()):
+        if name not in NOT_IN_SHELL:
+            command = cli.commands[name]
+            click.echo("  {:20} {}".format(name, command.get_short_help_str()))
+    click.echo("  {:20} {}".format("exit", "Leave the shell."))
+
+
+_reconnect_options = [
+    click.option(
+        "--reconnect",
+        is_flag=True,
+        help="Reconnect to the device after 'run' or a transport error.",
+    ),
+    click.option(
+        "--reconnect-timeout",
+        type=float,
+        default=10.0,
+        show_default=True,
+        help="Seconds to wait for the device to come back when reconnecting.",
+    ),
+]
+
+
+def reconnect_options(func):
+    for option in reversed(_reconnect_options):
+        func = option(func)
+    return func
+
+
+@cli.command(help="Run ledgerctl commands interactively, on one device connection.")
+@reconnect_options
+@click.pass_context
+def shell(ctx, reconnect, reconnect_timeout):
+    try:
+        # Line editing and history, when available
+        import readline  # noqa: F401
+    except ImportError:
+        pass
+
+    session = ShellSession(ctx, reconnect_timeout if reconnect else None)
+    try:
+        while True:
+            try:
+                line = input("ledgerctl> ")
+            except EOFError:
+                click.echo()
+                break
+            except KeyboardInterrupt:
+                click.echo()
+                continue
+            if line.strip() in ("exit", "quit"):
+                break
+            if line.strip() == "help":
+                echo_shell_help()
+                continue
+            run_shell_command(ctx, session, line)
+    finally:
+        session.disconnect()
+
+
+@cli.command(
+    help=(
+        "Run the ledgerctl commands of a file (or - for stdin), one per line,"
+        " on one device connection."
+    )
+)
+@click.argument("batch_file", type=click.File("r"))
+@click.option(
+    "--keep-going", is_flag=True, help="Run the remaining commands after a failure."
+)
+@reconnect_options
+@click.pass_context
+def batch(ctx, batch_file, keep_going, reconnect, reconnect_timeout):
+    session = ShellSession(ctx, reconnect_timeout if reconnect else None)
+    errors = 0
+    try:
+        for line_number, line in enumerate(batch_file, 1):
+            if not run_shell_command(ctx, session, line):
+                errors += 1
+                click.echo(
+                    "Line {} failed: {}".format(line_number, line.strip()), err=True
+                )
+                if not keep_going:
+                    break
+    finally:
+        session.disconnect()
+    if errors > 0:
+        sys.exit(1)
+
+
+@cli.group(help="Work with APDU traces recorded with 'ledgerctl --record'.")
+def trace():
+    pass
+
+
+@trace.command("replay", help="Send the commands of a trace again.")
+@click.argument("trace_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--latency-scale",
+    type=float,
+    default=1.0,
+    help="Multiply recorded device latencies (0 to answer immediately).",
+)
+@click.option(
+    "--live",
+    is_flag=True,
+    help="Send the commands to the device instead of replaying its responses.",
+)
+@click.pass_obj
+def trace_replay(get_client, trace_file, latency_scale, live):
+    if live:
+        exchange = get_client().raw_exchange
+    else:
+        exchange = ReplayDevice(trace_file, latency_scale).exchange
+
+    count = 0
+    start = time.perf_counter()
+    try:
+        for command, response in read_exchanges(trace_file):
+            actual = exchange(command.data)
+            if actual[-2:] != response.data[-2:]:
+                click.echo(
+                    "APDU #{}: expected status word {}, got {}".format(
+                        count, response.data[-2:].hex(), actual[-2:].hex()
+                    )
+                )
+                sys.exit(1)
+            count += 1
+    except (TraceFormatError, ReplayMismatch) as exception:
+        click.echo(exception)
+        sys.exit(1)
+    click.echo("Replayed {} APDU in {:.3f}s".format(count, time.perf_counter() - start))
+
+
+def ins_name(ins: int) -> str:
+    try:
+        return LedgerIns(ins).name
+    except ValueError:
+        return "{:#04x}".format(ins)
+
+
+def format_ms(ns) -> str:
+    if ns is None:
+        return "-"
+    return "{:.2f}".format(ns / 1e6)
+
+
+@trace.command(
+    "analyze", help="Report where time is spent in a trace or an APDU log ('-v')."
+)
+@click.argument("trace_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--slowest", type=int, default=10, help="Number of slowest APDU to display."
+)
+def trace_analyze(trace_file, slowest):
+    from tabulate import tabulate
+
+    try:
+        analysis = analyze_file(trace_file, slowest)
+    except (TraceFormatError, ValueError) as exception:
+        click.echo(exception)
+        sys.exit(1)
+
+    rows = []
+    for ins, stats in sorted(analysis.by_ins.items()):
+        rows.append(
+            [
+                ins_name(ins),
+                stats.count,
+                stats.errors,
+                format_ms(stats.latency_percentile(50)),
+                format_ms(stats.latency_percentile(90)),
+                format_ms(stats.latency_percentile(99)),
+                format_ms(stats.latency_percentile(100)),
+                "{:.1f}".format(stats.command_bytes / stats.count),
+                "{:.1f}".format(stats.response_bytes / stats.count),
+            ]
+        )
+    click.echo(
+        tabulate(
+            rows,
+            headers=[
+                "INS",
+                "Count",
+                "Errors",
+                "p50 (ms)",
+                "p90 (ms)",
+                "p99 (ms)",
+                "Max (ms)",
+                "Command bytes",
+                "Response bytes",
+            ],
+        )
+    )
+    click.echo()
+
+    summary = [
+        ["APDU", analysis.count],
+        ["Bytes", analysis.total_bytes],
+        ["Secure APDU", analysis.secure_count],
+        ["SCP overhead (min)", "{:.1%}".format(analysis.scp_overhead_ratio)],
+    ]
+    if analysis.timed:
+        summary += [
+            ["Duration (ms)", format_ms(analysis.duration)],
+            ["Device time (ms)", format_ms(analysis.device_time)],
+            ["Host time (ms)", format_ms(analysis.host_time)],
+        ]
+        if analysis.gaps.count > 0:
+            summary += [
+                ["Host gap p50 (ms)", format_ms(analysis.gaps.percentile(50))],
+                ["Host gap p99 (ms)", format_ms(analysis.gaps.percentile(99))],
+            ]
+    else:
+        summary.append(["Timing", "not available"])
+    click.echo(tabulate(summary, tablefmt="plain"))
+
+    if analysis.timed and slowest > 0:
+        click.echo()
+        click.echo(
+            tabulate(
+                [
+                    [
+                        exchange.number,
+                        ins_name(exchange.ins),
+                        format_ms(exchange.latency),
+                        len(exchange.command),
+                        "{:04x}".format(exchange.status_word),
+                    ]
+                    for exchange in analysis.slowest_exchanges()
+                ],
+                headers=["#", "INS", "Latency (ms)", "Command bytes", "SW"],
+            )
+        )
+
+
+@cli.command(help="Measure the latency and throughput of the link with the device.")
+@click.option(
+    "-b",
+    "--benchmark",
+    "benchmarks",
+    multiple=True,
+    type=click.Choice(BENCHMARKS),
+    help="Benchmark to run (default: all, 'load' only with --manifest).",
+)
+@click.option(
+    "-n",
+    "--count",
+    type=click.IntRange(1),
+    default=20,
+    show_default=True,
+    help="Number of operations measured by each benchmark.",
+)
+@click.option(
+    "--manifest",
+    help="App installed, then deleted, by the load benchmark.",
+)
+@click.option(
+    "--load-size",
+    "load_sizes",
+    multiple=True,
+    type=click.IntRange(1, MAX_LOAD_SIZE),
+    help="Size of LOAD chunks (default: the maximum supported by the device).",
+)
+@click.option(
+    "--json",
+    "json_output",
+    type=click.File("w"),
+    help="Write the results as JSON to a file ('-' for stdout).",
+)
+@click.pass_obj
+def bench(get_client, benchmarks, count, manifest, load_sizes, json_output):
+    from tabulate import tabulate
+
+    app_manifest = load_manifest(manifest) if manifest is not None else None
+
+    client = get_client()
+    if not benchmarks:
+        benchmarks = list(BENCHMARKS)
+        if manifest is None:
+            benchmarks.remove(BENCH_LOAD)
+        if isinstance(client, DaemonClient):
+            # The secure channel is held by the daemon
+            benchmarks.remove(BENCH_HANDSHAKE)
+    try:
+        results = run_benchmarks(client, benchmarks, count, app_manifest, load_sizes)
+    except ValueError as exception:
+        click.echo(exception, err=True)
+        sys.exit(1)
+    report = bench_report(client, results)
+
+    if json_output is not None:
+        json.dump(report, json_output, indent=2)
+        json_output.write("\n")
+        if json_output.name == "<stdout>":
+            return
+
+    rows = []
+    for result in report["results"]:
+        rows.append(
+            [
+                result["name"],
+                " ".join("{}={}".format(k, v) for k, v in result["parameters"].items()),
+                result["count"],
+                "{:.2f}".format(result["mean_ms"]),
+                "{:.2f}".format(result["p50_ms"]),
+                "{:.2f}".format(result["p90_ms"]),
+                "{:.2f}".format(result["p99_ms"]),
+                "{:.2f}".format(result["max_ms"]),
+                "-"
+                if result["bytes_per_s"] is None
+                else "{:.0f}".format(result["bytes_per_s"]),
+            ]
+        )
+    click.echo(
+        "{} ({}), {}".format(
+            report["device"]["name"],
+            report["device"]["target_id"],
+            report["device"]["transport"],
+        )
+    )
+    click.echo(
+        tabulate(
+            rows,
+            headers=[
+                "Benchmark",
+                "Parameters",
+                "Count",
+                "Mean (ms)",
+                "p50 (ms)",
+                "p90 (ms)",
+                "p99 (ms)",
+                "Max (ms)",
+                "Bytes/s",
+            ],
+        )
+    )
+
+
+@cli.group(help="Precompiled installation bundles.")
+def bundle():
+    pass
+
+
+@bundle.command("build", help="Compile a manifest into installation bundles.")
+@click.argument("manifest")
+@click.option(
+    "-o", "--output", default="app.bundle", show_default=True, help="Bundle file."
+)
+@click.option(
+    "-t",
+    "--target",
+    "target_ids",
+    multiple=True,
+    help="Target ID to build a bundle for (default: every target of the manifest).",
+)
+@click.option(
+    "--load-size",
+    type=click.IntRange(1, MAX_LOAD_SIZE),
+    default=DEFAULT_LOAD_SIZE,
+    show_default=True,
+    help="Size of LOAD chunks. Larger chunks mean fewer APDU to install the bundle.",
+)
+@icon_compression_option
+def bundle_build(manifest, output, target_ids, load_size, icon_compression):
+    app_manifest = load_manifest(manifest, icon_compression)
+    if not target_ids:
+        target_ids = app_manifest.get_target_ids()
+    for target_id in target_ids:
+        filename = output
+        if len(target_ids) > 1:
+            filename = target_dump_filename(output, target_id)
+        try:
+            build_bundle(app_manifest, target_id, filename, load_size)
+        except (OSError, ValueError) as exception:
+            click.echo(exception)
+            sys.exit(1)
+        click.echo(
+            "Built bundle for {} ({}) to {}".format(
+                utils.get_device_name(int(target_id, 16)), target_id, filename
+            )
+        )
+
+
+@bundle.command("install", help="Install an application from a bundle.")
+@click.argument("bundle_file", type=click.Path(exists=True, dir_okay=False))
+@click.pass_obj
+def bundle_install(get_client, bundle_file):
+    try:
+        with Bundle(bundle_file) as app_bundle:
+            install_bundle(get_client(), app_bundle)
+    except (BundleFormatError, ValueError) as exception:
+        click.echo(exception)
+        sys.exit(1)
+    except CommException as e:
+        echo_install_error(e)
+
+
+@bundle.command("info", help="Display the content of a bundle.")
+@click.argument("bundle_file", type=click.Path(exists=True, dir_okay=False))
+def bundle_info(bundle_file):
+    from tabulate import tabulate
+
+    try:
+        with Bundle(bundle_file) as app_bundle:
+            rows = [
+                ["Application", app_bundle.app_name],
+                [
+                    "Target",
+                    "{} ({:#010x})".format(
+                        utils.get_device_name(app_bundle.target_id),
+                        app_bundle.target_id,
+                    ),
+                ],
+                ["LOAD chunk size", app_bundle.load_size],
+                ["Commands", sum(1 for _ in app_bundle.commands())],
+                ["Loaded bytes", app_bundle.load_bytes()],
+            ]
+    except BundleFormatError as exception:
+        click.echo(exception)
+        sys.exit(1)
+    click.echo(tabulate(rows, tablefmt="plain"))
+
+
 @cli.command("upgrade-firmware", help="Upgrade firmware.")
 @click.argument("firmware_name")
 @click.argument("firmware_key")
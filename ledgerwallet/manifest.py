@@ -1,43 +1,66 @@
 import collections
 import colorsys
 import gzip
+import io
+import logging
 import math
+import zlib
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
-
-from PIL import Image, ImageOps
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from ledgerwallet import params
+from ledgerwallet.capabilities import DEFAULT_LOAD_SIZE
+from ledgerwallet.iconcache import get_icon_cache, icon_cache_key
 from ledgerwallet.utils import DeviceNames, get_device_name
 
+if TYPE_CHECKING:
+    # PIL is imported when icons are encoded
+    from PIL import Image
+
 MAX_COLORS = 16
+# Maximum size of uncompressed data in each gzip chunk of NBGL images
+NBGL_CHUNK_SIZE = 2048
+GZIP_STRATEGIES = (
+    zlib.Z_DEFAULT_STRATEGY,
+    zlib.Z_FILTERED,
+    zlib.Z_HUFFMAN_ONLY,
+    zlib.Z_RLE,
+    zlib.Z_FIXED,
+)
 
+# Icon encoders, depending on the device and API level
+ICON_ENCODER_NBGL = "nbgl"
+ICON_ENCODER_NBGL_1BPP = "nbgl_reversed_1bpp"
+ICON_ENCODER_BAGL = "bagl"
 
-def is_power2(n):
-    return n != 0 and ((n & (n - 1)) == 0)
+LOG = logging.getLogger("ledgerwallet")
 
+_np = None
+_executor: Optional[ThreadPoolExecutor] = None
 
-def _image_to_buffer_nbgl(im: Image, compress: bool, reverse_1bpp: bool) -> bytes:
-    im = im.convert("L")
-    nb_colors = len(im.getcolors())
 
-    # Compute bits_per_pixel
-    # Round number of colors to a power of 2
-    if not is_power2(nb_colors):
-        nb_colors = int(pow(2, math.ceil(math.log(nb_colors, 2))))
+def is_power2(n):
+    return n != 0 and ((n & (n - 1)) == 0)
 
-    bpp = int(math.log(nb_colors, 2))
-    # 2 or 3 BPP are not supported
-    if bpp > 1:
-        bpp = 4
 
-    if bpp == 0:
-        bpp = 1
+def _numpy():
+    """Return the numpy module if it is installed (it is an optional dependency)."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
 
-    # Invert if bpp is 1
-    if bpp == 1:
-        im = ImageOps.invert(im)
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np or None
 
+
+def _nbgl_pixels(
+    im: "Image.Image", nb_colors: int, bpp: int, reverse_1bpp: bool
+) -> bytes:
     width, height = im.size
 
     current_byte = 0
@@ -75,26 +98,132 @@ def _image_to_buffer_nbgl(im: Image, compress: bool, reverse_1bpp: bool) -> byte
     if current_bit > 0:
         image_data.append(current_byte & 0xFF)
 
+    return bytes(image_data)
+
+
+def _nbgl_pixels_numpy(
+    im: "Image.Image", nb_colors: int, bpp: int, reverse_1bpp: bool
+) -> bytes:
+    """Vectorized version of _nbgl_pixels, with the same output."""
+    np = _numpy()
+    base_threshold = int(256 / nb_colors)
+    half_threshold = int(base_threshold / 2)
+
+    # Columns first, from right to left, then rows from top to bottom
+    pixels = np.asarray(im, dtype=np.uint16)[:, ::-1].T.ravel()
+    color_indices = np.minimum(
+        (pixels + half_threshold) // base_threshold, nb_colors - 1
+    ).astype(np.uint8)
+    if bpp == 1 and reverse_1bpp:
+        color_indices ^= 1
+
+    # Pack pixels in bytes, first pixel in the most significant bits
+    pixels_per_byte = 8 // bpp
+    padding = -len(color_indices) % pixels_per_byte
+    color_indices = np.pad(color_indices, (0, padding))
+    shifts = np.arange(8 - bpp, -1, -bpp, dtype=np.uint8)
+    packed = np.bitwise_or.reduce(
+        color_indices.reshape(-1, pixels_per_byte) << shifts, axis=1
+    )
+    return packed.astype(np.uint8).tobytes()
+
+
+class IconCompression(str, Enum):
+    # gzip.compress, at its default level
+    DEFAULT = "default"
+    # Smallest gzip output over deflate levels and strategies
+    MAX = "max"
+
+
+def _gzip_chunk(data: bytes) -> bytes:
+    return gzip.compress(data, mtime=0)
+
+
+def _gzip_chunk_max(data: bytes) -> bytes:
+    """Compress data with the deflate settings giving the smallest output.
+
+    Any setting produces a standard gzip stream (with a zero mtime), which the
+    device decodes the same way.
+    """
+    best = _gzip_chunk(data)
+    for level in range(1, 10):
+        for strategy in GZIP_STRATEGIES:
+            for mem_level in (8, 9):
+                compressor = zlib.compressobj(
+                    level, zlib.DEFLATED, 16 + zlib.MAX_WBITS, mem_level, strategy
+                )
+                compressed = compressor.compress(data) + compressor.flush()
+                if len(compressed) < len(best):
+                    best = compressed
+    return best
+
+
+def _map_chunks(function, chunks: List[bytes]) -> List[bytes]:
+    """Apply function to chunks, in parallel (zlib releases the GIL)."""
+    global _executor
+    if len(chunks) < 2:
+        return [function(chunk) for chunk in chunks]
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix="ledgerwallet-icons")
+    return list(_executor.map(function, chunks))
+
+
+def _image_to_buffer_nbgl(
+    im: "Image.Image",
+    compress: bool,
+    reverse_1bpp: bool,
+    compression: IconCompression = IconCompression.DEFAULT,
+) -> bytes:
+    im = im.convert("L")
+    nb_colors = len(im.getcolors())
+
+    # Compute bits_per_pixel
+    # Round number of colors to a power of 2
+    if not is_power2(nb_colors):
+        nb_colors = int(pow(2, math.ceil(math.log(nb_colors, 2))))
+
+    bpp = int(math.log(nb_colors, 2))
+    # 2 or 3 BPP are not supported
+    if bpp > 1:
+        bpp = 4
+
+    if bpp == 0:
+        bpp = 1
+
+    # Invert if bpp is 1
+    if bpp == 1:
+        from PIL import ImageOps
+
+        im = ImageOps.invert(im)
+
+    width, height = im.size
+
+    if _numpy() is not None:
+        image_data = _nbgl_pixels_numpy(im, nb_colors, bpp, reverse_1bpp)
+    else:
+        image_data = _nbgl_pixels(im, nb_colors, bpp, reverse_1bpp)
+
     if not compress:
         output_buffer = image_data
     else:
-        # Compress buffer into a gzip file
+        # Compress buffer into gzip chunks
         output_buffer = []
         # cut into chunks of 2048 bytes max of uncompressed data
         # (because decompression needs the full buffer)
-        full_uncompressed_size = len(image_data)
-        i = 0
-        while full_uncompressed_size > 0:
-            chunk_size = min(2048, full_uncompressed_size)
-            tmp = bytes(image_data[i : i + chunk_size])
-            compressed_buffer = gzip.compress(tmp, mtime=0)
+        chunks = [
+            image_data[i : i + NBGL_CHUNK_SIZE]
+            for i in range(0, len(image_data), NBGL_CHUNK_SIZE)
+        ]
+        if compression == IconCompression.MAX:
+            compress_chunk = _gzip_chunk_max
+        else:
+            compress_chunk = _gzip_chunk
+        for compressed_buffer in _map_chunks(compress_chunk, chunks):
             output_buffer += [
                 len(compressed_buffer) & 0xFF,
                 (len(compressed_buffer) >> 8) & 0xFF,
             ]
             output_buffer += compressed_buffer
-            full_uncompressed_size -= chunk_size
-            i += chunk_size
 
     # Add metadata
     BPP_FORMATS = {1: 0, 2: 1, 4: 2}
@@ -116,8 +245,73 @@ def _image_to_buffer_nbgl(im: Image, compress: bool, reverse_1bpp: bool) -> byte
     return bytes(bytearray(result))
 
 
-def _image_to_packed_buffer_bagl(im: Image) -> bytes:
+def _bagl_pixels(
+    im: "Image.Image", remap: Dict[int, int], bits_per_pixel: int
+) -> bytes:
     width, height = im.size
+
+    current_byte = 0
+    current_bit = 0
+    image_data = []
+
+    # Row first
+    for row in range(height):
+        for col in range(width):
+            # Return an index in the indexed colors list for indexed address
+            # spaces left to right.
+            #
+            # Perform implicit rotation here (0,0) is left top in BAGL, and
+            # generally left bottom for various canvas.
+            color_index = im.getpixel((col, row))
+
+            # Remap index by luminance
+            color_index = remap[color_index]
+
+            # le encoded
+            current_byte += color_index << current_bit
+            current_bit += bits_per_pixel
+
+            if current_bit >= 8:
+                image_data.append(current_byte & 0xFF)
+                current_bit = 0
+                current_byte = 0
+
+    # Handle last byte if any
+    if current_bit > 0:
+        image_data.append(current_byte & 0xFF)
+    return bytes(image_data)
+
+
+def _bagl_pixels_numpy(
+    im: "Image.Image", remap: Dict[int, int], bits_per_pixel: int
+) -> bytes:
+    """Vectorized version of _bagl_pixels, with the same output."""
+    np = _numpy()
+    if bits_per_pixel == 0:
+        return b""
+
+    indices = np.asarray(im, dtype=np.uint8).ravel()
+    unmapped = set(np.unique(indices).tolist()) - remap.keys()
+    if unmapped:
+        raise KeyError(min(unmapped))
+    lookup = np.zeros(256, dtype=np.uint8)
+    for old_index, new_index in remap.items():
+        lookup[old_index] = new_index
+    color_indices = lookup[indices]
+
+    # Pack pixels in bytes, first pixel in the least significant bits. With 3
+    # bits per pixel, the top bit of the third pixel of each byte is dropped.
+    pixels_per_byte = -(-8 // bits_per_pixel)
+    padding = -len(color_indices) % pixels_per_byte
+    color_indices = np.pad(color_indices.astype(np.uint16), (0, padding))
+    shifts = np.arange(0, 8, bits_per_pixel, dtype=np.uint16)
+    packed = np.bitwise_or.reduce(
+        color_indices.reshape(-1, pixels_per_byte) << shifts, axis=1
+    )
+    return (packed & 0xFF).astype(np.uint8).tobytes()
+
+
+def _image_to_packed_buffer_bagl(im: "Image.Image") -> bytes:
     num_colors = len(im.getcolors())
 
     # Round number of colors to a power of 2
@@ -126,10 +320,6 @@ def _image_to_packed_buffer_bagl(im: Image) -> bytes:
 
     bits_per_pixel = int(math.log(num_colors, 2))
 
-    current_byte = 0
-    current_bit = 0
-    image_data = []
-
     # Reorder color map by luminance
     palette = im.getpalette()
     opalette: Dict[float, List] = {}
@@ -156,55 +346,27 @@ def _image_to_packed_buffer_bagl(im: Image) -> bytes:
             new_palette.append(v[1])
             i += 1
 
-    palette = new_indices
-
     # write BPP
-    header = bytes([bits_per_pixel])
+    header = bytearray([bits_per_pixel])
     # LE color array, it is meant to be embedded as is in an array
     for i in range(num_colors):
         header += new_palette[i].to_bytes(4, "big")
 
-    # Row first
-    for row in range(height):
-        for col in range(width):
-            # Return an index in the indexed colors list for indexed address
-            # spaces left to right.
-            #
-            # Perform implicit rotation here (0,0) is left top in BAGL, and
-            # generally left bottom for various canvas.
-            color_index = im.getpixel((col, row))
-
-            # Remap index by luminance
-            color_index = palette[color_index]
-
-            # le encoded
-            current_byte += color_index << current_bit
-            current_bit += bits_per_pixel
-
-            if current_bit >= 8:
-                image_data.append(current_byte & 0xFF)
-                current_bit = 0
-                current_byte = 0
-
-    # Handle last byte if any
-    if current_bit > 0:
-        image_data.append(current_byte & 0xFF)
-    return header + bytes(image_data)
-
-
-def icon_from_file(image_file: str, device: str, api_level: Optional[int]) -> bytes:
-    im = Image.open(image_file)
-    im.load()
+    if _numpy() is not None:
+        image_data = _bagl_pixels_numpy(im, new_indices, bits_per_pixel)
+    else:
+        image_data = _bagl_pixels(im, new_indices, bits_per_pixel)
+    return bytes(header) + image_data
 
-    assert im.mode == "P" and len(im.getcolors()) <= MAX_COLORS
 
+def _icon_encoder(device: str, api_level: Optional[int]) -> str:
     if get_device_name(int(device, 16)) in [
         DeviceNames.LEDGER_STAX.value,
         DeviceNames.LEDGER_FLEX.value,
         DeviceNames.LEDGER_APEX_P.value,
         DeviceNames.LEDGER_APEX_M.value,
     ]:
-        image_data = _image_to_buffer_nbgl(im, True, False)
+        return ICON_ENCODER_NBGL
 
     elif (
         get_device_name(int(device, 16))
@@ -215,6 +377,27 @@ def icon_from_file(image_file: str, device: str, api_level: Optional[int]) -> by
         and api_level is not None
         and api_level > 5
     ):
+        return ICON_ENCODER_NBGL_1BPP
+    return ICON_ENCODER_BAGL
+
+
+def _encode_icon(
+    image_file: str, image: bytes, encoder: str, compression: IconCompression
+) -> bytes:
+    from PIL import Image
+
+    im = Image.open(io.BytesIO(image))
+    im.load()
+
+    assert im.mode == "P" and len(im.getcolors()) <= MAX_COLORS
+
+    if encoder == ICON_ENCODER_NBGL:
+        image_data = _image_to_buffer_nbgl(im, True, False, compression)
+        if compression != IconCompression.DEFAULT:
+            _log_compression_savings(
+                image_file, len(_image_to_buffer_nbgl(im, True, False)), len(image_data)
+            )
+    elif encoder == ICON_ENCODER_NBGL_1BPP:
         image_data = _image_to_buffer_nbgl(im, False, True)
     else:
         image_data = _image_to_packed_buffer_bagl(im)
@@ -222,8 +405,45 @@ def icon_from_file(image_file: str, device: str, api_level: Optional[int]) -> by
     return image_data
 
 
+def icon_from_file(
+    image_file: str,
+    device: str,
+    api_level: Optional[int],
+    compression: IconCompression = IconCompression.DEFAULT,
+) -> bytes:
+    """Convert an image to the icon format of a device.
+
+    Conversions are cached by image content, encoder, API level and
+    compression (see ledgerwallet.iconcache).
+    """
+    with open(image_file, "rb") as f:
+        image = f.read()
+    encoder = _icon_encoder(device, api_level)
+    if encoder != ICON_ENCODER_NBGL:
+        # Only compressed icons depend on the compression mode
+        compression = IconCompression.DEFAULT
+    key = icon_cache_key(image, encoder, api_level, IconCompression(compression).value)
+    return get_icon_cache().get_or_convert(
+        key, lambda: _encode_icon(image_file, image, encoder, compression)
+    )
+
+
+def _log_compression_savings(image_file: str, default_size: int, size: int):
+    # Icons are part of the app parameters, sent in LOAD APDUs
+    saved_apdus = math.ceil(default_size / DEFAULT_LOAD_SIZE) - math.ceil(
+        size / DEFAULT_LOAD_SIZE
+    )
+    LOG.info(
+        "Icon {}: {} bytes instead of {} (-{} bytes, about -{} LOAD APDU)".format(
+            image_file, size, default_size, default_size - size, saved_apdus
+        )
+    )
+
+
 class AppManifest(ABC):
     dic: Dict = {}
+    # Compression of NBGL icons (Stax, Flex, Apex)
+    icon_compression: IconCompression = IconCompression.DEFAULT
 
     @property
     def app_name(self) -> str:
@@ -257,6 +477,11 @@ class AppManifest(ABC):
     def assert_compatible_device(self, device_id: int):
         pass
 
+    @abstractmethod
+    def get_target_ids(self) -> List[str]:
+        """Target IDs the manifest holds installation information for."""
+        pass
+
     def serialize_derivation_path(self, value):
         derivation_paths: Dict[str, Optional[int]] = {
             "paths": None,
@@ -1,6 +1,6 @@
 import json
 import os
-from typing import Optional
+from typing import List, Optional
 
 from ledgerwallet import params
 from ledgerwallet.manifest import AppManifest, icon_from_file
@@ -40,7 +40,9 @@ class AppManifestJson(AppManifest):
                 parameters.append(
                     {
                         "type_": "BOLOS_TAG_ICON",
-                        "value": icon_from_file(value, device, api_level),
+                        "value": icon_from_file(
+                            value, device, api_level, self.icon_compression
+                        ),
                     }
                 )
             elif entry == "derivationPath":
@@ -48,7 +50,7 @@ class AppManifestJson(AppManifest):
                 parameters.append(
                     {"type_": "BOLOS_TAG_DERIVEPATH", "value": derivation_paths}
                 )
-        return params.AppParams.build(parameters)
+        return params.build_app_params(parameters)
 
     def assert_compatible_device(self, device_id: int):
         if "targetId" in self.dic and int(self.dic["targetId"], 16) == device_id:
@@ -58,3 +60,6 @@ class AppManifestJson(AppManifest):
                 "JSON manifest has no installation information about the current"
                 " device : {}".format(get_device_name(device_id))
             )
+
+    def get_target_ids(self) -> List[str]:
+        return [self.dic["targetId"]]
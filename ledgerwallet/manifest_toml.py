@@ -1,9 +1,10 @@
 import os
 import sys
-from typing import Optional
+from typing import List, Optional
 
+from ledgerwallet.capabilities import supports_api_level
 from ledgerwallet.manifest import AppManifest, icon_from_file
-from ledgerwallet.utils import DeviceNames, get_device_name
+from ledgerwallet.utils import get_device_name
 
 if sys.version_info >= (3, 11):
     import tomllib
@@ -30,10 +31,7 @@ class AppManifestToml(AppManifest):
         return int(self.dic[device].get("flags", "0"), 16)
 
     def get_api_level(self, device: str) -> Optional[int]:
-        if (
-            get_device_name(int(device, 16)) == DeviceNames.LEDGER_NANO_SP.value
-            and "apiLevel" in self.dic[device]
-        ):
+        if supports_api_level(int(device, 16)) and "apiLevel" in self.dic[device]:
             level = self.dic[device]["apiLevel"]
             if isinstance(level, int):
                 return int(level)
@@ -58,7 +56,10 @@ class AppManifestToml(AppManifest):
                             {
                                 "type_": "BOLOS_TAG_ICON",
                                 "value": icon_from_file(
-                                    device_value, device, api_level
+                                    device_value,
+                                    device,
+                                    api_level,
+                                    self.icon_compression,
                                 ),
                             }
                         )
@@ -67,7 +68,7 @@ class AppManifestToml(AppManifest):
                         parameters.append(
                             {"type_": "BOLOS_TAG_DERIVEPATH", "value": derivation_paths}
                         )
-        return params.AppParams.build(parameters)
+        return params.build_app_params(parameters)
 
     def assert_compatible_device(self, device_id: int):
         if "binary" not in self.dic.get(str(device_id), list()):
@@ -75,3 +76,14 @@ class AppManifestToml(AppManifest):
                 "TOML manifest has no installation information about the current"
                 " device : {}".format(get_device_name(device_id))
             )
+
+    def get_target_ids(self) -> List[str]:
+        target_ids = []
+        for entry, value in self.dic.items():
+            if isinstance(value, dict) and "binary" in value:
+                try:
+                    int(entry, 16)
+                except ValueError:
+                    continue
+                target_ids.append(entry)
+        return target_ids
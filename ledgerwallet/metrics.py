@@ -0,0 +1,315 @@
+import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from ledgerwallet.utils import LedgerIns, LedgerSecureIns
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds of the latency histograms, in seconds
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class SecureExchange(NamedTuple):
+    """A secure APDU, as seen by observers."""
+
+    ins: int
+    # Lengths of the INS and data, before and after wrapping by the channel.
+    # Wrapped lengths are None when the channel is held by a daemon.
+    command_length: int
+    wrapped_command_length: Optional[int]
+    # Lengths of the response data, 0 when the device returned an error
+    response_length: int
+    wrapped_response_length: Optional[int]
+    status_word: int
+    # Seconds, including wrapping and unwrapping
+    duration: float
+
+
+class ExchangeObserver(object):
+    """Receive the APDUs exchanged by a LedgerClient.
+
+    Observers are registered with `LedgerClient.add_observer`, and called by
+    the thread exchanging the APDU, after the exchange. They must be fast and
+    must not raise.
+    """
+
+    def on_exchange(self, command: bytes, response: bytes, duration: float):
+        pass
+
+    def on_exchange_error(self, command: bytes, error: Exception, duration: float):
+        pass
+
+    def on_secure_exchange(self, exchange: SecureExchange):
+        pass
+
+
+def _ins_label(ins: int, names=LedgerIns) -> str:
+    try:
+        return names(ins).name
+    except ValueError:
+        return "{:#04x}".format(ins)
+
+
+class Histogram(object):
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative_counts(self) -> List[int]:
+        counts = []
+        total = 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+            for name, value in labels.items()
+        )
+    )
+
+
+class ApduMetrics(ExchangeObserver):
+    """Aggregate APDU latencies, byte and status word counters.
+
+    Metrics are labelled by instruction, and exported in the Prometheus text
+    format by `render`.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.latency: Dict[str, Histogram] = {}
+        self.sent_bytes: Dict[str, int] = {}
+        self.received_bytes: Dict[str, int] = {}
+        self.status_words: Dict[Tuple[str, str], int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.secure_latency: Dict[str, Histogram] = {}
+        self.secure_status_words: Dict[Tuple[str, str], int] = {}
+        # Indexed by direction: command or response
+        self.scp_payload_bytes = {"command": 0, "response": 0}
+        self.scp_overhead_bytes = {"command": 0, "response": 0}
+
+    def on_exchange(self, command: bytes, response: bytes, duration: float):
+        ins = _ins_label(command[1]) if len(command) > 1 else "none"
+        status_word = "{:04x}".format(int.from_bytes(response[-2:], "big"))
+        with self._lock:
+            histogram = self.latency.get(ins)
+            if histogram is None:
+                histogram = self.latency[ins] = Histogram(self.buckets)
+            histogram.observe(duration)
+            self.sent_bytes[ins] = self.sent_bytes.get(ins, 0) + len(command)
+            self.received_bytes[ins] = self.received_bytes.get(ins, 0) + len(response)
+            key = (ins, status_word)
+            self.status_words[key] = self.status_words.get(key, 0) + 1
+
+    def on_exchange_error(self, command: bytes, error: Exception, duration: float):
+        ins = _ins_label(command[1]) if len(command) > 1 else "none"
+        key = (ins, type(error).__name__)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def on_secure_exchange(self, exchange: SecureExchange):
+        ins = _ins_label(exchange.ins, LedgerSecureIns)
+        key = (ins, "{:04x}".format(exchange.status_word))
+        with self._lock:
+            histogram = self.secure_latency.get(ins)
+            if histogram is None:
+                histogram = self.secure_latency[ins] = Histogram(self.buckets)
+            histogram.observe(exchange.duration)
+            self.secure_status_words[key] = self.secure_status_words.get(key, 0) + 1
+            self.scp_payload_bytes["command"] += exchange.command_length
+            self.scp_payload_bytes["response"] += exchange.response_length
+            if exchange.wrapped_command_length is not None:
+                self.scp_overhead_bytes["command"] += (
+                    exchange.wrapped_command_length - exchange.command_length
+                )
+            if exchange.wrapped_response_length is not None:
+                self.scp_overhead_bytes["response"] += (
+                    exchange.wrapped_response_length - exchange.response_length
+                )
+
+    def _render_histograms(
+        self, lines: List[str], name: str, help: str, histograms: Dict[str, Histogram]
+    ):
+        lines.append("# HELP {} {}".format(name, help))
+        lines.append("# TYPE {} histogram".format(name))
+        for ins, histogram in sorted(histograms.items()):
+            for bound, count in zip(self.buckets, histogram.cumulative_counts()):
+                labels = _format_labels({"ins": ins, "le": repr(bound)})
+                lines.append("{}_bucket{} {}".format(name, labels, count))
+            labels = _format_labels({"ins": ins, "le": "+Inf"})
+            lines.append("{}_bucket{} {}".format(name, labels, histogram.count))
+            labels = _format_labels({"ins": ins})
+            lines.append("{}_sum{} {!r}".format(name, labels, histogram.sum))
+            lines.append("{}_count{} {}".format(name, labels, histogram.count))
+
+    @staticmethod
+    def _render_counter(
+        lines: List[str],
+        name: str,
+        help: str,
+        label_names: Tuple[str, ...],
+        values: Dict,
+    ):
+        lines.append("# HELP {} {}".format(name, help))
+        lines.append("# TYPE {} counter".format(name))
+        for key, value in sorted(values.items()):
+            if not isinstance(key, tuple):
+                key = (key,)
+            labels = _format_labels(dict(zip(label_names, key)))
+            lines.append("{}{} {}".format(name, labels, value))
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            self._render_histograms(
+                lines,
+                "ledgerwallet_apdu_duration_seconds",
+                "Round-trip time of APDU exchanges.",
+                self.latency,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_apdu_sent_bytes_total",
+                "Bytes of APDU sent to the device.",
+                ("ins",),
+                self.sent_bytes,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_apdu_received_bytes_total",
+                "Bytes of responses received from the device.",
+                ("ins",),
+                self.received_bytes,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_apdu_status_words_total",
+                "Status words returned by the device.",
+                ("ins", "sw"),
+                self.status_words,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_apdu_errors_total",
+                "APDU exchanges which failed in the transport.",
+                ("ins", "error"),
+                self.errors,
+            )
+            self._render_histograms(
+                lines,
+                "ledgerwallet_secure_apdu_duration_seconds",
+                "Time of secure APDU exchanges, including the secure channel.",
+                self.secure_latency,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_secure_apdu_status_words_total",
+                "Status words returned to secure APDU.",
+                ("ins", "sw"),
+                self.secure_status_words,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_scp_payload_bytes_total",
+                "Bytes carried by the secure channel.",
+                ("direction",),
+                self.scp_payload_bytes,
+            )
+            self._render_counter(
+                lines,
+                "ledgerwallet_scp_overhead_bytes_total",
+                "Bytes added by the secure channel (padding and MAC).",
+                ("direction",),
+                self.scp_overhead_bytes,
+            )
+        return "\n".join(lines) + "\n"
+
+
+def write_prometheus(metrics: ApduMetrics, filename: str):
+    """Write metrics to a file, for the textfile collector of node_exporter.
+
+    The file is replaced atomically, so that it is never read half-written. It
+    is readable by other users (such as the one of node_exporter), as files
+    created with open() are.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(metrics.render())
+        # mkstemp creates files private to the user
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o644 & ~umask)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def serve_prometheus(
+    metrics: ApduMetrics, port: int, address: str = "127.0.0.1"
+) -> "ThreadingHTTPServer":
+    """Serve metrics over HTTP, from a background thread.
+
+    Call `shutdown()` on the returned server to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
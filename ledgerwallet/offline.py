@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from ledgerwallet.client import LedgerClient
+from ledgerwallet.manifest import AppManifest
+from ledgerwallet.transport.dump import DUMP_BUFFER_SIZE, DumpCompression, DumpFormat
+from ledgerwallet.transport.file import FileDevice
+
+
+def target_dump_filename(filename: str, target_id: str) -> str:
+    """Name of the dump of one target: out.apdu -> out-0x33000004.apdu"""
+    root, ext = os.path.splitext(filename)
+    return "{}-{}{}".format(root, target_id, ext)
+
+
+def dump_install(
+    app_manifest: AppManifest,
+    target_id: str,
+    filename: str,
+    dump_format: DumpFormat = DumpFormat.HEX,
+    compression: Optional[DumpCompression] = None,
+    force: bool = False,
+) -> str:
+    """Write the APDU installing an app on a given target to a dump file."""
+    out = open(filename, "wb", buffering=DUMP_BUFFER_SIZE)
+    client = LedgerClient(FileDevice(target_id, out, dump_format, compression))
+    try:
+        if force:
+            client.delete_app(app_manifest.app_name)
+        client.install_app(app_manifest)
+    finally:
+        client.close()
+    return filename
+
+
+def dump_install_all_targets(
+    app_manifest: AppManifest,
+    filename: str,
+    dump_format: DumpFormat = DumpFormat.HEX,
+    compression: Optional[DumpCompression] = None,
+    force: bool = False,
+    max_workers: Optional[int] = None,
+) -> Dict[str, str]:
+    """Write the installation dumps of every target of a manifest.
+
+    Dumps are built in parallel, in a pool of processes. Return the name of
+    the dump of each target ID.
+    """
+    target_ids = app_manifest.get_target_ids()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            target_id: executor.submit(
+                dump_install,
+                app_manifest,
+                target_id,
+                target_dump_filename(filename, target_id),
+                dump_format,
+                compression,
+                force,
+            )
+            for target_id in target_ids
+        }
+        return {target_id: future.result() for target_id, future in futures.items()}
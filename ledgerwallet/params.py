@@ -1,4 +1,6 @@
 import enum
+import struct
+from typing import Any, Dict, List, Mapping, Sequence, Union
 
 from construct import (
     Adapter,
@@ -17,14 +19,7 @@ from construct import (
     Struct,
     Switch,
 )
-from construct.core import (
-    byte2int,
-    singleton,
-    stream_read,
-    stream_write,
-    swapbytes,
-    this,
-)
+from construct.core import byte2int, singleton, stream_read, stream_write, this
 from construct.lib import int2byte, integertypes
 
 
@@ -54,12 +49,9 @@ class Asn1Length(Construct):
         if num < 0x80:
             stream_write(stream, int2byte(num), 1, path)
         else:
-            acc = b""
-            while num != 0:
-                acc += int2byte(num & 0xFF)
-                num >>= 8
+            acc = num.to_bytes((num.bit_length() + 7) // 8, "big")
             stream_write(stream, int2byte(0x80 | len(acc)), 1, path)
-            stream_write(stream, swapbytes(acc), len(acc), path)
+            stream_write(stream, acc, len(acc), path)
         return obj
 
     def _emitprimitivetype(self, ksy, bitwise):
@@ -227,29 +219,245 @@ Param = Struct(
 AppParams = GreedyRange(Param)
 
 
+# Fast path for the TLV encoding of app params.
+#
+# `build_app_params` and `parse_app_params` are equivalent to AppParams.build
+# and AppParams.parse, without the construct interpreter. AppParams remains
+# the reference implementation of the format.
+
+_CURVE_FLAGS = Curve.flags
+
+_Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _asn1_length(length: int) -> bytes:
+    if length < 0:
+        raise ValueError("ASN.1 length cannot be negative: {}".format(length))
+    if length < 0x80:
+        return bytes((length,))
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((0x80 | len(encoded),)) + encoded
+
+
+def _write_prefixed(out: bytearray, value: _Buffer):
+    out += _asn1_length(len(value))
+    out += value
+
+
+def _write_bip32_path(out: bytearray, path: str):
+    if path == "":
+        out.append(0)
+        return
+    elements = path.split("/")
+    if elements[0] == "m":
+        elements = elements[1:]
+    if len(elements) >= 0x80:
+        raise ValueError("BIP32 path length must be < 0x80")
+    indexes = [
+        0x80000000 | int(element[:-1]) if element.endswith("'") else int(element)
+        for element in elements
+    ]
+    out.append(len(indexes))
+    try:
+        out += struct.pack(">{}I".format(len(indexes)), *indexes)
+    except struct.error:
+        raise ValueError("Invalid BIP32 path: {}".format(path))
+
+
+def _write_slip21_path(out: bytearray, path: str):
+    payload = path.encode("utf-8")
+    if len(payload) + 1 > 0x7F:
+        raise ValueError("SLIP-21 path too long")
+    out.append(0x80 + len(payload) + 1)
+    out.append(0)
+    out += payload
+
+
+def _curve_value(curve: Union[int, str, Mapping[str, bool]]) -> int:
+    # Same inputs as the Curve FlagsEnum: integer, "a|b" string or flags dict
+    if isinstance(curve, int):
+        return curve
+    if isinstance(curve, str):
+        names = [name for name in curve.split("|") if name]
+    elif isinstance(curve, Mapping):
+        names = [name for name, enabled in curve.items() if enabled]
+    else:
+        raise ValueError("Invalid curve: {!r}".format(curve))
+    value = 0
+    for name in names:
+        if name not in _CURVE_FLAGS:
+            raise ValueError("Unknown curve: {}".format(name))
+        value |= _CURVE_FLAGS[name]
+    return value
+
+
+def _build_derivation_path(value: Mapping[str, Any]) -> bytearray:
+    out = bytearray((_curve_value(value["curve"]),))
+    for path in value.get("paths") or ():
+        _write_bip32_path(out, path)
+    for path in value.get("paths_slip21") or ():
+        _write_slip21_path(out, path)
+    return out
+
+
+def _build_dependencies(dependencies: Sequence[Mapping[str, Any]]) -> bytearray:
+    out = bytearray()
+    for dependency in dependencies:
+        entry = bytearray()
+        _write_prefixed(entry, dependency["name"].encode("utf-8"))
+        if dependency.get("version") is not None:
+            _write_prefixed(entry, dependency["version"].encode("utf-8"))
+        _write_prefixed(out, entry)
+    return out
+
+
+def _tag_value(tag: Union[int, str]) -> int:
+    if isinstance(tag, int):
+        return tag
+    try:
+        return BolosTag[tag]
+    except KeyError:
+        raise ValueError("Unknown param tag: {}".format(tag))
+
+
+def build_app_params(params: Sequence[Mapping[str, Any]]) -> bytes:
+    """Serialize app params, as AppParams.build does."""
+    out = bytearray()
+    for param in params:
+        tag = _tag_value(param["type_"])
+        value = param["value"]
+        out.append(tag)
+        if tag in (BolosTag.BOLOS_TAG_APPNAME, BolosTag.BOLOS_TAG_APPVERSION):
+            _write_prefixed(out, value.encode("utf-8"))
+        elif tag == BolosTag.BOLOS_TAG_ICON:
+            _write_prefixed(out, value)
+        elif tag == BolosTag.BOLOS_TAG_DERIVEPATH:
+            _write_prefixed(out, _build_derivation_path(value))
+        elif tag == BolosTag.BOLOS_TAG_DEPENDENCY:
+            _write_prefixed(out, _build_dependencies(value))
+    return bytes(out)
+
+
+class _Reader(object):
+    def __init__(self, data: _Buffer):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def remaining(self) -> int:
+        return len(self.data) - self.offset
+
+    def read(self, length: int) -> memoryview:
+        end = self.offset + length
+        if end > len(self.data):
+            raise ValueError("Truncated app params")
+        chunk = self.data[self.offset : end]
+        self.offset = end
+        return chunk
+
+    def read_byte(self) -> int:
+        if self.offset >= len(self.data):
+            raise ValueError("Truncated app params")
+        byte = self.data[self.offset]
+        self.offset += 1
+        return byte
+
+    def read_length(self) -> int:
+        byte = self.read_byte()
+        if byte & 0x80 == 0:
+            return byte
+        return int.from_bytes(self.read(byte & 0x7F), "big")
+
+    def read_prefixed(self) -> memoryview:
+        return self.read(self.read_length())
+
+
+def _parse_derivation_path(data: memoryview) -> Dict[str, Any]:
+    reader = _Reader(data)
+    curve = reader.read_byte()
+    paths = []
+    while reader.remaining() and data[reader.offset] < 0x80:
+        count = reader.read_byte()
+        indexes = struct.unpack(">{}I".format(count), reader.read(4 * count))
+        paths.append(
+            "/".join(
+                str(index & 0x7FFFFFFF) + "'" if index & 0x80000000 else str(index)
+                for index in indexes
+            )
+        )
+    paths_slip21 = []
+    while reader.remaining():
+        payload = reader.read(reader.read_byte() - 0x80)
+        if len(payload) == 0:
+            paths_slip21.append("")
+            continue
+        if payload[0] != 0:
+            raise ValueError("Invalid SLIP-21 path prefix")
+        paths_slip21.append(bytes(payload[1:]).decode("utf-8"))
+    return {"curve": curve, "paths": paths, "paths_slip21": paths_slip21}
+
+
+def _parse_dependencies(data: memoryview) -> List[Dict[str, Any]]:
+    reader = _Reader(data)
+    dependencies = []
+    while reader.remaining():
+        entry = _Reader(reader.read_prefixed())
+        name = str(entry.read_prefixed(), "utf-8")
+        version = str(entry.read_prefixed(), "utf-8") if entry.remaining() else None
+        dependencies.append({"name": name, "version": version})
+    return dependencies
+
+
+def parse_app_params(data: bytes) -> List[Dict[str, Any]]:
+    """Parse app params, as AppParams.parse does.
+
+    Tags are returned as their BolosTag name, curves as an integer (see the
+    CURVE_* flags), and other values as plain Python objects. Unlike
+    AppParams.parse, malformed data raises a ValueError instead of ending the
+    list early.
+    """
+    reader = _Reader(data)
+    params = []
+    while reader.remaining():
+        tag = reader.read_byte()
+        try:
+            tag_name = BolosTag(tag).name
+        except ValueError:
+            raise ValueError("Unknown param tag: {}".format(tag))
+        value = reader.read_prefixed()
+        if tag in (BolosTag.BOLOS_TAG_APPNAME, BolosTag.BOLOS_TAG_APPVERSION):
+            parsed: Any = str(value, "utf-8")
+        elif tag == BolosTag.BOLOS_TAG_ICON:
+            parsed = bytes(value)
+        elif tag == BolosTag.BOLOS_TAG_DERIVEPATH:
+            parsed = _parse_derivation_path(value)
+        else:
+            parsed = _parse_dependencies(value)
+        params.append({"type_": tag_name, "value": parsed})
+    return params
+
+
 def main():
-    params1 = AppParams.build(
-        [
-            {"type_": "BOLOS_TAG_APPNAME", "value": "SSH/PGP Agent"},
-            {"type_": "BOLOS_TAG_APPVERSION", "value": "0.0.4"},
-            {
-                "type_": "BOLOS_TAG_ICON",
-                "value": (
-                    b"\x01\x00\x00\x00\x00\xFF\xFF\xFF\x00\x00\x18\xFC\x24\x02"
-                    b"\x24\x0A\x24\x1A\x7E\x32\x66\x62\x6E\x62\x7E\x32\x00\x1A"
-                    b"\x40\x0A\x5F\x02\x5F\x02\x40\x02\x40\xFE\x7F\x00\x00"
-                ),
-            },
-            {
-                "type_": "BOLOS_TAG_DERIVEPATH",
-                "value": {
-                    "curve": Curve.prime256r1 | Curve.ed25519 | Curve.slip21,
-                    "paths": ["44'/535348'", "13'", "17'"],
-                    "paths_slip21": ["MYPATH"],
-                },
+    params1_values = [
+        {"type_": "BOLOS_TAG_APPNAME", "value": "SSH/PGP Agent"},
+        {"type_": "BOLOS_TAG_APPVERSION", "value": "0.0.4"},
+        {
+            "type_": "BOLOS_TAG_ICON",
+            "value": (
+                b"\x01\x00\x00\x00\x00\xFF\xFF\xFF\x00\x00\x18\xFC\x24\x02"
+                b"\x24\x0A\x24\x1A\x7E\x32\x66\x62\x6E\x62\x7E\x32\x00\x1A"
+                b"\x40\x0A\x5F\x02\x5F\x02\x40\x02\x40\xFE\x7F\x00\x00"
+            ),
+        },
+        {
+            "type_": "BOLOS_TAG_DERIVEPATH",
+            "value": {
+                "curve": Curve.prime256r1 | Curve.ed25519 | Curve.slip21,
+                "paths": ["44'/535348'", "13'", "17'"],
+                "paths_slip21": ["MYPATH"],
             },
-        ]
-    )
+        },
+    ]
+    params1 = AppParams.build(params1_values)
 
     params1_expected = (
         b"\x01\x0D\x53\x53\x48\x2F\x50\x47\x50\x20\x41\x67\x65\x6E\x74"
@@ -261,29 +469,29 @@ def main():
         b"\x59\x50\x41\x54\x48"
     )
     assert params1 == params1_expected
+    assert build_app_params(params1_values) == params1_expected
 
-    params2 = AppParams.build(
-        [
-            {"type_": "BOLOS_TAG_APPNAME", "value": "Vanadium"},
-            {"type_": "BOLOS_TAG_APPVERSION", "value": "0.0.1"},
-            {
-                "type_": "BOLOS_TAG_ICON",
-                "value": (
-                    b"\x01\x00\x00\x00\x00\xFF\xFF\xFF\x00\x00\x18\xFC\x24\x02"
-                    b"\x24\x0A\x24\x1A\x7E\x32\x66\x62\x6E\x62\x7E\x32\x00\x1A"
-                    b"\x40\x0A\x5F\x02\x5F\x02\x40\x02\x40\xFE\x7F\x00\x00"
-                ),
-            },
-            {
-                "type_": "BOLOS_TAG_DERIVEPATH",
-                "value": {
-                    "curve": Curve.secp256k1 | Curve.slip21,
-                    "paths": [""],
-                    "paths_slip21": ["VANADIUM"],
-                },
+    params2_values = [
+        {"type_": "BOLOS_TAG_APPNAME", "value": "Vanadium"},
+        {"type_": "BOLOS_TAG_APPVERSION", "value": "0.0.1"},
+        {
+            "type_": "BOLOS_TAG_ICON",
+            "value": (
+                b"\x01\x00\x00\x00\x00\xFF\xFF\xFF\x00\x00\x18\xFC\x24\x02"
+                b"\x24\x0A\x24\x1A\x7E\x32\x66\x62\x6E\x62\x7E\x32\x00\x1A"
+                b"\x40\x0A\x5F\x02\x5F\x02\x40\x02\x40\xFE\x7F\x00\x00"
+            ),
+        },
+        {
+            "type_": "BOLOS_TAG_DERIVEPATH",
+            "value": {
+                "curve": Curve.secp256k1 | Curve.slip21,
+                "paths": [""],
+                "paths_slip21": ["VANADIUM"],
             },
-        ]
-    )
+        },
+    ]
+    params2 = AppParams.build(params2_values)
     params2_expected = (
         b"\x01\x08\x56\x61\x6E\x61\x64\x69\x75\x6D\x02\x05\x30\x2E\x30"
         b"\x2E\x31\x03\x29\x01\x00\x00\x00\x00\xFF\xFF\xFF\x00\x00\x18"
@@ -292,6 +500,7 @@ def main():
         b"\x04\x0C\x09\x00\x89\x00\x56\x41\x4E\x41\x44\x49\x55\x4D"
     )
     assert params2 == params2_expected
+    assert build_app_params(params2_values) == params2_expected
 
 
 if __name__ == "__main__":
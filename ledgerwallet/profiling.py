@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from ledgerwallet.metrics import ExchangeObserver, SecureExchange
+
+if TYPE_CHECKING:
+    import cProfile
+
+
+class DeviceWaitTimer(ExchangeObserver):
+    """Total time spent waiting for the device, in transport exchanges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.exchanges = 0
+        self.wait = 0.0
+
+    def _add(self, duration: float):
+        with self._lock:
+            self.exchanges += 1
+            self.wait += duration
+
+    def on_exchange(self, command: bytes, response: bytes, duration: float):
+        self._add(duration)
+
+    def on_exchange_error(self, command: bytes, error: Exception, duration: float):
+        self._add(duration)
+
+    def on_secure_exchange(self, exchange: SecureExchange):
+        # Secure APDU of a DaemonClient are exchanged by the daemon, without
+        # going through raw_exchange. Other secure APDU are already counted.
+        if exchange.wrapped_command_length is None:
+            self._add(exchange.duration)
+
+
+class HostDeviceProfile(object):
+    """Profile the host code with cProfile, and time the device separately.
+
+    The timer must be registered as an observer of the profiled clients.
+    Wall time outside of transport exchanges is attributed to the host.
+    """
+
+    def __init__(self):
+        self.timer = DeviceWaitTimer()
+        self.profiler: Optional["cProfile.Profile"] = None
+        self.wall = 0.0
+        self.cpu = 0.0
+        self._start_wall = 0.0
+        self._start_cpu = 0.0
+
+    def start(self):
+        import cProfile
+
+        self.profiler = cProfile.Profile()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.profiler.enable()
+
+    def stop(self):
+        assert self.profiler is not None
+        self.profiler.disable()
+        self.wall = time.perf_counter() - self._start_wall
+        self.cpu = time.process_time() - self._start_cpu
+
+    @property
+    def device_wait(self) -> float:
+        return min(self.timer.wait, self.wall)
+
+    @property
+    def host(self) -> float:
+        return self.wall - self.device_wait
+
+    def summary(self) -> str:
+        if self.wall == 0:
+            return "Nothing has been profiled"
+        lines = [
+            "Wall time {:.3f} s: host {:.3f} s ({:.0%}, {:.3f} s CPU), "
+            "device wait {:.3f} s ({:.0%})".format(
+                self.wall,
+                self.host,
+                self.host / self.wall,
+                self.cpu,
+                self.device_wait,
+                self.device_wait / self.wall,
+            )
+        ]
+        if self.timer.exchanges > 0:
+            lines.append(
+                "{} APDU exchanged, {:.2f} ms average wait".format(
+                    self.timer.exchanges,
+                    self.timer.wait / self.timer.exchanges * 1000,
+                )
+            )
+        return "\n".join(lines)
+
+    def dump(self, filename: str):
+        """Write the profile in the pstats format (snakeviz, gprof2dot, ...)."""
+        assert self.profiler is not None
+        self.profiler.dump_stats(filename)
@@ -0,0 +1,218 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+from ledgerwallet.capabilities import DeviceCapabilities
+from ledgerwallet.transport import HidDevice, TcpDevice
+from ledgerwallet.transport.device import Device
+from ledgerwallet.utils import parse_version_info
+
+REGISTRY_FILENAME = "devices.json"
+
+
+class DeviceNotFoundException(Exception):
+    pass
+
+
+class DeviceEntry(object):
+    """A registered device: a user label bound to a stable device identity.
+
+    The transport path is only the last known location of the device. HID paths
+    change when the device is plugged again, so the serial number and product
+    string reported by the USB stack are used to find it again. Ledger devices
+    of a model all report the same ones: a device found this way has to be
+    identified before the cached values of the entry are used.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        transport: str,
+        path: str,
+        serial_number: Optional[str] = None,
+        product: Optional[str] = None,
+        target_id: Optional[int] = None,
+        version_info: Optional[bytes] = None,
+        capabilities: Optional[DeviceCapabilities] = None,
+    ):
+        self.label = label
+        self.transport = transport
+        self.path = path
+        self.serial_number = serial_number
+        self.product = product
+        self.target_id = target_id
+        self.version_info = version_info
+        self.capabilities = capabilities
+
+    @classmethod
+    def from_dict(cls, label: str, entry: Dict) -> "DeviceEntry":
+        version_info = entry.get("version_info")
+        capabilities = entry.get("capabilities")
+        return cls(
+            label,
+            entry["transport"],
+            entry["path"],
+            serial_number=entry.get("serial_number"),
+            product=entry.get("product"),
+            target_id=entry.get("target_id"),
+            version_info=bytes.fromhex(version_info) if version_info else None,
+            capabilities=(
+                DeviceCapabilities.from_dict(capabilities) if capabilities else None
+            ),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "transport": self.transport,
+            "path": self.path,
+            "serial_number": self.serial_number,
+            "product": self.product,
+            "target_id": self.target_id,
+            "version_info": self.version_info.hex() if self.version_info else None,
+            "capabilities": (
+                self.capabilities.to_dict() if self.capabilities else None
+            ),
+        }
+
+    def get_version_info(self):
+        """Return the cached VersionInfo, or None if nothing has been cached."""
+        if self.version_info is None:
+            return None
+        return parse_version_info(self.version_info)
+
+    def matches(self, device: HidDevice) -> bool:
+        if self.serial_number is None:
+            return False
+        return (
+            device.serial_number == self.serial_number
+            and device.product == self.product
+        )
+
+
+class DeviceRegistry(object):
+    """Index of known devices, persisted as a JSON file."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.entries: Dict[str, DeviceEntry] = {}
+        if os.path.exists(filename):
+            with open(filename, "r") as f:
+                for label, entry in json.load(f).items():
+                    self.entries[label] = DeviceEntry.from_dict(label, entry)
+
+    def save(self):
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        content = {label: entry.to_dict() for label, entry in self.entries.items()}
+        # Write to a temporary file first so that an interrupted write never
+        # leaves a truncated registry behind.
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump(content, f, indent=2, sort_keys=True)
+        os.replace(tmp_filename, self.filename)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self.entries
+
+    def get(self, label: str) -> DeviceEntry:
+        try:
+            return self.entries[label]
+        except KeyError:
+            raise DeviceNotFoundException(
+                "No device is registered with label '{}'.".format(label)
+            )
+
+    def list(self) -> List[DeviceEntry]:
+        return [self.entries[label] for label in sorted(self.entries)]
+
+    def register(
+        self,
+        label: str,
+        device: Device,
+        version_info: Optional[bytes] = None,
+        capabilities: Optional[DeviceCapabilities] = None,
+    ) -> DeviceEntry:
+        if isinstance(device, HidDevice):
+            entry = DeviceEntry(
+                label,
+                "hid",
+                device.path.decode(),
+                serial_number=device.serial_number,
+                product=device.product,
+            )
+        elif isinstance(device, TcpDevice):
+            entry = DeviceEntry(
+                label, "tcp", "{}:{}".format(device.server, device.port)
+            )
+        else:
+            raise TypeError(
+                "Cannot register a device of type {}".format(type(device).__name__)
+            )
+        if version_info is not None:
+            entry.version_info = version_info
+            entry.target_id = parse_version_info(version_info).target_id
+        entry.capabilities = capabilities
+        self.entries[label] = entry
+        self.save()
+        return entry
+
+    def remove(self, label: str):
+        self.get(label)
+        del self.entries[label]
+        self.save()
+
+    def find_device(self, label: str) -> Device:
+        """Return the device registered under the given label.
+
+        No APDU is exchanged: the last known path is tried first, then HID
+        devices are matched on their USB serial number and product string. A
+        device which has moved is only saved by `confirm_device`, once it has
+        been identified.
+        """
+        entry = self.get(label)
+        if entry.transport == "tcp":
+            return TcpDevice(entry.path)
+
+        candidates = HidDevice.enumerate_devices()
+        for device in candidates:
+            if device.path.decode() == entry.path and (
+                entry.serial_number is None or entry.matches(device)
+            ):
+                return device
+
+        matching = [device for device in candidates if entry.matches(device)]
+        if len(matching) == 0:
+            raise DeviceNotFoundException("Device '{}' is not connected.".format(label))
+        if len(matching) > 1:
+            raise DeviceNotFoundException(
+                "Several connected devices match '{}', cannot tell them apart.".format(
+                    label
+                )
+            )
+        return matching[0]
+
+    def is_relocated(self, label: str, device: Device) -> bool:
+        """Whether the device has been found at another path than the saved one."""
+        return (
+            isinstance(device, HidDevice)
+            and device.path.decode() != self.get(label).path
+        )
+
+    def confirm_device(self, label: str, device: Device, target_id: int):
+        """Save the new path of a relocated device, once its target ID is known.
+
+        Raise DeviceNotFoundException if it is another model than the
+        registered device.
+        """
+        assert isinstance(device, HidDevice)
+        entry = self.get(label)
+        if entry.target_id is not None and entry.target_id != target_id:
+            raise DeviceNotFoundException(
+                "Device '{}' is not connected, found target ID {:#x}.".format(
+                    label, target_id
+                )
+            )
+        entry.path = device.path.decode()
+        entry.target_id = target_id
+        self.save()
@@ -0,0 +1,220 @@
+import heapq
+import random
+import re
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from ledgerwallet.client import SCP_MAC_LENGTH
+from ledgerwallet.transport.record import (
+    DIRECTION_COMMAND,
+    DIRECTION_RESPONSE,
+    TRACE_MAGIC,
+    TraceRecord,
+    read_exchanges,
+)
+from ledgerwallet.utils import LedgerIns, percentile
+
+# Minimum size added by the secure channel to a payload: MAC and 1 byte of padding
+SCP_MIN_OVERHEAD = SCP_MAC_LENGTH + 1
+
+LOG_LINE = re.compile(r"(=>|<=) ([0-9a-fA-F]*)\s*$")
+
+# Values kept to estimate percentiles, whatever the length of the trace
+RESERVOIR_SIZE = 4096
+
+
+class Exchange(NamedTuple):
+    # Position of the exchange in the source, from 0
+    number: int
+    command: bytes
+    response: bytes
+    # Nanoseconds, None when the source has no timing information
+    latency: Optional[int]
+
+    @property
+    def ins(self) -> int:
+        return self.command[1] if len(self.command) > 1 else -1
+
+    @property
+    def status_word(self) -> int:
+        return int.from_bytes(self.response[-2:], "big")
+
+
+class Distribution(object):
+    """Count, sum, minimum and maximum of a stream of values, and percentiles.
+
+    Percentiles are exact up to `size` values. Beyond, they are estimated from
+    a uniform sample of the values (reservoir sampling), so that memory does
+    not grow with the length of the trace.
+    """
+
+    def __init__(self, size: int = RESERVOIR_SIZE):
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self._size = size
+        self._samples: List[int] = []
+        self._sorted = True
+        # Seeded: analyzing a trace twice gives the same estimates
+        self._random = random.Random(0)
+
+    def add(self, value: int):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self._samples) < self._size:
+            self._samples.append(value)
+        else:
+            index = self._random.randrange(self.count)
+            if index >= self._size:
+                return
+            self._samples[index] = value
+        self._sorted = False
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if percent >= 100:
+            return self.max
+        if percent <= 0:
+            return self.min
+        if not self._sorted:
+            self._samples.sort()
+            self._sorted = True
+        return percentile(self._samples, percent)
+
+
+class InsStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.command_bytes = 0
+        self.response_bytes = 0
+        self.latency = Distribution()
+
+    def add(self, exchange: Exchange):
+        self.count += 1
+        self.command_bytes += len(exchange.command)
+        self.response_bytes += len(exchange.response)
+        if exchange.status_word != 0x9000:
+            self.errors += 1
+        if exchange.latency is not None:
+            self.latency.add(exchange.latency)
+
+    def latency_percentile(self, percent: float) -> Optional[float]:
+        return self.latency.percentile(percent)
+
+
+class TraceAnalysis(object):
+    """Statistics over a stream of APDU exchanges.
+
+    Exchanges are consumed one at a time, and only aggregated values are kept:
+    memory does not depend on the length of the trace.
+    """
+
+    def __init__(self, slowest: int = 10):
+        self.by_ins: Dict[int, InsStats] = {}
+        self.count = 0
+        self.timed = False
+        self.duration = 0
+        self.device_time = 0
+        # Host time between a response and the next command
+        self.gaps = Distribution()
+        self.secure_count = 0
+        self.secure_bytes = 0
+        self.scp_overhead = 0
+        self.total_bytes = 0
+        self.slowest: List[Tuple[int, int, Exchange]] = []
+        self._max_slowest = slowest
+
+    def add(self, exchange: Exchange, gap: Optional[int] = None):
+        self.count += 1
+        self.by_ins.setdefault(exchange.ins, InsStats()).add(exchange)
+        size = len(exchange.command) + len(exchange.response)
+        self.total_bytes += size
+        if exchange.ins == LedgerIns.SECUINS:
+            self.secure_count += 1
+            self.secure_bytes += size
+            # Command payload is wrapped, and so is response data, if any
+            self.scp_overhead += SCP_MIN_OVERHEAD
+            if len(exchange.response) > 2:
+                self.scp_overhead += SCP_MIN_OVERHEAD
+        if gap is not None:
+            self.gaps.add(gap)
+        if exchange.latency is not None:
+            self.timed = True
+            self.device_time += exchange.latency
+            entry = (exchange.latency, -exchange.number, exchange)
+            if len(self.slowest) < self._max_slowest:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    @property
+    def host_time(self) -> int:
+        return self.gaps.total
+
+    @property
+    def scp_overhead_ratio(self) -> float:
+        if self.secure_bytes == 0:
+            return 0.0
+        return self.scp_overhead / self.secure_bytes
+
+    def slowest_exchanges(self) -> List[Exchange]:
+        return [entry[2] for entry in sorted(self.slowest, reverse=True)]
+
+
+def read_apdu_log(log: IO[str]) -> Iterator[Tuple[TraceRecord, TraceRecord]]:
+    """Iterate over exchanges logged by `utils.enable_apdu_log`.
+
+    Logs have no timing information: all timestamps are 0.
+    """
+    command = None
+    for line in log:
+        match = LOG_LINE.search(line)
+        if match is None:
+            continue
+        data = bytes.fromhex(match.group(2))
+        if match.group(1) == "=>":
+            command = TraceRecord(DIRECTION_COMMAND, 0, data)
+        elif command is not None:
+            yield command, TraceRecord(DIRECTION_RESPONSE, 0, data)
+            command = None
+
+
+def analyze_exchanges(
+    exchanges: Iterator[Tuple[TraceRecord, TraceRecord]],
+    timed: bool = True,
+    slowest: int = 10,
+) -> TraceAnalysis:
+    analysis = TraceAnalysis(slowest)
+    first = None
+    previous = None
+    for number, (command, response) in enumerate(exchanges):
+        if not timed:
+            analysis.add(Exchange(number, command.data, response.data, None))
+            continue
+        gap = None
+        if previous is not None:
+            gap = command.timestamp - previous.timestamp
+        if first is None:
+            first = command
+        latency = response.timestamp - command.timestamp
+        analysis.add(Exchange(number, command.data, response.data, latency), gap)
+        previous = response
+    if first is not None and previous is not None:
+        analysis.duration = previous.timestamp - first.timestamp
+    return analysis
+
+
+def analyze_file(filename: str, slowest: int = 10) -> TraceAnalysis:
+    """Analyze a trace recorded with `RecordingDevice`, or an APDU log."""
+    with open(filename, "rb") as f:
+        is_trace = f.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+    if is_trace:
+        return analyze_exchanges(read_exchanges(filename), slowest=slowest)
+    with open(filename, "r") as log:
+        return analyze_exchanges(read_apdu_log(log), timed=False, slowest=slowest)
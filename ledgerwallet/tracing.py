@@ -0,0 +1,258 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from enum import Enum
+from typing import Dict, List, Optional
+
+
+class TraceFormat(Enum):
+    # Trace event format of chrome://tracing and Perfetto
+    CHROME = "chrome"
+    # OTLP/JSON, as accepted by OpenTelemetry collectors
+    OTLP = "otlp"
+
+
+class Span(object):
+    """A timed operation, nested in the span which was open when it started.
+
+    Spans are used as context managers, or ended explicitly with `end`.
+    """
+
+    __slots__ = (
+        "name",
+        "attributes",
+        "span_id",
+        "parent_id",
+        "thread_id",
+        "start_ns",
+        "end_ns",
+        "error",
+        "_tracer",
+    )
+
+    def __init__(
+        self, tracer: "Tracer", name: str, parent_id: Optional[int], **attributes
+    ):
+        self._tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(tracer._ids)
+        self.parent_id = parent_id
+        self.thread_id = threading.get_ident()
+        self.error: Optional[str] = None
+        self.end_ns: Optional[int] = None
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds, of an ended span."""
+        assert self.end_ns is not None
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, name: str, value):
+        self.attributes[name] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        self.end_ns = time.perf_counter_ns()
+        if error is not None:
+            self.error = "{}: {}".format(type(error).__name__, error)
+        self._tracer._end(self)
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end(exc_value)
+        return False
+
+
+class _NoopSpan(object):
+    """Returned by `span` when tracing is disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, name: str, value):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(object):
+    """Collect the spans ended in all threads."""
+
+    def __init__(self, service_name: str = "ledgerwallet"):
+        self.service_name = service_name
+        self.spans: List[Span] = []
+        self.trace_id = os.urandom(16)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        # Spans are timed with the performance counter, this converts them to
+        # wall clock time
+        self.start_ns = time.perf_counter_ns()
+        self.epoch_offset_ns = time.time_ns() - self.start_ns
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start_span(self, name: str, **attributes) -> Span:
+        stack = self._stack()
+        span = Span(self, name, stack[-1].span_id if stack else None, **attributes)
+        stack.append(span)
+        return span
+
+    def _end(self, span: Span):
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+        with self._lock:
+            self.spans.append(span)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def set_tracer(tracer: Optional[Tracer]):
+    """Record spans of all threads to a tracer, or disable tracing with None."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Start a span, which does nothing when tracing is disabled."""
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(name, **attributes)
+
+
+def traced(name: str):
+    """Decorate a function to run it in a span."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.start_span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _sorted_spans(tracer: Tracer) -> List[Span]:
+    with tracer._lock:
+        return sorted(tracer.spans, key=lambda span: span.start_ns)
+
+
+def chrome_trace(tracer: Tracer) -> Dict:
+    """Spans as complete events of the Chrome trace event format."""
+    pid = os.getpid()
+    events = []
+    for span in _sorted_spans(tracer):
+        assert span.end_ns is not None
+        args = dict(span.attributes)
+        if span.error is not None:
+            args["error"] = span.error
+        events.append(
+            {
+                "name": span.name,
+                "cat": tracer.service_name,
+                "ph": "X",
+                "ts": (span.start_ns - tracer.start_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": args,
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP/JSON
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+def otlp_trace(tracer: Tracer) -> Dict:
+    """Spans as an OTLP/JSON export request."""
+    trace_id = tracer.trace_id.hex()
+    spans = []
+    for span in _sorted_spans(tracer):
+        assert span.end_ns is not None
+        otlp_span = {
+            "traceId": trace_id,
+            "spanId": span.span_id.to_bytes(8, "big").hex(),
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns + tracer.epoch_offset_ns),
+            "endTimeUnixNano": str(span.end_ns + tracer.epoch_offset_ns),
+            "attributes": _otlp_attributes(
+                dict(span.attributes, **{"thread.id": span.thread_id})
+            ),
+        }
+        if span.parent_id is not None:
+            otlp_span["parentSpanId"] = span.parent_id.to_bytes(8, "big").hex()
+        if span.error is not None:
+            # STATUS_CODE_ERROR
+            otlp_span["status"] = {"code": 2, "message": span.error}
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes(
+                        {"service.name": tracer.service_name}
+                    )
+                },
+                "scopeSpans": [{"scope": {"name": "ledgerwallet"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def write_trace(
+    tracer: Tracer, filename: str, trace_format: TraceFormat = TraceFormat.CHROME
+):
+    if trace_format == TraceFormat.CHROME:
+        trace = chrome_trace(tracer)
+    else:
+        trace = otlp_trace(tracer)
+    with open(filename, "w") as f:
+        json.dump(trace, f)
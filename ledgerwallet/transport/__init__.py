@@ -1,14 +1,19 @@
 from contextlib import contextmanager
+from typing import Optional
 
 from .device import Device
 from .file import FileDevice
 from .hid import HidDevice
+from .lock import DeviceLock, DeviceLockTimeout
 from .tcp import TcpDevice
 
 DEVICE_CLASSES = [TcpDevice, HidDevice]
 
 __all__ = [
+    "DeviceLock",
+    "DeviceLockTimeout",
     "FileDevice",
+    "lock_device",
 ]
 
 
@@ -19,11 +24,26 @@ def enumerate_devices():
     return devices
 
 
+def lock_device(dev: Device, timeout: Optional[float] = None) -> DeviceLock:
+    """Lock a device against accesses from other processes.
+
+    The lock is reentrant: clients of the device in the same process share it.
+    The returned lock has to be released once the device is closed.
+    """
+    name = dev.get_name()
+    lock = DeviceLock(name if name is not None else "", timeout, reentrant=True)
+    if name is not None:
+        lock.acquire()
+    return lock
+
+
 @contextmanager
-def open_device(dev: Device):
-    """Open a device in a context manager."""
+def open_device(dev: Device, lock_timeout: Optional[float] = None):
+    """Open a device in a context manager, holding the lock of the device."""
+    lock = lock_device(dev, lock_timeout)
     try:
         dev.open()
         yield dev
     finally:
         dev.close()
+        lock.release()
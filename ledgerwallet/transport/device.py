@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 
 class Device(ABC):
@@ -7,6 +8,14 @@ class Device(ABC):
     def enumerate_devices(cls):
         raise NotImplementedError
 
+    def get_name(self) -> Optional[str]:
+        """Return a name identifying the device while it is connected.
+
+        It is used as the key of the lock preventing concurrent accesses to the
+        device. Devices returning None are not locked.
+        """
+        return None
+
     @abstractmethod
     def open(self):
         raise NotImplementedError
@@ -0,0 +1,163 @@
+import gzip
+import io
+import mmap
+import os
+import struct
+from enum import Enum
+from typing import IO, BinaryIO, Iterator, Optional, Union
+
+DUMP_MAGIC = b"LWAPDU\x00\x01"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DUMP_BUFFER_SIZE = 1 << 20
+
+RECORD_LENGTH = struct.Struct(">H")
+
+
+class DumpFormat(str, Enum):
+    HEX = "hex"
+    BINARY = "binary"
+
+
+class DumpCompression(str, Enum):
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+class DumpFormatError(Exception):
+    pass
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise DumpFormatError(
+            "zstd compression requires the zstandard package"
+            " (pip install ledgerwallet[zstd])"
+        )
+    return zstandard
+
+
+class DumpWriter(object):
+    """Write APDUs to an offline dump.
+
+    Dumps are either hex (one APDU per line) or binary (a magic followed by
+    length-prefixed APDUs), optionally compressed with gzip or zstd. `out` is
+    a binary file, or a text file for uncompressed hex dumps.
+    """
+
+    def __init__(
+        self,
+        out: IO,
+        dump_format: DumpFormat = DumpFormat.HEX,
+        compression: Optional[DumpCompression] = None,
+    ):
+        self.file = out
+        self.dump_format = DumpFormat(dump_format)
+        self.out: Union[IO, gzip.GzipFile] = out
+        if compression == DumpCompression.GZIP:
+            # mtime is zeroed for dumps to be reproducible
+            self.out = gzip.GzipFile(fileobj=out, mode="wb", mtime=0)
+        elif compression == DumpCompression.ZSTD:
+            zstandard = _import_zstandard()
+            self.out = zstandard.ZstdCompressor().stream_writer(out, closefd=False)
+        if self.dump_format == DumpFormat.BINARY:
+            if isinstance(self.out, io.TextIOBase):
+                raise DumpFormatError("Binary dumps must be written to a binary file")
+            self.out.write(DUMP_MAGIC)
+
+    def write(self, apdu: bytes):
+        if self.dump_format == DumpFormat.BINARY:
+            self.out.write(RECORD_LENGTH.pack(len(apdu)) + apdu)
+        elif isinstance(self.out, io.TextIOBase):
+            self.out.write(apdu.hex() + "\n")
+        else:
+            self.out.write(apdu.hex().encode() + b"\n")
+
+    def close(self):
+        if self.out is not self.file:
+            self.out.close()
+        self.file.close()
+
+
+def _read_binary(stream: BinaryIO) -> Iterator[bytes]:
+    while True:
+        header = stream.read(RECORD_LENGTH.size)
+        if len(header) == 0:
+            break
+        if len(header) != RECORD_LENGTH.size:
+            raise DumpFormatError("Truncated dump")
+        (length,) = RECORD_LENGTH.unpack(header)
+        apdu = stream.read(length)
+        if len(apdu) != length:
+            raise DumpFormatError("Truncated dump")
+        yield apdu
+
+
+def _read_mapped(buffer: mmap.mmap) -> Iterator[bytes]:
+    offset = len(DUMP_MAGIC)
+    end = len(buffer)
+    while offset < end:
+        if offset + RECORD_LENGTH.size > end:
+            raise DumpFormatError("Truncated dump")
+        (length,) = RECORD_LENGTH.unpack_from(buffer, offset)
+        offset += RECORD_LENGTH.size
+        if offset + length > end:
+            raise DumpFormatError("Truncated dump")
+        yield buffer[offset : offset + length]
+        offset += length
+
+
+def _read_hex(stream: BinaryIO) -> Iterator[bytes]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield bytes.fromhex(line.decode())
+            except ValueError:
+                raise DumpFormatError("Invalid hex dump line: {!r}".format(line))
+
+
+def _read_stream(stream: BinaryIO) -> Iterator[bytes]:
+    magic = stream.peek(len(DUMP_MAGIC))[: len(DUMP_MAGIC)]  # type: ignore
+    if magic == DUMP_MAGIC:
+        stream.read(len(DUMP_MAGIC))
+        return _read_binary(stream)
+    return _read_hex(stream)
+
+
+def read_dump(dump: Union[str, BinaryIO]) -> Iterator[bytes]:
+    """Iterate over the APDUs of a dump, whatever its format.
+
+    The format and compression are detected from the content. Uncompressed
+    binary dumps are memory-mapped, others are streamed.
+    """
+    if isinstance(dump, str):
+        with open(dump, "rb", buffering=DUMP_BUFFER_SIZE) as f:
+            yield from read_dump(f)
+        return
+
+    if not hasattr(dump, "peek"):
+        dump = io.BufferedReader(dump, DUMP_BUFFER_SIZE)  # type: ignore
+    magic = dump.peek(len(DUMP_MAGIC))  # type: ignore
+    if magic.startswith(GZIP_MAGIC):
+        with gzip.GzipFile(fileobj=dump, mode="rb") as stream:
+            yield from _read_stream(io.BufferedReader(stream, DUMP_BUFFER_SIZE))
+    elif magic.startswith(ZSTD_MAGIC):
+        zstandard = _import_zstandard()
+        decompressor = zstandard.ZstdDecompressor()
+        with decompressor.stream_reader(dump, closefd=False) as stream:
+            yield from _read_stream(io.BufferedReader(stream, DUMP_BUFFER_SIZE))
+    elif magic.startswith(DUMP_MAGIC) and _is_regular_file(dump):
+        with mmap.mmap(dump.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from _read_mapped(buffer)
+    else:
+        yield from _read_stream(dump)
+
+
+def _is_regular_file(f: BinaryIO) -> bool:
+    try:
+        return f.seekable() and f.tell() == 0 and os.fstat(f.fileno()).st_size > 0
+    except (OSError, ValueError):
+        return False
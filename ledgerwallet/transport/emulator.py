@@ -0,0 +1,401 @@
+import hashlib
+import os
+import struct
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..crypto.ecc import PrivateKey, PublicKey
+from ..crypto.scp import SCP
+from ..params import parse_app_params
+from ..simpleserver import (
+    CERT_ROLE_DEVICE,
+    CERT_ROLE_DEVICE_EPHEMERAL,
+    CERT_ROLE_SIGNER,
+    CERT_ROLE_SIGNER_EPHEMERAL,
+)
+from ..utils import LedgerIns, LedgerSecureIns, VersionInfo, serialize, unserialize
+from .device import Device
+
+SW_OK = 0x9000
+SW_SECURITY_STATUS_NOT_SATISFIED = 0x6982
+SW_CONDITIONS_NOT_SATISFIED = 0x6985
+SW_WRONG_DATA = 0x6A80
+SW_NOT_ENOUGH_SPACE = 0x6A84
+SW_APP_NOT_FOUND = 0x6984
+SW_WRONG_TARGET_ID = 0x6484
+SW_INS_NOT_SUPPORTED = 0x6D00
+SW_CLA_NOT_SUPPORTED = 0x6E00
+
+# Handles the data and P1 of a command, returns the response data and status word
+Handler = Callable[[bytes, int], Tuple[bytes, int]]
+
+# Maximum size of a LIST_APPS response
+LIST_APPS_PAGE_SIZE = 0xE0
+
+
+class EmulatedApp(object):
+    def __init__(self, name: str, flags: int, code_data_hash: bytes, full_hash: bytes):
+        self.name = name
+        self.flags = flags
+        self.code_data_hash = code_data_hash
+        self.full_hash = full_hash
+        self.size = 0
+
+
+class EmulatorDevice(Device):
+    """In-process emulation of the device side of the BOLOS protocol.
+
+    It implements GET_VERSION, VALIDATE_TARGET_ID, the SCP v2 mutual
+    authentication (as performed with a SimpleServer), and the secure commands
+    needed to list, install and delete apps and to get memory information. It
+    lets the whole install flow, including the secure channel, be tested and
+    benchmarked without any hardware.
+
+    Each APDU takes `latency` seconds plus `byte_latency` seconds per byte of
+    command and response.
+
+    If `custom_ca` is set, only this (uncompressed) public key is accepted as
+    the signer of the host certificate, otherwise any signer is trusted.
+    """
+
+    def __init__(
+        self,
+        target_id: int = 0x33100004,
+        latency: float = 0.0,
+        byte_latency: float = 0.0,
+        custom_ca: Optional[bytes] = None,
+        memory_size: int = 0x100000,
+        system_size: int = 0x20000,
+        num_app_slots: int = 30,
+        se_version: str = "1.1.0",
+        mcu_version: str = "4.00",
+    ):
+        self.target_id = target_id
+        self.latency = latency
+        self.byte_latency = byte_latency
+        self.custom_ca = custom_ca
+        self.memory_size = memory_size
+        self.system_size = system_size
+        self.num_app_slots = num_app_slots
+        self.se_version = se_version
+        self.mcu_version = mcu_version
+
+        self.device_key = PrivateKey()
+        self.apps: List[EmulatedApp] = []
+        self.response = b""
+        self.is_open = False
+        self._reset_session()
+
+    @classmethod
+    def enumerate_devices(cls):
+        return []
+
+    def _reset_session(self):
+        self.scp: Optional[SCP] = None
+        self.server_nonce: Optional[bytes] = None
+        self.device_nonce: Optional[bytes] = None
+        self.signer_public: Optional[PublicKey] = None
+        self.server_ephemeral: Optional[PublicKey] = None
+        self.device_ephemeral: Optional[PrivateKey] = None
+        self._reset_install()
+        self._list_apps_pages: List[bytes] = []
+
+    def _reset_install(self):
+        self.install_header: Optional[Tuple[int, int, int, int]] = None
+        self.install_buffer = bytearray()
+        self.load_offset = 0
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def write(self, data: bytes):
+        self.response = self.process(data)
+
+    def read(self, timeout: int = 0) -> bytes:
+        return self.response
+
+    def exchange(self, data: bytes, timeout: int = 0) -> bytes:
+        self.write(data)
+        response = self.read()
+        delay = self.latency + self.byte_latency * (len(data) + len(response))
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+    @property
+    def version_info(self) -> bytes:
+        flags = {"is_onboarded": True, "trust_custom_ca": self.custom_ca is not None}
+        return VersionInfo.build(
+            dict(
+                target_id=self.target_id,
+                se_version=self.se_version,
+                flags=flags,
+                mcu_version=self.mcu_version,
+            )
+        )
+
+    @property
+    def free_size(self) -> int:
+        used = sum(app.size for app in self.apps)
+        return self.memory_size - self.system_size - used
+
+    def process(self, apdu: bytes) -> bytes:
+        """Process a command APDU and return the response, status word included."""
+        if len(apdu) < 5 or len(apdu) != 5 + apdu[4]:
+            return struct.pack(">H", SW_WRONG_DATA)
+        cla, ins, p1, p2 = apdu[:4]
+        data = apdu[5:]
+        if cla != 0xE0:
+            return struct.pack(">H", SW_CLA_NOT_SUPPORTED)
+
+        handlers: Dict[int, Handler] = {
+            LedgerIns.SECUINS: self._secure_ins,
+            LedgerIns.GET_VERSION: self._get_version,
+            LedgerIns.VALIDATE_TARGET_ID: self._validate_target_id,
+            LedgerIns.INITIALIZE_AUTHENTICATION: self._initialize_authentication,
+            LedgerIns.VALIDATE_CERTIFICATE: self._validate_certificate,
+            LedgerIns.GET_CERTIFICATE: self._get_certificate,
+            LedgerIns.MUTUAL_AUTHENTICATE: self._mutual_authenticate,
+            LedgerIns.RUN_APP: self._run_app,
+        }
+        handler = handlers.get(ins)
+        if handler is None:
+            return struct.pack(">H", SW_INS_NOT_SUPPORTED)
+        response, sw = handler(data, p1)
+        return response + struct.pack(">H", sw)
+
+    def _get_version(self, data: bytes, p1: int):
+        return self.version_info, SW_OK
+
+    def _validate_target_id(self, data: bytes, p1: int):
+        self._reset_session()
+        if data != struct.pack(">I", self.target_id):
+            return b"", SW_WRONG_TARGET_ID
+        return b"", SW_OK
+
+    def _initialize_authentication(self, data: bytes, p1: int):
+        if len(data) != 8:
+            return b"", SW_WRONG_DATA
+        self.server_nonce = data
+        self.device_nonce = os.urandom(8)
+        return b"\x00" * 4 + self.device_nonce, SW_OK
+
+    def _validate_certificate(self, data: bytes, p1: int):
+        if self.server_nonce is None or self.device_nonce is None:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        try:
+            public_key, data = unserialize(data)
+            signature, _ = unserialize(data)
+            certificate_key = PublicKey(public_key)
+        except (AssertionError, IndexError, ValueError):
+            return b"", SW_WRONG_DATA
+
+        if p1 != 0x80:
+            # Signer certificate, self-signed
+            signed_data = bytes([CERT_ROLE_SIGNER]) + public_key
+            if not certificate_key.verify(signed_data, signature):
+                return b"", SW_SECURITY_STATUS_NOT_SATISFIED
+            if self.custom_ca is not None and public_key != self.custom_ca:
+                return b"", SW_SECURITY_STATUS_NOT_SATISFIED
+            self.signer_public = certificate_key
+            return b"", SW_OK
+
+        # Ephemeral certificate, signed by the signer
+        if self.signer_public is None:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        signed_data = (
+            bytes([CERT_ROLE_SIGNER_EPHEMERAL])
+            + self.server_nonce
+            + self.device_nonce
+            + public_key
+        )
+        if not self.signer_public.verify(signed_data, signature):
+            return b"", SW_SECURITY_STATUS_NOT_SATISFIED
+        self.server_ephemeral = certificate_key
+        return b"", SW_OK
+
+    def _get_certificate(self, data: bytes, p1: int):
+        if self.server_ephemeral is None:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        if p1 != 0x80:
+            header = b"\x01"
+            public_key = self.device_key.pubkey.serialize(compressed=False)
+            signed_data = bytes([CERT_ROLE_DEVICE]) + header + public_key
+        else:
+            if self.server_nonce is None or self.device_nonce is None:
+                return b"", SW_CONDITIONS_NOT_SATISFIED
+            self.device_ephemeral = PrivateKey()
+            header = b""
+            public_key = self.device_ephemeral.pubkey.serialize(compressed=False)
+            signed_data = (
+                bytes([CERT_ROLE_DEVICE_EPHEMERAL])
+                + self.device_nonce
+                + self.server_nonce
+                + public_key
+            )
+        signature = self.device_key.sign(signed_data)
+        return serialize(header) + serialize(public_key) + serialize(signature), SW_OK
+
+    def _mutual_authenticate(self, data: bytes, p1: int):
+        if self.server_ephemeral is None or self.device_ephemeral is None:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        secret = self.device_ephemeral.exchange(self.server_ephemeral)
+        self.scp = SCP(secret)
+        return b"", SW_OK
+
+    def _run_app(self, data: bytes, p1: int):
+        name = data.decode(errors="replace")
+        if not any(app.name == name for app in self.apps):
+            return b"", SW_APP_NOT_FOUND
+        return b"", SW_OK
+
+    def _secure_ins(self, data: bytes, p1: int):
+        if self.scp is None:
+            return b"", SW_SECURITY_STATUS_NOT_SATISFIED
+        try:
+            command = self.scp.unwrap(data)
+        except Exception:
+            self._reset_session()
+            return b"", SW_SECURITY_STATUS_NOT_SATISFIED
+        if len(command) == 0:
+            return b"", SW_WRONG_DATA
+
+        handlers: Dict[int, Handler] = {
+            LedgerSecureIns.GET_VERSION: self._get_version,
+            LedgerSecureIns.GET_MEMORY_INFORMATION: self._get_memory_information,
+            LedgerSecureIns.LIST_APPS: self._list_apps,
+            LedgerSecureIns.LIST_APPS_CONTINUE: self._list_apps_continue,
+            LedgerSecureIns.CREATE_APP: self._create_app,
+            LedgerSecureIns.SET_LOAD_OFFSET: self._set_load_offset,
+            LedgerSecureIns.LOAD: self._load,
+            LedgerSecureIns.COMMIT: self._commit,
+            LedgerSecureIns.DELETE_APP: self._delete_app,
+            LedgerSecureIns.DELETE_APP_BY_HASH: self._delete_app_by_hash,
+        }
+        handler = handlers.get(command[0])
+        if handler is None:
+            return b"", SW_INS_NOT_SUPPORTED
+        response, sw = handler(command[1:], p1)
+        if sw == SW_OK and len(response) > 0:
+            response = self.scp.wrap(response)
+        return response, sw
+
+    def _get_memory_information(self, data: bytes, p1: int):
+        applications_size = sum(app.size for app in self.apps)
+        response = struct.pack(
+            ">IIIII",
+            self.system_size,
+            applications_size,
+            self.free_size,
+            len(self.apps),
+            self.num_app_slots,
+        )
+        return response, SW_OK
+
+    def _list_apps(self, data: bytes, p1: int):
+        self._list_apps_pages = []
+        page = b""
+        for app in self.apps:
+            name = app.name.encode()
+            entry = (
+                struct.pack(">BI", 1 + 4 + 32 + 32 + len(name), app.flags)
+                + app.code_data_hash
+                + app.full_hash
+                + serialize(name)
+            )
+            if len(page) + len(entry) > LIST_APPS_PAGE_SIZE:
+                self._list_apps_pages.append(b"\x01" + page)
+                page = b""
+            page += entry
+        if page:
+            self._list_apps_pages.append(b"\x01" + page)
+        return self._list_apps_continue(data, p1)
+
+    def _list_apps_continue(self, data: bytes, p1: int):
+        if len(self._list_apps_pages) == 0:
+            return b"", SW_OK
+        return self._list_apps_pages.pop(0), SW_OK
+
+    def _create_app(self, data: bytes, p1: int):
+        if len(data) == 21:
+            _, code_length, data_length, params_length, flags, _ = struct.unpack(
+                ">BIIIII", data
+            )
+        elif len(data) == 20:
+            code_length, data_length, params_length, flags, _ = struct.unpack(
+                ">IIIII", data
+            )
+        else:
+            return b"", SW_WRONG_DATA
+
+        size = code_length + data_length + params_length
+        if size > self.free_size or len(self.apps) >= self.num_app_slots:
+            return b"", SW_NOT_ENOUGH_SPACE
+        self._reset_install()
+        self.install_header = (code_length, data_length, params_length, flags)
+        self.install_buffer = bytearray(size)
+        return b"", SW_OK
+
+    def _set_load_offset(self, data: bytes, p1: int):
+        if self.install_header is None or len(data) != 4:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        (self.load_offset,) = struct.unpack(">I", data)
+        return b"", SW_OK
+
+    def _load(self, data: bytes, p1: int):
+        if self.install_header is None or len(data) < 2:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        (chunk_offset,) = struct.unpack(">H", data[:2])
+        start = self.load_offset + chunk_offset
+        end = start + len(data) - 2
+        if end > len(self.install_buffer):
+            return b"", SW_NOT_ENOUGH_SPACE
+        self.install_buffer[start:end] = data[2:]
+        return b"", SW_OK
+
+    def _commit(self, data: bytes, p1: int):
+        if self.install_header is None:
+            return b"", SW_CONDITIONS_NOT_SATISFIED
+        code_length, data_length, params_length, flags = self.install_header
+        image = bytes(self.install_buffer)
+        self._reset_install()
+
+        name = None
+        try:
+            for param in parse_app_params(image[code_length + data_length :]):
+                if param["type_"] == "BOLOS_TAG_APPNAME":
+                    name = param["value"]
+        except Exception:
+            return b"", SW_WRONG_DATA
+        if name is None or any(app.name == name for app in self.apps):
+            return b"", SW_WRONG_DATA
+
+        app = EmulatedApp(
+            name,
+            flags,
+            hashlib.sha256(image[: code_length + data_length]).digest(),
+            hashlib.sha256(image).digest(),
+        )
+        app.size = len(image)
+        self.apps.append(app)
+        return b"", SW_OK
+
+    def _delete_app(self, data: bytes, p1: int):
+        try:
+            name, _ = unserialize(data)
+        except (AssertionError, IndexError):
+            return b"", SW_WRONG_DATA
+        return self._remove_app(lambda app: app.name.encode() == name)
+
+    def _delete_app_by_hash(self, data: bytes, p1: int):
+        return self._remove_app(lambda app: app.full_hash == data)
+
+    def _remove_app(self, match):
+        for app in self.apps:
+            if match(app):
+                self.apps.remove(app)
+                return b"", SW_OK
+        return b"", SW_APP_NOT_FOUND
@@ -1,19 +1,28 @@
 import sys
+from typing import Optional
 
 from ..utils import LedgerIns, VersionInfo
 from .device import Device
+from .dump import DumpCompression, DumpFormat, DumpWriter
 
 
 class FileDevice(Device):
-    def __init__(self, target_id, out=None):
+    def __init__(
+        self,
+        target_id,
+        out=None,
+        dump_format: DumpFormat = DumpFormat.HEX,
+        compression: Optional[DumpCompression] = None,
+    ):
         if out is None:
             out = sys.stdout
         t_id = int(target_id, 16)
         self.version_info = VersionInfo.build(
             dict(target_id=t_id, se_version="0", flags=0, mcu_version="0")
         )
-        self.buffer = None
+        self.buffer: Optional[bytes] = None
         self.out = out
+        self.writer = DumpWriter(out, dump_format, compression)
 
     @classmethod
     def enumerate_devices(cls):
@@ -24,10 +33,11 @@ class FileDevice(Device):
 
     def write(self, data: bytes):
         self.buffer = data
-        if not self.buffer[1] == LedgerIns.GET_VERSION:
-            print(data.hex(), file=self.out)
+        if not data[1] == LedgerIns.GET_VERSION:
+            self.writer.write(data)
 
     def read(self, timeout: int = 0) -> bytes:
+        assert self.buffer is not None, "read before write"
         if self.buffer[1] == LedgerIns.GET_VERSION:
             return self.version_info + b"\x90\x00"
         return b"\x00\x00\x00\x02\x90\x00"
@@ -38,4 +48,4 @@ class FileDevice(Device):
 
     def close(self):
         if self.out:
-            self.out.close()
+            self.writer.close()
@@ -1,31 +1,41 @@
-import hid
-
 from .device import Device
 
 LEDGER_VENDOR_ID = 0x2C97
 
 
 class HidDevice(Device):
-    def __init__(self, path):
+    def __init__(self, path, serial_number=None, product=None):
         self.path = path
+        self.serial_number = serial_number
+        self.product = product
         self.device = None
         self.opened = False
 
     @classmethod
     def enumerate_devices(cls):
+        import hid
+
         devices = []
         for hidDevice in hid.enumerate(LEDGER_VENDOR_ID, 0):
             if (
                 "interface_number" in hidDevice and hidDevice["interface_number"] == 0
             ) or ("usage_page" in hidDevice and hidDevice["usage_page"] == 0xFFA0):
                 hid_device_path = hidDevice["path"]
-                devices.append(HidDevice(hid_device_path))
+                devices.append(
+                    HidDevice(
+                        hid_device_path,
+                        hidDevice.get("serial_number"),
+                        hidDevice.get("product_string"),
+                    )
+                )
         return devices
 
     def get_name(self):
         return "hid:{}".format(self.path.decode())
 
     def open(self):
+        import hid
+
         self.device = hid.device()
         self.device.open_path(self.path)
         self.device.set_nonblocking(True)
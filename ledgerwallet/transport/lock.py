@@ -0,0 +1,283 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+LOG = logging.getLogger("ledgerwallet")
+
+POLL_INTERVAL = 0.05
+
+_ticket_counter = itertools.count()
+
+
+def get_lock_dir() -> str:
+    """Directory of the device locks, private to the current user."""
+    lock_dir = os.environ.get("LEDGERWALLET_LOCK_DIR")
+    if lock_dir is not None:
+        return lock_dir
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "ledgerwallet-locks")
+    name = "ledgerwallet-locks"
+    if hasattr(os, "getuid"):
+        name += "-{}".format(os.getuid())
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def _make_private_dir(path: str):
+    """Create a directory only the current user can access, or check it.
+
+    The default lock directory is in the shared temporary directory: another
+    user may have created it first, or replaced it with a symlink.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(
+            "Lock directory {} is not owned by the current user".format(path)
+        )
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def _open_private(filename: str, flags: int) -> int:
+    return os.open(filename, flags | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class DeviceLockTimeout(Exception):
+    def __init__(self, name: str, holder: Optional[Dict]):
+        self.name = name
+        self.holder = holder
+
+    def __str__(self):
+        return "Timeout while waiting for device {} (held by {})".format(
+            self.name, describe_holder(self.holder)
+        )
+
+
+def describe_holder(holder: Optional[Dict]) -> str:
+    if holder is None:
+        return "an unknown process"
+    return "pid {} on {} since {}: {}".format(
+        holder.get("pid"),
+        holder.get("host"),
+        time.strftime("%H:%M:%S", time.localtime(holder.get("since", 0))),
+        holder.get("command"),
+    )
+
+
+class _ProcessLock(object):
+    """Lock file held once for all the reentrant locks of a device."""
+
+    def __init__(self):
+        # Held while the lock file is being acquired or released
+        self.guard = threading.Lock()
+        self.fd: Optional[int] = None
+        self.count = 0
+
+
+# Reentrant locks held by this process, by lock file
+_process_locks: Dict[str, _ProcessLock] = {}
+_process_locks_guard = threading.Lock()
+
+
+class DeviceLock(object):
+    """Advisory lock serializing the access to a device across processes.
+
+    Waiters are queued: each one drops a ticket named after its arrival time in
+    a queue directory, and only the oldest ticket may take the lock. Tickets of
+    processes which died are discarded. The lock itself is a flock(), released
+    by the kernel if the holder crashes.
+
+    Reentrant locks of the same device are shared within a process: they only
+    exclude other processes, and the lock is released with the last of them.
+
+    Locks are private to the current user. Locking is a no-op on platforms
+    without fcntl.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: Optional[float] = None,
+        lock_dir: Optional[str] = None,
+        reentrant: bool = False,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.lock_dir = lock_dir if lock_dir is not None else get_lock_dir()
+        self.reentrant = reentrant
+
+        digest = hashlib.sha256(name.encode()).hexdigest()[:16]
+        base = os.path.join(
+            self.lock_dir, "{}-{}".format(re.sub(r"[^\w.-]", "_", name)[:32], digest)
+        )
+        self.lock_filename = base + ".lock"
+        self.holder_filename = base + ".holder"
+        self.queue_dir = base + ".queue"
+        self.fd: Optional[int] = None
+        self._process_lock: Optional[_ProcessLock] = None
+
+    @property
+    def locked(self) -> bool:
+        return self.fd is not None
+
+    def holder(self) -> Optional[Dict]:
+        """Return information about the process holding the lock, if any."""
+        try:
+            with open(self.holder_filename, "r") as f:
+                holder = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Left behind by a process which has been killed
+        if holder["host"] == socket.gethostname() and not _is_alive(holder["pid"]):
+            return None
+        return holder
+
+    def _first_ticket(self) -> Optional[str]:
+        for ticket in sorted(os.listdir(self.queue_dir)):
+            pid = int(ticket.split("-")[1])
+            if _is_alive(pid):
+                return ticket
+            try:
+                os.unlink(os.path.join(self.queue_dir, ticket))
+            except FileNotFoundError:
+                pass
+        return None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def acquire(self):
+        if fcntl is None or self.locked:
+            return
+        if not self.reentrant:
+            self.fd = self._acquire()
+            return
+
+        with _process_locks_guard:
+            process_lock = _process_locks.setdefault(self.lock_filename, _ProcessLock())
+        # Another thread of the process may be waiting for the lock file
+        if not process_lock.guard.acquire(
+            timeout=-1 if self.timeout is None else self.timeout
+        ):
+            raise DeviceLockTimeout(self.name, self.holder())
+        try:
+            if process_lock.count == 0:
+                process_lock.fd = self._acquire()
+            process_lock.count += 1
+        finally:
+            process_lock.guard.release()
+        self.fd = process_lock.fd
+        self._process_lock = process_lock
+
+    def _acquire(self) -> int:
+        _make_private_dir(self.lock_dir)
+        _make_private_dir(self.queue_dir)
+
+        ticket = "{:020d}-{}-{}".format(
+            time.time_ns(), os.getpid(), next(_ticket_counter)
+        )
+        ticket_filename = os.path.join(self.queue_dir, ticket)
+        os.close(_open_private(ticket_filename, os.O_WRONLY | os.O_EXCL))
+
+        fd = _open_private(self.lock_filename, os.O_RDWR)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        warned = False
+        try:
+            while True:
+                if self._first_ticket() == ticket and self._try_lock(fd):
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeviceLockTimeout(self.name, self.holder())
+                if not warned:
+                    LOG.warning(
+                        "Device %s is in use by %s, waiting...",
+                        self.name,
+                        describe_holder(self.holder()),
+                    )
+                    warned = True
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+        finally:
+            os.unlink(ticket_filename)
+
+        self._write_holder()
+        return fd
+
+    def _write_holder(self):
+        holder = {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "command": " ".join(sys.argv),
+            "since": time.time(),
+        }
+        # Replaced atomically, waiters may be reading it
+        try:
+            fd, tmp_filename = tempfile.mkstemp(dir=self.lock_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(holder, f)
+            os.replace(tmp_filename, self.holder_filename)
+        except OSError as e:
+            # Only used to describe the holder to waiters
+            LOG.debug("Cannot write lock holder information: %s", e)
+
+    def release(self):
+        if self.fd is None:
+            return
+        process_lock = self._process_lock
+        if process_lock is None:
+            self._release(self.fd)
+        else:
+            with process_lock.guard:
+                process_lock.count -= 1
+                if process_lock.count == 0:
+                    self._release(self.fd)
+                    process_lock.fd = None
+        self.fd = None
+        self._process_lock = None
+
+    def _release(self, fd: int):
+        try:
+            os.unlink(self.holder_filename)
+        except FileNotFoundError:
+            pass
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -0,0 +1,202 @@
+import struct
+import time
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple, Union
+
+from .device import Device
+
+TRACE_MAGIC = b"LWTRACE"
+TRACE_VERSION = 1
+
+DIRECTION_COMMAND = 0
+DIRECTION_RESPONSE = 1
+
+# Direction, timestamp (ns since the start of the session), length
+RECORD_HEADER = struct.Struct(">BQH")
+
+
+class TraceFormatError(Exception):
+    pass
+
+
+class ReplayMismatch(Exception):
+    pass
+
+
+class TraceRecord(NamedTuple):
+    direction: int
+    timestamp: int
+    data: bytes
+
+    @property
+    def status_word(self) -> Optional[int]:
+        if self.direction != DIRECTION_RESPONSE or len(self.data) < 2:
+            return None
+        return int.from_bytes(self.data[-2:], "big")
+
+
+class TraceWriter(object):
+    """Write APDUs to a binary trace.
+
+    A trace is made of a header (magic and version), followed by one record per
+    APDU: direction, timestamp in nanoseconds since the writer was created,
+    length, and the APDU itself (status word included for responses).
+    """
+
+    def __init__(self, out: Union[str, BinaryIO]):
+        if isinstance(out, str):
+            out = open(out, "wb")
+        self.out = out
+        self.out.write(TRACE_MAGIC + bytes([TRACE_VERSION]))
+        self.start = time.perf_counter_ns()
+
+    def write(self, direction: int, data: bytes, timestamp: Optional[int] = None):
+        if timestamp is None:
+            timestamp = time.perf_counter_ns()
+        self.out.write(
+            RECORD_HEADER.pack(direction, timestamp - self.start, len(data)) + data
+        )
+
+    def close(self):
+        self.out.close()
+
+
+def read_trace(trace: Union[str, BinaryIO]) -> Iterator[TraceRecord]:
+    """Iterate over the records of a trace, without loading it at once."""
+    if isinstance(trace, str):
+        with open(trace, "rb") as f:
+            yield from read_trace(f)
+        return
+
+    header = trace.read(len(TRACE_MAGIC) + 1)
+    if header[:-1] != TRACE_MAGIC:
+        raise TraceFormatError("Not an APDU trace")
+    if header[-1] != TRACE_VERSION:
+        raise TraceFormatError("Unsupported trace version {}".format(header[-1]))
+    while True:
+        record_header = trace.read(RECORD_HEADER.size)
+        if len(record_header) == 0:
+            break
+        if len(record_header) != RECORD_HEADER.size:
+            raise TraceFormatError("Truncated trace")
+        direction, timestamp, length = RECORD_HEADER.unpack(record_header)
+        data = trace.read(length)
+        if len(data) != length:
+            raise TraceFormatError("Truncated trace")
+        yield TraceRecord(direction, timestamp, data)
+
+
+def read_exchanges(
+    trace: Union[str, BinaryIO]
+) -> Iterator[Tuple[TraceRecord, TraceRecord]]:
+    """Iterate over (command, response) pairs of a trace."""
+    command = None
+    for record in read_trace(trace):
+        if record.direction == DIRECTION_COMMAND:
+            command = record
+        elif command is not None:
+            yield command, record
+            command = None
+
+
+class RecordingDevice(Device):
+    """Wrap a device and record every APDU exchanged with it to a trace.
+
+    A TraceWriter can be shared by successive devices, to record a session
+    which reconnects to the device in a single trace. It is then left open
+    when the device is closed.
+    """
+
+    def __init__(self, device: Device, out: Union[str, BinaryIO, TraceWriter]):
+        self.device = device
+        self.owns_writer = not isinstance(out, TraceWriter)
+        self.writer = out if isinstance(out, TraceWriter) else TraceWriter(out)
+
+    @classmethod
+    def enumerate_devices(cls):
+        return []
+
+    def get_name(self):
+        return self.device.get_name()
+
+    def open(self):
+        self.device.open()
+
+    def write(self, data: bytes):
+        self.writer.write(DIRECTION_COMMAND, data)
+        self.device.write(data)
+
+    def read(self, timeout: int = 0) -> bytes:
+        data = self.device.read(timeout)
+        self.writer.write(DIRECTION_RESPONSE, data)
+        return data
+
+    def exchange(self, data: bytes, timeout: Optional[int] = None) -> bytes:
+        self.writer.write(DIRECTION_COMMAND, data)
+        # Keep the default timeout of the wrapped device
+        if timeout is None:
+            response = self.device.exchange(data)
+        else:
+            response = self.device.exchange(data, timeout)
+        self.writer.write(DIRECTION_RESPONSE, response)
+        return response
+
+    def close(self):
+        self.device.close()
+        if self.owns_writer:
+            self.writer.close()
+
+
+class ReplayDevice(Device):
+    """Serve the responses of a recorded trace.
+
+    Each response is returned after the latency observed during the recording,
+    multiplied by `latency_scale` (0 to answer immediately). When `strict` is
+    set, the commands sent must be the recorded ones.
+
+    Secure channel sessions cannot be replayed to a LedgerClient: the host
+    nonce and keys of a new handshake differ from the recorded ones, and the
+    recorded responses are encrypted with the recorded session keys. Only
+    plain APDU can be replayed this way; `ledgerctl trace replay` sends the
+    recorded commands themselves, so it replays secure sessions too.
+    """
+
+    def __init__(
+        self,
+        trace: Union[str, BinaryIO],
+        latency_scale: float = 1.0,
+        strict: bool = True,
+    ):
+        self.exchanges = read_exchanges(trace)
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.command = b""
+
+    @classmethod
+    def enumerate_devices(cls):
+        return []
+
+    def open(self):
+        pass
+
+    def write(self, data: bytes):
+        self.command = data
+
+    def read(self, timeout: int = 0) -> bytes:
+        return self.exchange(self.command)
+
+    def exchange(self, data: bytes, timeout: int = 0) -> bytes:
+        try:
+            command, response = next(self.exchanges)
+        except StopIteration:
+            raise ReplayMismatch("End of the trace has been reached")
+        if self.strict and command.data != data:
+            raise ReplayMismatch(
+                "Expected command {}, got {}".format(command.data.hex(), data.hex())
+            )
+        if self.latency_scale > 0:
+            latency = (response.timestamp - command.timestamp) * 1e-9
+            time.sleep(latency * self.latency_scale)
+        return response.data
+
+    def close(self):
+        self.exchanges.close()
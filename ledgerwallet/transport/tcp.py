@@ -28,6 +28,9 @@ class TcpDevice(Device):
         else:
             return []
 
+    def get_name(self):
+        return "tcp:{}:{}".format(self.server, self.port)
+
     def open(self):
         self.socket.connect((self.server, self.port))
 
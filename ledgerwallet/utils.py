@@ -1,8 +1,11 @@
 import logging
 from enum import Enum, IntEnum
+from typing import Dict
+from typing import Optional as OptionalType
 
 from construct import (
     Const,
+    Construct,
     FlagsEnum,
     Hex,
     IfThenElse,
@@ -14,6 +17,9 @@ from construct import (
     Struct,
     this,
 )
+from construct.lib import HexDisplayedInteger
+
+LOG = logging.getLogger("ledgerwallet")
 
 
 class DeviceNames(Enum):
@@ -87,6 +93,89 @@ VersionInfo = Struct(
 )
 
 
+class DeviceVersionInfo(object):
+    """Parsed GET_VERSION response."""
+
+    __slots__ = (
+        "target_id",
+        "se_version",
+        "flags",
+        "mcu_version",
+        "mcu_bl_version",
+        "hw_version",
+        "language",
+        "recover_state",
+    )
+
+    def __init__(
+        self,
+        target_id: int,
+        se_version: str,
+        flags,
+        mcu_version: str,
+        mcu_bl_version: OptionalType[str] = None,
+        hw_version=None,
+        language: OptionalType[str] = None,
+        recover_state: OptionalType[int] = None,
+    ):
+        # Displayed as hex, like the Hex field of VersionInfo
+        self.target_id = HexDisplayedInteger.new(target_id, "08X")
+        self.se_version = se_version
+        self.flags = flags
+        self.mcu_version = mcu_version
+        self.mcu_bl_version = mcu_bl_version
+        self.hw_version = hw_version
+        self.language = language
+        self.recover_state = recover_state
+
+    def __eq__(self, other):
+        if not isinstance(other, DeviceVersionInfo):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return "DeviceVersionInfo({})".format(
+            ", ".join(
+                "{}={!r}".format(name, getattr(self, name)) for name in self.__slots__
+            )
+        )
+
+
+_compiled: Dict[int, Construct] = {}
+
+
+def compiled(struct: Construct) -> Construct:
+    """Compiled version of a construct, built on first use.
+
+    The construct itself is returned when it cannot be compiled.
+    """
+    result = _compiled.get(id(struct))
+    if result is None:
+        try:
+            result = struct.compile()
+        except Exception as e:
+            LOG.debug("Cannot compile construct, using the interpreter: %s", e)
+            result = struct
+        _compiled[id(struct)] = result
+    return result
+
+
+def parse_version_info(data: bytes) -> DeviceVersionInfo:
+    info = compiled(VersionInfo).parse(data)
+    return DeviceVersionInfo(
+        info.target_id,
+        info.se_version,
+        info.flags,
+        info.mcu_version,
+        info.mcu_bl_version,
+        info.hw_version,
+        info.language,
+        info.recover_state,
+    )
+
+
 def enable_apdu_log():
     logger = logging.getLogger("ledgerwallet")
     logger.setLevel(logging.DEBUG)
@@ -146,3 +235,13 @@ def decode_flags(flags: int):
 
 def flags_to_string(flags: int):
     return ",".join(decode_flags(flags))
+
+
+def percentile(values, percent: float):
+    """Percentile of sorted values, interpolated linearly between samples."""
+    if len(values) == 0:
+        raise ValueError("No values")
+    rank = (len(values) - 1) * percent / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
@@ -0,0 +1,120 @@
+"""Compare pytest-benchmark results to the stored baseline.
+
+    pytest tests/benchmarks/ --benchmark-json results.json
+    python tests/benchmarks/compare.py results.json
+
+Benchmarks whose median is slower than the baseline by more than the
+threshold are reported as regressions: as warnings, or as failures with
+--fail. Baselines depend on the machine, which is stored with them: the
+current one was recorded locally (Python 3.11.7, Linux x86_64), so CI only
+warns. Record them on the CI runners from the results artifact of the
+benchmark job with --update.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from typing import Dict
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def load_results(filename: str) -> Dict[str, float]:
+    """Median of each benchmark of a pytest-benchmark JSON file, in seconds."""
+    with open(filename) as f:
+        results = json.load(f)
+    return {
+        benchmark["fullname"]: benchmark["stats"]["median"]
+        for benchmark in results["benchmarks"]
+    }
+
+
+def update_baseline(results: Dict[str, float], filename: str):
+    baseline = {
+        "machine": {
+            "python": platform.python_version(),
+            "system": platform.system(),
+            "processor": platform.machine(),
+        },
+        "medians": dict(sorted(results.items())),
+    }
+    with open(filename, "w") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def report(message: str, error: bool):
+    if os.environ.get("GITHUB_ACTIONS") == "true":
+        # Annotation of the workflow run
+        print("::{}::{}".format("error" if error else "warning", message))
+    else:
+        print(message)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("results", help="JSON file written by --benchmark-json.")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline file.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=25.0,
+        help="Slowdown tolerated, in percent of the baseline (default: 25).",
+    )
+    parser.add_argument(
+        "--fail", action="store_true", help="Exit with an error on regressions."
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="Replace the baseline by the results."
+    )
+    args = parser.parse_args()
+
+    results = load_results(args.results)
+    if args.update:
+        update_baseline(results, args.baseline)
+        print(
+            "Baseline of {} benchmarks written to {}".format(
+                len(results), args.baseline
+            )
+        )
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["medians"]
+
+    regressions = 0
+    for name, median in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            print("{}: {:.1f} us (no baseline)".format(name, median * 1e6))
+            continue
+        change = (median - reference) / reference * 100
+        print(
+            "{}: {:.1f} us, baseline {:.1f} us ({:+.1f}%)".format(
+                name, median * 1e6, reference * 1e6, change
+            )
+        )
+        if change > args.threshold:
+            regressions += 1
+            report(
+                "Benchmark regression: {} is {:.1f}% slower than the baseline".format(
+                    name, change
+                ),
+                args.fail,
+            )
+
+    if regressions > 0:
+        print(
+            "{} benchmarks regressed by more than {}%".format(
+                regressions, args.threshold
+            )
+        )
+        if args.fail:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
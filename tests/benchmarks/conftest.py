@@ -0,0 +1,50 @@
+import random
+
+import pytest
+from PIL import Image
+
+from ledgerwallet import iconcache
+
+pytest.importorskip("pytest_benchmark")
+
+
+def random_image(width: int, height: int, num_colors: int, seed: int = 0) -> Image:
+    """Palette image using num_colors grey levels."""
+    rng = random.Random(seed)
+    levels = rng.sample(range(256), num_colors)
+    im = Image.new("P", (width, height))
+    palette = []
+    for level in levels:
+        palette += [level, level, level]
+    # GIF palettes have a power of 2 size
+    while len(palette) // 3 & (len(palette) // 3 - 1):
+        palette += [0, 0, 0]
+    im.putpalette(palette)
+    # Use every color, as icon encoders expect
+    pixels = list(range(num_colors)) + [
+        rng.randrange(num_colors) for _ in range(width * height - num_colors)
+    ]
+    rng.shuffle(pixels)
+    im.putdata(pixels[: width * height])
+    return im
+
+
+@pytest.fixture(autouse=True, scope="session")
+def icon_cache(tmp_path_factory):
+    """Measure icon conversions from an empty cache, rather than the user's."""
+    cache = iconcache.IconCache(str(tmp_path_factory.mktemp("icons")))
+    previous = iconcache._default_cache
+    iconcache._default_cache = cache
+    yield cache
+    iconcache._default_cache = previous
+
+
+@pytest.fixture(scope="session")
+def make_image():
+    return random_image
+
+
+@pytest.fixture(scope="session")
+def splash_image() -> Image:
+    # Size of a Stax splash screen
+    return random_image(400, 672, 16)
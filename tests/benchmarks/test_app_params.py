@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from ledgerwallet.params import AppParams, build_app_params, parse_app_params
+
+
+def app_params(num_paths: int) -> list:
+    rng = random.Random(0)
+    paths = [
+        "/".join(str(rng.randrange(0x80000000)) + "'" for _ in range(5))
+        for _ in range(num_paths)
+    ]
+    return [
+        {"type_": "BOLOS_TAG_APPNAME", "value": "Benchmark"},
+        {"type_": "BOLOS_TAG_APPVERSION", "value": "1.0.0"},
+        {
+            "type_": "BOLOS_TAG_ICON",
+            "value": bytes(rng.randrange(256) for _ in range(1024)),
+        },
+        {
+            "type_": "BOLOS_TAG_DERIVEPATH",
+            "value": {
+                "curve": 9,
+                "paths": paths,
+                "paths_slip21": ["LEDGER-Wallet policy"],
+            },
+        },
+    ]
+
+
+@pytest.mark.parametrize("num_paths", [10, 1000])
+@pytest.mark.parametrize("fast", [True, False])
+def test_build(benchmark, num_paths, fast):
+    build = build_app_params if fast else AppParams.build
+    benchmark(build, app_params(num_paths))
+
+
+@pytest.mark.parametrize("num_paths", [10, 1000])
+@pytest.mark.parametrize("fast", [True, False])
+def test_parse(benchmark, num_paths, fast):
+    parse = parse_app_params if fast else AppParams.parse
+    benchmark(parse, AppParams.build(app_params(num_paths)))
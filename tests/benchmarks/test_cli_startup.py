@@ -0,0 +1,29 @@
+import re
+import subprocess
+import sys
+
+# Budget of `import ledgerwallet.ledgerctl`, measured by python -X importtime
+IMPORT_BUDGET_US = 250_000
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], check=True, capture_output=True, text=True
+    )
+
+
+def test_help(benchmark):
+    benchmark.pedantic(
+        run_python, ("-m", "ledgerwallet.ledgerctl", "--help"), rounds=10
+    )
+
+
+def test_import_budget():
+    # The first import may compile bytecode
+    run_python("-c", "import ledgerwallet.ledgerctl")
+    stderr = run_python(
+        "-X", "importtime", "-c", "import ledgerwallet.ledgerctl"
+    ).stderr
+    match = re.search(r"\|\s*(\d+) \| ledgerwallet\.ledgerctl$", stderr, re.MULTILINE)
+    assert match is not None
+    assert int(match.group(1)) < IMPORT_BUDGET_US
@@ -0,0 +1,42 @@
+import pytest
+
+from ledgerwallet.crypto.ecc import PrivateKey
+from ledgerwallet.crypto.scp import SCP
+
+SECRET = bytes(range(32))
+
+
+# Secure APDU payloads: short commands, and LOAD chunks
+@pytest.mark.parametrize("size", [16, 240])
+def test_scp_wrap(benchmark, size):
+    scp = SCP(SECRET)
+    benchmark(scp.wrap, bytes(size))
+
+
+@pytest.mark.parametrize("size", [16, 240])
+def test_scp_wrap_unwrap(benchmark, size):
+    host = SCP(SECRET)
+    device = SCP(SECRET)
+    data = bytes(size)
+    benchmark(lambda: device.unwrap(host.wrap(data)))
+
+
+def test_scp_key_derivation(benchmark):
+    benchmark(SCP, SECRET)
+
+
+def test_ecdh(benchmark):
+    key = PrivateKey(bytes([1]) * 32)
+    peer = PrivateKey(bytes([2]) * 32).pubkey
+    benchmark(key.exchange, peer)
+
+
+def test_sign(benchmark):
+    key = PrivateKey(bytes([1]) * 32)
+    benchmark(key.sign, b"certificate")
+
+
+def test_verify(benchmark):
+    key = PrivateKey(bytes([1]) * 32)
+    signature = key.sign(b"certificate")
+    benchmark(key.pubkey.verify, b"certificate", signature)
@@ -0,0 +1,36 @@
+import pytest
+
+from ledgerwallet import manifest
+
+
+@pytest.mark.skipif(manifest._numpy() is None, reason="numpy is not installed")
+def test_nbgl_numpy(benchmark, splash_image):
+    benchmark(manifest._image_to_buffer_nbgl, splash_image, True, False)
+
+
+def test_nbgl_python(benchmark, monkeypatch, splash_image):
+    monkeypatch.setattr(manifest, "_numpy", lambda: None)
+    benchmark.pedantic(
+        manifest._image_to_buffer_nbgl, (splash_image, True, False), rounds=3
+    )
+
+
+# Icon sizes of Nano S, and of Nano S+ and X
+@pytest.mark.parametrize("size", [16, 14])
+@pytest.mark.parametrize("num_colors", [2, 16])
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_bagl(benchmark, monkeypatch, make_image, size, num_colors, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(manifest, "_numpy", lambda: None)
+    elif manifest._numpy() is None:
+        pytest.skip("numpy is not installed")
+    im = make_image(size, size, num_colors)
+    benchmark(manifest._image_to_packed_buffer_bagl, im)
+
+
+def test_nbgl_max_compression(benchmark, splash_image):
+    benchmark.pedantic(
+        manifest._image_to_buffer_nbgl,
+        (splash_image, True, False, manifest.IconCompression.MAX),
+        rounds=3,
+    )
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from ledgerwallet.client import LedgerClient
+from ledgerwallet.manifest_json import AppManifestJson
+from ledgerwallet.transport.emulator import EmulatorDevice
+
+APP_DIR = Path(__file__).parent.parent / "app"
+
+
+@pytest.fixture
+def app_manifest(monkeypatch):
+    # Icon paths of manifests are relative to the working directory
+    monkeypatch.chdir(APP_DIR)
+    return AppManifestJson(str(APP_DIR / "app.json"))
+
+
+def install(app_manifest):
+    device = EmulatorDevice(target_id=0x31100003)
+    client = LedgerClient(device, lock=False)
+    client.install_app(app_manifest)
+    assert len(device.apps) == 1
+
+
+def test_install(benchmark, app_manifest):
+    # Includes the secure channel handshake
+    benchmark.pedantic(install, (app_manifest,), rounds=10)
+
+
+def test_install_list_delete(benchmark, app_manifest):
+    client = LedgerClient(EmulatorDevice(target_id=0x31100003), lock=False)
+
+    def install_list_delete():
+        client.install_app(app_manifest)
+        assert [app.name for app in client.apps] == [app_manifest.app_name]
+        client.delete_app(app_manifest.app_name)
+
+    benchmark.pedantic(install_list_delete, rounds=10)
@@ -0,0 +1,54 @@
+import pytest
+
+from ledgerwallet.client import ApduListAppsResponse, AppInfo
+from ledgerwallet.utils import VersionInfo, compiled, parse_version_info
+
+VERSION_INFO = VersionInfo.build(
+    dict(
+        target_id=0x33000004,
+        se_version="2.2.3",
+        flags=dict(is_onboarded=True, pin_validated=True),
+        mcu_version="2.30",
+        mcu_bl_version="1.1",
+        hw_version="\x00",
+        language="\x00",
+        _recover_state_len=1,
+        recover_state=0,
+    )
+)
+
+# A full LIST_APPS page
+LIST_APPS_PAGE = ApduListAppsResponse.build(
+    dict(
+        apps=[
+            dict(
+                flags=0xA50,
+                code_data_hash=bytes([i]) * 32,
+                full_hash=bytes([i + 1]) * 32,
+                name="App{}".format(i),
+            )
+            for i in range(3)
+        ]
+    )
+)
+
+
+@pytest.mark.parametrize("compile", [True, False])
+def test_version_info(benchmark, compile):
+    if compile:
+        benchmark(parse_version_info, VERSION_INFO)
+    else:
+        benchmark(VersionInfo.parse, VERSION_INFO)
+
+
+@pytest.mark.parametrize("compile", [True, False])
+def test_list_apps_page(benchmark, compile):
+    response = compiled(ApduListAppsResponse) if compile else ApduListAppsResponse
+
+    def parse():
+        return [
+            AppInfo(app.name, app.flags & 0xFFFF, app.code_data_hash, app.full_hash)
+            for app in response.parse(LIST_APPS_PAGE).apps
+        ]
+
+    benchmark(parse)
@@ -0,0 +1,53 @@
+import pytest
+
+from ledgerwallet.transport.hid import HidDevice
+
+
+class LoopbackHid(object):
+    """hid.device stand-in, answering each command with the same APDU."""
+
+    def __init__(self, response_packets):
+        self.response_packets = response_packets
+        self.packets = []
+
+    def write(self, packet: bytes):
+        self.packets.append(packet)
+
+    def read(self, length: int, timeout_ms: int = 0) -> bytes:
+        if not self.packets:
+            self.packets = list(self.response_packets)
+        return self.packets.pop(0)
+
+    def set_nonblocking(self, nonblocking: bool):
+        pass
+
+
+def hid_packets(data: bytes) -> list:
+    recorder = LoopbackHid([])
+    device = HidDevice(b"bench")
+    device.device = recorder
+    device.write(data)
+    # Written packets are prefixed by the report ID, read ones are not
+    return [packet[1:] for packet in recorder.packets]
+
+
+# GET_VERSION and a full LOAD APDU
+@pytest.mark.parametrize("size", [5, 255])
+def test_hid_write(benchmark, size):
+    device = HidDevice(b"bench")
+    device.device = LoopbackHid([])
+    benchmark(device.write, bytes(size))
+
+
+@pytest.mark.parametrize("size", [2, 255])
+def test_hid_read(benchmark, size):
+    device = HidDevice(b"bench")
+    device.device = LoopbackHid([])
+    packets = hid_packets(bytes(size))
+
+    def read():
+        device.device.packets = list(packets)
+        return device.read()
+
+    assert read() == bytes(size)
+    benchmark(read)
@@ -0,0 +1,25 @@
+import click
+import pytest
+
+from ledgerwallet import iconcache
+
+
+@pytest.fixture(autouse=True, scope="session")
+def icon_cache(tmp_path_factory):
+    """Keep converted icons out of the user cache."""
+    cache = iconcache.IconCache(str(tmp_path_factory.mktemp("icons")))
+    previous = iconcache._default_cache
+    iconcache._default_cache = cache
+    yield cache
+    iconcache._default_cache = previous
+
+
+@pytest.fixture(autouse=True)
+def app_dir(tmp_path, monkeypatch):
+    """Keep the ledgerctl configuration (private key, registry) out of the user's."""
+
+    def get_app_dir(app_name, *args, **kwargs):
+        return str(tmp_path / app_name)
+
+    monkeypatch.setattr(click, "get_app_dir", get_app_dir)
+    return tmp_path
@@ -0,0 +1,87 @@
+import json
+import os
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.bench import (
+    BENCH_LOAD,
+    BENCHMARKS,
+    BenchResult,
+    bench_report,
+    run_benchmarks,
+)
+from ledgerwallet.client import MAX_LOAD_SIZE, LedgerClient
+from ledgerwallet.manifest_json import AppManifestJson
+from ledgerwallet.transport.emulator import EmulatorDevice
+
+APP_DIR = Path(__file__).parent.parent / "app"
+
+
+class BenchResultTest(TestCase):
+    def test_statistics(self):
+        result = BenchResult("load", [0.004, 0.001, 0.002, 0.003], payload_bytes=100)
+        self.assertAlmostEqual(result.mean, 0.0025)
+        self.assertAlmostEqual(result.percentile(50), 0.0025)
+        self.assertAlmostEqual(result.throughput, 10000)
+        values = result.to_dict()
+        self.assertEqual(values["count"], 4)
+        self.assertAlmostEqual(values["max_ms"], 4)
+        self.assertIsNone(BenchResult("ping", [0.001]).throughput)
+
+
+class RunBenchmarksTest(TestCase):
+    def setUp(self):
+        # Icon paths of manifests are relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(APP_DIR)
+        self.manifest = AppManifestJson(str(APP_DIR / "app.json"))
+        self.device = EmulatorDevice(target_id=0x31100003)
+        self.client = LedgerClient(self.device)
+
+    def test_all(self):
+        results = run_benchmarks(
+            self.client, BENCHMARKS, 3, self.manifest, load_sizes=[64, 128]
+        )
+        self.assertEqual(
+            [(r.name, r.parameters.get("load_size")) for r in results],
+            [
+                ("ping", None),
+                ("secure", None),
+                ("handshake", None),
+                ("load", 64),
+                ("load", 128),
+                ("list", None),
+            ],
+        )
+        self.assertTrue(all(len(r.samples) == 3 for r in results if r.name != "load"))
+        load_64, load_128 = results[3:5]
+        self.assertEqual(load_64.payload_bytes, load_128.payload_bytes)
+        self.assertGreater(len(load_64.samples), len(load_128.samples))
+        # The benchmark app has been deleted
+        self.assertEqual(self.device.apps, [])
+
+        report = json.loads(json.dumps(bench_report(self.client, results)))
+        self.assertEqual(report["device"]["target_id"], "0x31100003")
+        self.assertEqual(report["device"]["transport"], "EmulatorDevice")
+        self.assertEqual(len(report["results"]), 6)
+
+    def test_load_installed_app(self):
+        self.client.install_app(self.manifest)
+        with self.assertRaises(ValueError):
+            run_benchmarks(self.client, [BENCH_LOAD], 1, self.manifest)
+        self.assertEqual(len(self.device.apps), 1)
+
+    def test_load_size(self):
+        (result,) = run_benchmarks(
+            self.client, [BENCH_LOAD], 1, self.manifest, load_sizes=[MAX_LOAD_SIZE]
+        )
+        self.assertEqual(result.parameters["load_size"], MAX_LOAD_SIZE)
+        with self.assertRaises(ValueError):
+            run_benchmarks(
+                self.client, [BENCH_LOAD], 1, self.manifest, [MAX_LOAD_SIZE + 1]
+            )
+        self.assertEqual(self.device.apps, [])
+
+    def test_load_without_manifest(self):
+        with self.assertRaises(ValueError):
+            run_benchmarks(self.client, [BENCH_LOAD], 1)
@@ -0,0 +1,83 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.bundle import Bundle, BundleFormatError, build_bundle, install_bundle
+from ledgerwallet.client import MAX_LOAD_SIZE, LedgerClient, install_app_commands
+from ledgerwallet.manifest_json import AppManifestJson
+from ledgerwallet.manifest_toml import AppManifestToml
+from ledgerwallet.transport.emulator import EmulatorDevice
+
+APP_DIR = Path(__file__).parent.parent / "app"
+APP_MANIFEST = APP_DIR / "app.json"
+
+
+class BundleTest(TestCase):
+    def setUp(self):
+        # Icon paths of manifests are relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(APP_DIR)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = str(Path(directory.name) / "app.bundle")
+        self.manifest = AppManifestJson(str(APP_MANIFEST))
+        build_bundle(self.manifest, "0x31100003", self.filename)
+
+    def test_content(self):
+        with Bundle(self.filename) as bundle:
+            self.assertEqual(bundle.app_name, "SSH/PGP Agent")
+            self.assertEqual(bundle.target_id, 0x31100003)
+            self.assertEqual(bundle.load_size, 0x80)
+            self.assertEqual(
+                [(ins, bytes(data)) for ins, data in bundle.commands()],
+                list(install_app_commands(self.manifest, "0x31100003", 0x80)),
+            )
+
+    def test_install(self):
+        device = EmulatorDevice(target_id=0x31100003)
+        with Bundle(self.filename) as bundle:
+            install_bundle(LedgerClient(device), bundle)
+
+        reference = EmulatorDevice(target_id=0x31100003)
+        LedgerClient(reference).install_app(self.manifest)
+        self.assertEqual(device.apps[0].name, "SSH/PGP Agent")
+        self.assertEqual(device.apps[0].full_hash, reference.apps[0].full_hash)
+
+    def test_install_load_size(self):
+        build_bundle(self.manifest, "0x31100003", self.filename, MAX_LOAD_SIZE)
+        device = EmulatorDevice(target_id=0x31100003)
+        with Bundle(self.filename) as bundle:
+            self.assertEqual(bundle.load_size, MAX_LOAD_SIZE)
+            install_bundle(LedgerClient(device), bundle)
+
+        reference = EmulatorDevice(target_id=0x31100003)
+        LedgerClient(reference).install_app(self.manifest)
+        self.assertEqual(device.apps[0].full_hash, reference.apps[0].full_hash)
+
+        with self.assertRaises(ValueError):
+            build_bundle(self.manifest, "0x31100003", self.filename, MAX_LOAD_SIZE + 1)
+
+    def test_wrong_target(self):
+        client = LedgerClient(EmulatorDevice(target_id=0x33000004))
+        with Bundle(self.filename) as bundle:
+            with self.assertRaises(ValueError):
+                install_bundle(client, bundle)
+
+    def test_invalid(self):
+        with open(self.filename, "r+b") as f:
+            f.truncate(8)
+        with self.assertRaises(BundleFormatError):
+            Bundle(self.filename)
+        with open(self.filename, "wb") as f:
+            f.write(b"not a bundle")
+        with self.assertRaises(BundleFormatError):
+            Bundle(self.filename)
+
+    def test_toml(self):
+        manifest = AppManifestToml(str(APP_DIR / "app.toml"))
+        build_bundle(manifest, "0x31100003", self.filename)
+        with Bundle(self.filename) as bundle:
+            self.assertEqual(bundle.app_name, "SSH/PGP Agent")
+        with self.assertRaises(ValueError):
+            build_bundle(manifest, "0x33000004", self.filename)
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from ledgerwallet.capabilities import DeviceCapabilities
+from ledgerwallet.utils import VersionInfo
+
+
+def version_info(target_id: int, flags=0):
+    return VersionInfo.parse(
+        VersionInfo.build(
+            dict(target_id=target_id, se_version="1.0", flags=flags, mcu_version="1")
+        )
+    )
+
+
+class DeviceCapabilitiesTest(TestCase):
+    def test_nano_sp(self):
+        caps = DeviceCapabilities.from_version_info(version_info(0x33100004), 0.01)
+        self.assertTrue(caps.scp_v2)
+        self.assertTrue(caps.custom_scp)
+        self.assertTrue(caps.api_level)
+        self.assertFalse(caps.custom_ca)
+        self.assertEqual(caps.rtt, 0.01)
+
+    def test_nano_x(self):
+        caps = DeviceCapabilities.from_version_info(version_info(0x33000004))
+        self.assertTrue(caps.scp_v2)
+        self.assertFalse(caps.custom_scp)
+        self.assertFalse(caps.api_level)
+
+    def test_scp_v1(self):
+        caps = DeviceCapabilities.from_version_info(version_info(0x31100001))
+        self.assertFalse(caps.scp_v2)
+
+    def test_custom_ca(self):
+        caps = DeviceCapabilities.from_version_info(
+            version_info(0x33200004, dict(trust_custom_ca=True))
+        )
+        self.assertTrue(caps.custom_ca)
+
+    def test_dict_roundtrip(self):
+        caps = DeviceCapabilities.from_version_info(version_info(0x33100004), 0.5)
+        copy = DeviceCapabilities.from_dict(caps.to_dict())
+        self.assertEqual(copy.to_dict(), caps.to_dict())
@@ -0,0 +1,132 @@
+import os
+import random
+import threading
+import time
+from unittest import TestCase
+
+from ledgerwallet.client import LedgerClient
+from ledgerwallet.concurrency import Priority, PriorityLock
+from ledgerwallet.crypto.scp import SCP
+from ledgerwallet.transport.device import Device
+from ledgerwallet.utils import LedgerIns, VersionInfo
+
+SECRET = bytes(range(32))
+
+
+class SecureEchoDevice(Device):
+    """Echo the payload of secure APDUs through a real secure channel.
+
+    Any interleaving of two secure exchanges breaks the IV chains and results
+    in an invalid MAC, on either side.
+    """
+
+    def __init__(self):
+        self.scp = SCP(SECRET)
+        self.busy = threading.Lock()
+        self.overlaps = 0
+
+    @classmethod
+    def enumerate_devices(cls):
+        return []
+
+    def open(self):
+        pass
+
+    def write(self, data: bytes):
+        pass
+
+    def read(self, timeout: int = 0) -> bytes:
+        return b""
+
+    def exchange(self, data: bytes, timeout: int = 0) -> bytes:
+        if not self.busy.acquire(blocking=False):
+            self.overlaps += 1
+            self.busy.acquire()
+        try:
+            time.sleep(random.random() / 5000)
+            if data[1] == LedgerIns.SECUINS:
+                return self.scp.wrap(self.scp.unwrap(data[5:])) + b"\x90\x00"
+            if data[1] == LedgerIns.GET_VERSION:
+                return (
+                    VersionInfo.build(
+                        dict(
+                            target_id=0x33100004,
+                            se_version="1.0",
+                            flags=0,
+                            mcu_version="1.0",
+                        )
+                    )
+                    + b"\x90\x00"
+                )
+            return data[5:] + b"\x90\x00"
+        finally:
+            self.busy.release()
+
+    def close(self):
+        pass
+
+
+class LedgerClientThreadingTest(TestCase):
+    def test_concurrent_exchanges(self):
+        device = SecureEchoDevice()
+        client = LedgerClient(device)
+        client.scp = SCP(SECRET)
+        errors = []
+
+        def worker(index):
+            try:
+                for i in range(30):
+                    payload = os.urandom(random.randint(0, 100))
+                    if i % 5 == 0:
+                        version_info = client.get_version_info()
+                        assert version_info.target_id == 0x33100004
+                    elif i % 3 == 0:
+                        assert client.apdu_exchange(0x42, payload) == payload
+                    else:
+                        response = client.apdu_secure_exchange(index, payload)
+                        assert response == bytes([index]) + payload
+            except Exception as exception:
+                errors.append(exception)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(device.overlaps, 0)
+
+
+class PriorityLockTest(TestCase):
+    def test_reentrant(self):
+        lock = PriorityLock()
+        with lock.hold():
+            with lock.hold(Priority.HIGH):
+                pass
+        with self.assertRaises(RuntimeError):
+            lock.release()
+
+    def test_priority_order(self):
+        lock = PriorityLock()
+        order = []
+
+        def waiter(priority):
+            with lock.hold(priority):
+                order.append(priority)
+
+        lock.acquire()
+        threads = []
+        for priority in (Priority.LOW, Priority.NORMAL, Priority.LOW, Priority.HIGH):
+            thread = threading.Thread(target=waiter, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            while len(lock._waiters) != len(threads):
+                time.sleep(0.001)
+        lock.release()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            order, [Priority.HIGH, Priority.NORMAL, Priority.LOW, Priority.LOW]
+        )
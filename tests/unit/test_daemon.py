@@ -0,0 +1,158 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from ledgerwallet.bench import BENCH_HANDSHAKE, BENCH_PING, BENCH_SECURE, run_benchmarks
+from ledgerwallet.client import CommException, LedgerClient
+from ledgerwallet.crypto.scp import FakeSCP
+from ledgerwallet.daemon import (
+    DaemonClient,
+    DaemonDevice,
+    DaemonException,
+    LedgerDaemon,
+)
+from ledgerwallet.metrics import ApduMetrics
+from ledgerwallet.transport.device import Device
+
+
+class EchoDevice(Device):
+    """Answer each APDU with its data field, or with an error if P1 is set."""
+
+    def __init__(self):
+        self.is_open = False
+        self.exchanges = 0
+
+    @classmethod
+    def enumerate_devices(cls):
+        return []
+
+    def open(self):
+        self.is_open = True
+
+    def write(self, data: bytes):
+        pass
+
+    def read(self, timeout: int = 0) -> bytes:
+        return b""
+
+    def exchange(self, data: bytes, timeout: int = 0) -> bytes:
+        self.exchanges += 1
+        if data[2] != 0:
+            return b"\x6a\x80"
+        return data[5:] + b"\x90\x00"
+
+    def close(self):
+        self.is_open = False
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "requires Unix sockets")
+class LedgerDaemonTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, "daemon.sock")
+        self.clients = []
+
+        def client_factory():
+            client = LedgerClient(EchoDevice())
+            client.scp = FakeSCP()
+            self.clients.append(client)
+            return client
+
+        self.client_factory = client_factory
+        self.start_daemon()
+
+    def start_daemon(self):
+        self.daemon = LedgerDaemon(self.client_factory, self.socket_path)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        while self.daemon.server is None or not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        self.tmp_dir.cleanup()
+
+    def test_exchanges(self):
+        client = DaemonClient(self.socket_path)
+        client.ping()
+        self.assertEqual(
+            client.raw_exchange(b"\xe0\x01\x00\x00\x01\xaa"), b"\xaa\x90\x00"
+        )
+        self.assertEqual(client.apdu_exchange(0x01, b"\xbb"), b"\xbb")
+        self.assertEqual(client.apdu_secure_exchange(0x10, b"\xcc"), b"\x10\xcc")
+        # Held by the daemon
+        self.assertIsInstance(client.device, DaemonDevice)
+        self.assertIsNone(client.lock)
+        self.assertIsNone(client.private_key)
+        client.close()
+
+        # The device is kept open between clients
+        client = DaemonClient(self.socket_path)
+        self.assertEqual(client.apdu_exchange(0x01, b"\xdd"), b"\xdd")
+        client.close()
+        self.assertEqual(len(self.clients), 1)
+        self.assertEqual(self.clients[0].device.exchanges, 4)
+
+    def test_bench(self):
+        client = DaemonClient(self.socket_path)
+        results = run_benchmarks(client, [BENCH_PING, BENCH_SECURE], 2)
+        self.assertEqual([len(r.samples) for r in results], [2, 2])
+        with self.assertRaises(ValueError):
+            run_benchmarks(client, [BENCH_HANDSHAKE], 1)
+        client.close()
+
+    def test_errors(self):
+        client = DaemonClient(self.socket_path)
+        with self.assertRaises(CommException) as context:
+            client.apdu_secure_exchange(0x10, b"\xcc", p1=1)
+        self.assertEqual(context.exception.sw, 0x6A80)
+        # The secure channel is dropped after an error
+        self.assertIsNone(self.clients[0].scp)
+        with self.assertRaises(DaemonException):
+            client._call("unknown")
+        client.close()
+
+    def test_running_daemon(self):
+        daemon = LedgerDaemon(lambda: LedgerClient(EchoDevice()), self.socket_path)
+        with self.assertRaises(DaemonException):
+            daemon.serve_forever()
+        # The socket of the running daemon is left in place
+        client = DaemonClient(self.socket_path)
+        client.ping()
+        client.close()
+
+    def test_stale_socket(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        # Left by a daemon which has been killed
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path)
+        stale.close()
+        self.start_daemon()
+        client = DaemonClient(self.socket_path)
+        client.ping()
+        client.close()
+
+    def test_metrics(self):
+        client = DaemonClient(self.socket_path)
+        metrics = ApduMetrics()
+        client.add_observer(metrics)
+        client.apdu_exchange(0x01, b"\xbb")
+        client.apdu_secure_exchange(0x10, b"\xcc")
+        with self.assertRaises(CommException):
+            client.apdu_secure_exchange(0x10, b"\xcc", p1=1)
+        client.close()
+
+        self.assertEqual(metrics.status_words, {("GET_VERSION", "9000"): 1})
+        self.assertEqual(
+            metrics.secure_status_words,
+            {("GET_VERSION", "9000"): 1, ("GET_VERSION", "6a80"): 1},
+        )
+        self.assertEqual(metrics.scp_payload_bytes, {"command": 4, "response": 2})
+        # Wrapping happens in the daemon
+        self.assertEqual(metrics.scp_overhead_bytes, {"command": 0, "response": 0})
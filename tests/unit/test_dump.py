@@ -0,0 +1,83 @@
+import gzip
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.transport.dump import (
+    DUMP_MAGIC,
+    DumpCompression,
+    DumpFormat,
+    DumpFormatError,
+    DumpWriter,
+    read_dump,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+APDUS = [bytes([0xE0, i, 0, 0, i]) + os.urandom(i) for i in range(0, 256, 7)]
+
+
+class UnclosableBytesIO(io.BytesIO):
+    def close(self):
+        pass
+
+
+def write_dump(apdus, dump_format, compression=None) -> bytes:
+    out = UnclosableBytesIO()
+    writer = DumpWriter(out, dump_format, compression)
+    for apdu in apdus:
+        writer.write(apdu)
+    writer.close()
+    return out.getvalue()
+
+
+class DumpTest(TestCase):
+    def test_hex(self):
+        dump = write_dump(APDUS, DumpFormat.HEX)
+        self.assertEqual(dump.decode().split(), [apdu.hex() for apdu in APDUS])
+        self.assertEqual(list(read_dump(io.BytesIO(dump))), APDUS)
+
+    def test_hex_text_file(self):
+        out = io.StringIO()
+        DumpWriter(out).write(APDUS[1])
+        self.assertEqual(out.getvalue(), APDUS[1].hex() + "\n")
+
+    def test_binary(self):
+        dump = write_dump(APDUS, DumpFormat.BINARY)
+        self.assertTrue(dump.startswith(DUMP_MAGIC))
+        self.assertLess(len(dump), len(write_dump(APDUS, DumpFormat.HEX)))
+        self.assertEqual(list(read_dump(io.BytesIO(dump))), APDUS)
+
+        # Memory-mapped when read from a file
+        with tempfile.TemporaryDirectory() as directory:
+            filename = str(Path(directory) / "out.apdu")
+            with open(filename, "wb") as f:
+                f.write(dump)
+            self.assertEqual(list(read_dump(filename)), APDUS)
+
+    def test_gzip(self):
+        for dump_format in DumpFormat:
+            dump = write_dump(APDUS, dump_format, DumpCompression.GZIP)
+            self.assertEqual(gzip.decompress(dump), write_dump(APDUS, dump_format))
+            self.assertEqual(list(read_dump(io.BytesIO(dump))), APDUS)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        for dump_format in DumpFormat:
+            dump = write_dump(APDUS, dump_format, DumpCompression.ZSTD)
+            self.assertEqual(list(read_dump(io.BytesIO(dump))), APDUS)
+
+    def test_invalid(self):
+        dump = write_dump(APDUS, DumpFormat.BINARY)
+        with self.assertRaises(DumpFormatError):
+            list(read_dump(io.BytesIO(dump[:-1])))
+        with self.assertRaises(DumpFormatError):
+            list(read_dump(io.BytesIO(b"e0010000zz\n")))
+        with self.assertRaises(DumpFormatError):
+            DumpWriter(io.StringIO(), DumpFormat.BINARY)
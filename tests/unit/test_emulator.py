@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.client import CommException, LedgerClient
+from ledgerwallet.crypto.ecc import PrivateKey
+from ledgerwallet.manifest_json import AppManifestJson
+from ledgerwallet.transport.emulator import EmulatorDevice
+
+APP_DIR = Path(__file__).parent.parent / "app"
+APP_MANIFEST = APP_DIR / "app.json"
+
+
+class EmulatorDeviceTest(TestCase):
+    def setUp(self):
+        # Icon paths of manifests are relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(APP_DIR)
+        self.device = EmulatorDevice(target_id=0x31100003)
+        self.client = LedgerClient(self.device)
+
+    def test_version_info(self):
+        version_info = self.client.get_version_info()
+        self.assertEqual(version_info.target_id, 0x31100003)
+        self.assertEqual(version_info.se_version, "1.1.0")
+        self.assertEqual(self.client.get_version_info_secure().target_id, 0x31100003)
+
+    def test_install_list_delete(self):
+        self.assertEqual(list(self.client.apps), [])
+        self.client.install_app(AppManifestJson(str(APP_MANIFEST)))
+
+        apps = list(self.client.apps)
+        self.assertEqual([app.name for app in apps], ["SSH/PGP Agent"])
+        memory_info = self.client.get_memory_info()
+        self.assertEqual(memory_info.used_app_slots, 1)
+        self.assertEqual(memory_info.applications_size, self.device.apps[0].size)
+
+        # An app with the same name cannot be installed twice
+        with self.assertRaises(CommException) as context:
+            self.client.install_app(AppManifestJson(str(APP_MANIFEST)))
+        self.assertEqual(context.exception.sw, 0x6A80)
+
+        self.client.run_app("SSH/PGP Agent")
+        self.client.delete_app("SSH/PGP Agent")
+        self.assertEqual(list(self.client.apps), [])
+        with self.assertRaises(CommException) as context:
+            self.client.delete_app(apps[0].full_hash)
+        self.assertEqual(context.exception.sw, 0x6984)
+
+    def test_list_apps_pages(self):
+        manifest = AppManifestJson(str(APP_MANIFEST))
+        for i in range(7):
+            manifest.dic["name"] = "App {}".format(i)
+            self.client.install_app(manifest)
+        self.assertEqual(
+            [app.name for app in self.client.apps],
+            ["App {}".format(i) for i in range(7)],
+        )
+
+    def test_custom_ca(self):
+        private_key = PrivateKey()
+        public_key = private_key.pubkey.serialize(compressed=False)
+        device = EmulatorDevice(custom_ca=public_key)
+
+        client = LedgerClient(device, private_key=private_key.serialize())
+        self.assertEqual(client.get_memory_info().used_app_slots, 0)
+        self.assertTrue(client.get_version_info().flags.trust_custom_ca)
+
+        client = LedgerClient(device)
+        with self.assertRaises(CommException) as context:
+            client.get_memory_info()
+        self.assertEqual(context.exception.sw, 0x6982)
+
+    def test_wrong_target_id(self):
+        with self.assertRaises(CommException) as context:
+            self.client.validate_target_id(0x33000004)
+        self.assertEqual(context.exception.sw, 0x6484)
@@ -0,0 +1,92 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from ledgerwallet import manifest
+from ledgerwallet.iconcache import IconCache, icon_cache_key
+
+APP_ICON = str(Path(__file__).parent.parent / "app" / "nanos_app_ssh.gif")
+
+
+class IconCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_key(self):
+        key = icon_cache_key(b"image", "bagl", None, "default")
+        self.assertEqual(key, icon_cache_key(b"image", "bagl", None, "default"))
+        self.assertNotEqual(key, icon_cache_key(b"other", "bagl", None, "default"))
+        self.assertNotEqual(key, icon_cache_key(b"image", "nbgl", None, "default"))
+        self.assertNotEqual(key, icon_cache_key(b"image", "bagl", 5, "default"))
+        self.assertNotEqual(key, icon_cache_key(b"image", "bagl", None, "max"))
+
+    def test_memory(self):
+        cache = IconCache(memory_entries=2)
+        self.assertEqual(cache.get_or_convert("a", lambda: b"1"), b"1")
+        self.assertEqual(cache.get_or_convert("a", lambda: b"2"), b"1")
+        cache.put("b", b"2")
+        cache.get("a")
+        cache.put("c", b"3")
+        # Least recently used entry is dropped
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"1")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_disk(self):
+        IconCache(self.directory).put("ab" * 32, b"icon")
+        cache = IconCache(self.directory)
+        self.assertEqual(cache.get("ab" * 32), b"icon")
+        cache.clear()
+        self.assertIsNone(IconCache(self.directory).get("ab" * 32))
+
+    def test_eviction(self):
+        cache = IconCache(self.directory, max_disk_size=250, memory_entries=0)
+        for i in range(3):
+            key = "{:02x}".format(i) * 32
+            cache.put(key, bytes(100))
+            # Make access order explicit, whatever the timestamp resolution
+            os.utime(cache._path(key), (i, i))
+        cache.put("ff" * 32, bytes(100))
+        self.assertIsNone(cache.get("00" * 32))
+        self.assertIsNone(cache.get("01" * 32))
+        self.assertIsNotNone(cache.get("02" * 32))
+        self.assertIsNotNone(cache.get("ff" * 32))
+
+    def test_eviction_walks(self):
+        cache = IconCache(self.directory, max_disk_size=250, memory_entries=0)
+        with patch("os.walk", wraps=os.walk) as walk:
+            for i in range(3):
+                cache.put("{:02x}".format(i) * 32, bytes(100))
+            # Size is measured by the first put, then by the eviction
+            self.assertEqual(walk.call_count, 2)
+        self.assertEqual(cache._disk_size, 200)
+
+    def test_icon_from_file(self):
+        cache = IconCache(self.directory)
+        with patch("ledgerwallet.manifest.get_icon_cache", lambda: cache):
+            nano_s = manifest.icon_from_file(APP_ICON, "0x31100004", None)
+            for _ in range(10):
+                self.assertEqual(
+                    manifest.icon_from_file(APP_ICON, "0x31100004", None), nano_s
+                )
+            # Same encoder and API level, another target
+            manifest.icon_from_file(APP_ICON, "0x33000004", None)
+            self.assertEqual(cache.misses, 1)
+
+            stax = manifest.icon_from_file(APP_ICON, "0x33200004", None)
+            self.assertNotEqual(stax, nano_s)
+            self.assertEqual(cache.misses, 2)
+
+        with patch.object(manifest, "_encode_icon") as encode_icon:
+            with patch(
+                "ledgerwallet.manifest.get_icon_cache",
+                lambda: IconCache(self.directory),
+            ):
+                self.assertEqual(
+                    manifest.icon_from_file(APP_ICON, "0x33200004", None), stax
+                )
+        encode_icon.assert_not_called()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from ledgerwallet.transport import lock
+from ledgerwallet.transport.lock import DeviceLock, DeviceLockTimeout
+
+
+@unittest.skipIf(lock.fcntl is None, "requires fcntl")
+class DeviceLockTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def new_lock(self, timeout=None):
+        return DeviceLock("hid:1-1:1.0", timeout, lock_dir=self.tmp_dir.name)
+
+    def test_holder(self):
+        device_lock = self.new_lock()
+        self.assertIsNone(device_lock.holder())
+        with device_lock:
+            holder = self.new_lock().holder()
+            self.assertEqual(holder["pid"], os.getpid())
+        self.assertIsNone(device_lock.holder())
+
+    def test_private_permissions(self):
+        lock_dir = os.path.join(self.tmp_dir.name, "locks")
+        previous_umask = os.umask(0o022)
+        try:
+            with DeviceLock("hid:1-1:1.0", lock_dir=lock_dir) as device_lock:
+                for path, mode in (
+                    (lock_dir, 0o700),
+                    (device_lock.queue_dir, 0o700),
+                    (device_lock.lock_filename, 0o600),
+                    (device_lock.holder_filename, 0o600),
+                ):
+                    self.assertEqual(os.stat(path).st_mode & 0o7777, mode, path)
+        finally:
+            os.umask(previous_umask)
+
+    def test_symlinks(self):
+        target = os.path.join(self.tmp_dir.name, "target")
+        with open(target, "w") as f:
+            f.write("unchanged")
+        os.chmod(target, 0o600)
+        device_lock = self.new_lock()
+        os.symlink(target, device_lock.holder_filename)
+        with device_lock:
+            pass
+        with open(target) as f:
+            self.assertEqual(f.read(), "unchanged")
+        self.assertEqual(os.stat(target).st_mode & 0o777, 0o600)
+
+        # A lock directory replaced with a symlink is refused
+        lock_dir = os.path.join(self.tmp_dir.name, "locks")
+        os.symlink(self.tmp_dir.name, lock_dir)
+        with self.assertRaises(PermissionError):
+            DeviceLock("hid:1-1:1.0", lock_dir=lock_dir).acquire()
+
+    def test_reentrant(self):
+        first = DeviceLock("hid:1-1:1.0", lock_dir=self.tmp_dir.name, reentrant=True)
+        second = DeviceLock("hid:1-1:1.0", lock_dir=self.tmp_dir.name, reentrant=True)
+        with first:
+            # Does not wait for the first lock of the process
+            with second:
+                self.assertTrue(second.locked)
+            with self.assertRaises(DeviceLockTimeout):
+                self.new_lock(timeout=0.1).acquire()
+        # Released with the last lock
+        with self.new_lock(timeout=0.1):
+            pass
+
+    def test_timeout(self):
+        with self.new_lock():
+            start = time.monotonic()
+            with self.assertRaises(DeviceLockTimeout) as context:
+                self.new_lock(timeout=0.2).acquire()
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+            self.assertEqual(context.exception.holder["pid"], os.getpid())
+        # The queue is left empty
+        self.assertEqual(os.listdir(self.new_lock().queue_dir), [])
+        with self.new_lock(timeout=0.2):
+            pass
+
+    def test_fifo(self):
+        order = []
+
+        def waiter(name):
+            with self.new_lock():
+                order.append(name)
+
+        holder = self.new_lock()
+        holder.acquire()
+        threads = []
+        for name in range(5):
+            thread = threading.Thread(target=waiter, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Wait for the waiter to be queued
+            while len(os.listdir(holder.queue_dir)) != name + 1:
+                time.sleep(0.01)
+        holder.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, list(range(5)))
+
+    def test_dead_tickets_are_skipped(self):
+        device_lock = self.new_lock(timeout=1)
+        os.makedirs(device_lock.queue_dir)
+        # A ticket left by a process which no longer exists
+        open(os.path.join(device_lock.queue_dir, "{:020d}-999999999-0".format(0)), "w")
+        with device_lock:
+            pass
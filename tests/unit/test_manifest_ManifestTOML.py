@@ -77,7 +77,7 @@ class ManifestTestToml(TestCase):
         # fmt: on
         with patch(
             "ledgerwallet.manifest_toml.icon_from_file",
-            lambda x, y, z: b"\x01\x02\x03\x04",
+            lambda *args: b"\x01\x02\x03\x04",
         ):
             result_toml = self.toml_manifest.serialize_parameters("1234")
         self.assertEqual(result_toml, expected)
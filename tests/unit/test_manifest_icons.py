@@ -0,0 +1,141 @@
+import gzip
+import random
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
+from unittest import TestCase
+
+from PIL import Image
+
+from ledgerwallet import manifest
+
+APP_ICON = Path(__file__).parent.parent / "app" / "nanos_app_ssh.gif"
+
+
+def random_image(
+    width: int, height: int, num_colors: int, seed: int = 0, grey: bool = True
+) -> Image:
+    """Palette image using num_colors grey levels, or colors."""
+    rng = random.Random(seed)
+    im = Image.new("P", (width, height))
+    palette = []
+    for level in rng.sample(range(256), num_colors):
+        if grey:
+            palette += [level, level, level]
+        else:
+            # Colors may share the same luminance
+            palette += rng.sample([level, rng.randrange(level + 1), 0], 3)
+    # GIF palettes have a power of 2 size
+    while len(palette) // 3 & (len(palette) // 3 - 1):
+        palette += [0, 0, 0]
+    im.putpalette(palette)
+    # Use every color, as icon encoders expect
+    pixels = list(range(num_colors)) + [
+        rng.randrange(num_colors) for _ in range(width * height - num_colors)
+    ]
+    rng.shuffle(pixels)
+    im.putdata(pixels[: width * height])
+    return im
+
+
+@unittest.skipIf(manifest._numpy() is None, "numpy is not installed")
+class NbglEncoderTest(TestCase):
+    def assert_same_encoding(self, im: Image):
+        for compress in (False, True):
+            for reverse_1bpp in (False, True):
+                expected = manifest._image_to_buffer_nbgl(im, compress, reverse_1bpp)
+                with unittest.mock.patch.object(manifest, "_numpy", lambda: None):
+                    reference = manifest._image_to_buffer_nbgl(
+                        im, compress, reverse_1bpp
+                    )
+                self.assertEqual(expected, reference)
+
+    def test_app_icon(self):
+        with Image.open(APP_ICON) as im:
+            im.load()
+            self.assert_same_encoding(im)
+
+    def test_random_images(self):
+        for num_colors in (1, 2, 3, 4, 5, 16):
+            for width, height in ((1, 1), (7, 3), (14, 14), (33, 17)):
+                with self.subTest(num_colors=num_colors, size=(width, height)):
+                    self.assert_same_encoding(random_image(width, height, num_colors))
+
+    def test_large_image(self):
+        self.assert_same_encoding(random_image(200, 150, 16))
+
+
+@unittest.skipIf(manifest._numpy() is None, "numpy is not installed")
+class BaglEncoderTest(TestCase):
+    def assert_same_encoding(self, im: Image):
+        expected = manifest._image_to_packed_buffer_bagl(im)
+        with unittest.mock.patch.object(manifest, "_numpy", lambda: None):
+            reference = manifest._image_to_packed_buffer_bagl(im)
+        self.assertEqual(expected, reference)
+
+    def test_app_icon(self):
+        with Image.open(APP_ICON) as im:
+            im.load()
+            self.assert_same_encoding(im)
+
+    def test_random_images(self):
+        for num_colors in (1, 2, 3, 4, 5, 16):
+            for width, height in ((2, 1), (7, 3), (14, 14), (16, 16), (33, 17)):
+                if width * height < num_colors:
+                    continue
+                with self.subTest(num_colors=num_colors, size=(width, height)):
+                    self.assert_same_encoding(
+                        random_image(width, height, num_colors, grey=False)
+                    )
+
+
+def split_nbgl_chunks(buffer: bytes):
+    """Return the gzip chunks of a compressed NBGL image."""
+    assert buffer[4] & 0xF == 1
+    data = buffer[8:]
+    chunks = []
+    while data:
+        length = data[0] | data[1] << 8
+        chunks.append(data[2 : 2 + length])
+        data = data[2 + length :]
+    return chunks
+
+
+class NbglCompressionTest(TestCase):
+    def setUp(self):
+        self.im = random_image(120, 90, 16)
+        self.pixels = manifest._image_to_buffer_nbgl(self.im, False, False)[8:]
+
+    def test_default(self):
+        buffer = manifest._image_to_buffer_nbgl(self.im, True, False)
+        chunks = split_nbgl_chunks(buffer)
+        self.assertEqual(len(chunks), -(-len(self.pixels) // 2048))
+        for i, chunk in enumerate(chunks):
+            # Same output as a sequential gzip.compress of each chunk
+            self.assertEqual(
+                chunk, gzip.compress(self.pixels[i * 2048 : (i + 1) * 2048], mtime=0)
+            )
+
+    def test_max(self):
+        default = manifest._image_to_buffer_nbgl(self.im, True, False)
+        smallest = manifest._image_to_buffer_nbgl(
+            self.im, True, False, manifest.IconCompression.MAX
+        )
+        self.assertEqual(smallest[:5], default[:5])
+        self.assertLessEqual(len(smallest), len(default))
+        chunks = split_nbgl_chunks(smallest)
+        self.assertEqual(b"".join(gzip.decompress(c) for c in chunks), self.pixels)
+        for chunk in chunks:
+            # Header of gzip.compress, with a zero mtime
+            self.assertEqual(chunk[:8], b"\x1f\x8b\x08\x00\x00\x00\x00\x00")
+
+    def test_savings_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = str(Path(directory) / "icon.gif")
+            self.im.save(filename)
+            with self.assertLogs("ledgerwallet", "INFO") as logs:
+                manifest.icon_from_file(
+                    filename, "0x33200004", None, manifest.IconCompression.MAX
+                )
+        self.assertIn("icon.gif", logs.output[0])
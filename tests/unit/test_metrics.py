@@ -0,0 +1,138 @@
+import os
+import stat
+import tempfile
+import unittest
+import urllib.request
+from unittest import TestCase
+
+from ledgerwallet.client import CommException, LedgerClient
+from ledgerwallet.metrics import (
+    ApduMetrics,
+    ExchangeObserver,
+    SecureExchange,
+    serve_prometheus,
+    write_prometheus,
+)
+from ledgerwallet.transport.emulator import EmulatorDevice
+from ledgerwallet.utils import LedgerIns, LedgerSecureIns
+
+
+class FailingDevice(EmulatorDevice):
+    def exchange(self, data: bytes, timeout: int = 0) -> bytes:
+        raise OSError("Device disconnected")
+
+
+class ApduMetricsTest(TestCase):
+    def setUp(self):
+        self.client = LedgerClient(EmulatorDevice(target_id=0x31100003))
+        self.metrics = ApduMetrics()
+        self.client.add_observer(self.metrics)
+
+    def test_exchange(self):
+        self.client.get_version_info()
+        with self.assertRaises(CommException):
+            self.client.apdu_exchange(0x42)
+
+        self.assertEqual(self.metrics.latency["GET_VERSION"].count, 1)
+        self.assertEqual(self.metrics.sent_bytes["GET_VERSION"], 5)
+        self.assertEqual(self.metrics.status_words[("GET_VERSION", "9000")], 1)
+        self.assertEqual(self.metrics.status_words[("0x42", "6d00")], 1)
+
+    def test_secure_exchange(self):
+        self.client.apdu_secure_exchange(LedgerSecureIns.GET_VERSION)
+        with self.assertRaises(CommException):
+            self.client.delete_app("missing")
+
+        # The handshake is made of plain APDUs
+        self.assertIn("MUTUAL_AUTHENTICATE", self.metrics.latency)
+        self.assertEqual(self.metrics.latency["SECUINS"].count, 2)
+        self.assertEqual(self.metrics.secure_latency["GET_VERSION"].count, 1)
+        self.assertEqual(
+            self.metrics.secure_status_words,
+            {("GET_VERSION", "9000"): 1, ("DELETE_APP", "6984"): 1},
+        )
+        # INS of GET_VERSION, then INS and name of the app
+        self.assertEqual(self.metrics.scp_payload_bytes["command"], 1 + 1 + 1 + 7)
+        self.assertGreater(self.metrics.scp_overhead_bytes["command"], 0)
+        self.assertGreater(self.metrics.scp_overhead_bytes["response"], 0)
+
+    def test_transport_error(self):
+        client = LedgerClient(FailingDevice(target_id=0x31100003))
+        client.add_observer(self.metrics)
+        with self.assertRaises(OSError):
+            client.get_version_info()
+        self.assertEqual(self.metrics.errors, {("GET_VERSION", "OSError"): 1})
+
+    def test_remove_observer(self):
+        self.client.remove_observer(self.metrics)
+        self.client.get_version_info()
+        self.assertEqual(self.metrics.latency, {})
+
+    def test_observer(self):
+        exchanges = []
+
+        class Observer(ExchangeObserver):
+            def on_secure_exchange(self, exchange: SecureExchange):
+                exchanges.append(exchange)
+
+        self.client.add_observer(Observer())
+        response = self.client.apdu_secure_exchange(LedgerSecureIns.GET_VERSION)
+        (exchange,) = exchanges
+        self.assertEqual(exchange.ins, LedgerSecureIns.GET_VERSION)
+        self.assertEqual(exchange.command_length, 1)
+        self.assertEqual(exchange.response_length, len(response))
+        self.assertGreater(exchange.wrapped_response_length, len(response))
+        self.assertEqual(exchange.status_word, 0x9000)
+
+
+class PrometheusTest(TestCase):
+    def setUp(self):
+        self.metrics = ApduMetrics()
+        self.metrics.on_exchange(
+            bytes([0xE0, LedgerIns.GET_VERSION]), b"\x90\x00", 0.02
+        )
+        self.metrics.on_exchange(bytes([0xE0, LedgerIns.GET_VERSION]), b"\x90\x00", 3.0)
+
+    def test_render(self):
+        lines = self.metrics.render().splitlines()
+        for line in (
+            "# TYPE ledgerwallet_apdu_duration_seconds histogram",
+            'ledgerwallet_apdu_duration_seconds_bucket{ins="GET_VERSION",le="0.01"} 0',
+            'ledgerwallet_apdu_duration_seconds_bucket{ins="GET_VERSION",le="0.025"} 1',
+            'ledgerwallet_apdu_duration_seconds_bucket{ins="GET_VERSION",le="5.0"} 2',
+            'ledgerwallet_apdu_duration_seconds_bucket{ins="GET_VERSION",le="+Inf"} 2',
+            'ledgerwallet_apdu_duration_seconds_count{ins="GET_VERSION"} 2',
+            'ledgerwallet_apdu_sent_bytes_total{ins="GET_VERSION"} 4',
+            'ledgerwallet_apdu_status_words_total{ins="GET_VERSION",sw="9000"} 2',
+            'ledgerwallet_scp_overhead_bytes_total{direction="command"} 0',
+        ):
+            self.assertIn(line, lines)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "ledgerwallet.prom")
+            write_prometheus(self.metrics, filename)
+            with open(filename) as f:
+                self.assertEqual(f.read(), self.metrics.render())
+            self.assertEqual(os.listdir(tmp_dir), ["ledgerwallet.prom"])
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions")
+    def test_write_permissions(self):
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "ledgerwallet.prom")
+            write_prometheus(self.metrics, filename)
+            self.assertEqual(stat.S_IMODE(os.stat(filename).st_mode), 0o644)
+            os.umask(0o077)
+            write_prometheus(self.metrics, filename)
+            self.assertEqual(stat.S_IMODE(os.stat(filename).st_mode), 0o600)
+
+    def test_serve(self):
+        server = serve_prometheus(self.metrics, 0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+        with urllib.request.urlopen(url) as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+            self.assertEqual(response.read().decode(), self.metrics.render())
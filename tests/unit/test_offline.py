@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.manifest_toml import AppManifestToml
+from ledgerwallet.offline import (
+    dump_install,
+    dump_install_all_targets,
+    target_dump_filename,
+)
+from ledgerwallet.transport.dump import DumpCompression, DumpFormat, read_dump
+from ledgerwallet.utils import LedgerIns
+
+APP_DIR = Path(__file__).parent.parent / "app"
+
+MULTI_TARGET_MANIFEST = """
+name = "SSH/PGP Agent"
+version = "0.0.4"
+
+[0x31100003]
+icon = "nanos_app_ssh.gif"
+binary = "app.hex"
+
+[0x33100004]
+icon = "nanos_app_ssh.gif"
+binary = "app.hex"
+apiLevel = "5"
+
+[unrelated]
+binary = "app.hex"
+"""
+
+
+class OfflineDumpTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        for name in ("app.hex", "nanos_app_ssh.gif"):
+            shutil.copy(APP_DIR / name, self.directory)
+        with open(self.directory / "app.toml", "w") as f:
+            f.write(MULTI_TARGET_MANIFEST)
+        # Icon paths of manifests are relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory)
+        self.manifest = AppManifestToml(str(self.directory / "app.toml"))
+
+    def test_target_ids(self):
+        self.assertEqual(self.manifest.get_target_ids(), ["0x31100003", "0x33100004"])
+
+    def test_target_dump_filename(self):
+        self.assertEqual(
+            target_dump_filename("out/app.apdu", "0x33000004"),
+            "out/app-0x33000004.apdu",
+        )
+
+    def test_all_targets(self):
+        dumps = dump_install_all_targets(
+            self.manifest,
+            "out.apdu",
+            DumpFormat.BINARY,
+            DumpCompression.GZIP,
+            max_workers=2,
+        )
+        self.assertEqual(
+            dumps,
+            {
+                "0x31100003": "out-0x31100003.apdu",
+                "0x33100004": "out-0x33100004.apdu",
+            },
+        )
+        for target_id, filename in dumps.items():
+            apdus = list(read_dump(filename))
+            self.assertEqual(apdus[0][1], LedgerIns.SECUINS)
+            # Same dump as when built alone, in this process
+            dump_install(self.manifest, target_id, "single.apdu", DumpFormat.BINARY)
+            self.assertEqual(list(read_dump("single.apdu")), apdus)
+
+        # CREATE_APP carries the API level on targets supporting it
+        create_apps = [list(read_dump(filename))[0] for filename in dumps.values()]
+        self.assertEqual(len(create_apps[1]), len(create_apps[0]) + 1)
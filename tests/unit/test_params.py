@@ -1,13 +1,19 @@
+import random
 from unittest import TestCase
 
 from construct import StreamError
 
 from ledgerwallet.params import (
+    AppParams,
     Asn1Length,
     Bip32Path,
+    Curve,
     Dependencies,
     Dependency,
     DerivationPath,
+    build_app_params,
+    main,
+    parse_app_params,
 )
 
 
@@ -180,3 +186,112 @@ class DependenciesTest(TestCase):
         self.assertEqual(result[0].version, version)
         self.assertEqual(result[1].name, name2)
         self.assertIsNone(result[1].version)
+
+
+def random_derivation_path(rng: random.Random, num_paths: int) -> dict:
+    paths = []
+    for _ in range(num_paths):
+        elements = [
+            str(rng.randrange(0x80000000)) + rng.choice(["", "'"])
+            for _ in range(rng.randrange(0, 10))
+        ]
+        paths.append("/".join(elements))
+    return {
+        "curve": rng.randrange(0x80),
+        "paths": paths,
+        "paths_slip21": ["PATH{}".format(i) for i in range(rng.randrange(4))],
+    }
+
+
+def normalize(params) -> list:
+    """Convert the output of AppParams.parse to the one of parse_app_params."""
+    result = []
+    for param in params:
+        value = param.value
+        if param.type_ == "BOLOS_TAG_DERIVEPATH":
+            value = {
+                "curve": Curve.build(value.curve)[0],
+                "paths": list(value.paths),
+                "paths_slip21": list(value.paths_slip21),
+            }
+        elif param.type_ == "BOLOS_TAG_DEPENDENCY":
+            value = [{"name": d.name, "version": d.version} for d in value]
+        result.append({"type_": str(param.type_), "value": value})
+    return result
+
+
+class AppParamsTest(TestCase):
+    def check(self, values):
+        blob = AppParams.build(values)
+        self.assertEqual(build_app_params(values), blob)
+        self.assertEqual(parse_app_params(blob), normalize(AppParams.parse(blob)))
+
+    def test_main_vectors(self):
+        main()
+
+    def test_differential(self):
+        rng = random.Random(0)
+        for num_paths in [0, 1, 10, 200]:
+            self.check(
+                [
+                    {"type_": "BOLOS_TAG_APPNAME", "value": "App"},
+                    {"type_": "BOLOS_TAG_APPVERSION", "value": "1.2.3"},
+                    {"type_": "BOLOS_TAG_ICON", "value": rng.randbytes(300)},
+                    {
+                        "type_": "BOLOS_TAG_DERIVEPATH",
+                        "value": random_derivation_path(rng, num_paths),
+                    },
+                    {
+                        "type_": "BOLOS_TAG_DEPENDENCY",
+                        "value": [
+                            {"name": "Ethereum", "version": "1.10.0"},
+                            {"name": "Bitcoin", "version": None},
+                        ],
+                    },
+                ]
+            )
+
+    def test_curve_inputs(self):
+        for curve in [
+            Curve.secp256k1 | Curve.slip21,
+            "secp256k1|slip21",
+            {"secp256k1": True, "ed25519": False, "slip21": True},
+        ]:
+            values = [
+                {
+                    "type_": "BOLOS_TAG_DERIVEPATH",
+                    "value": {"curve": curve, "paths": None, "paths_slip21": None},
+                }
+            ]
+            self.assertEqual(build_app_params(values), AppParams.build(values))
+            self.assertEqual(build_app_params(values), bytes.fromhex("04 01 09"))
+
+    def test_empty_path(self):
+        blob = bytes.fromhex("04 02 00 00")
+        self.assertEqual(
+            parse_app_params(blob),
+            [
+                {
+                    "type_": "BOLOS_TAG_DERIVEPATH",
+                    "value": {"curve": 0, "paths": [""], "paths_slip21": []},
+                }
+            ],
+        )
+
+    def test_long_value(self):
+        values = [{"type_": "BOLOS_TAG_ICON", "value": bytes(0x10000)}]
+        blob = build_app_params(values)
+        self.assertEqual(blob[:5], bytes.fromhex("03 83 010000"))
+        self.assertEqual(blob, AppParams.build(values))
+        self.assertEqual(parse_app_params(blob), values)
+
+    def test_parse_error(self):
+        errors = [
+            bytes.fromhex("01"),  # missing length
+            bytes.fromhex("01 05 41"),  # truncated value
+            bytes.fromhex("05 00"),  # unknown tag
+            bytes.fromhex("04 03 00 01 00"),  # truncated BIP32 path
+        ]
+        for error in errors:
+            with self.assertRaises(ValueError):
+                parse_app_params(error)
@@ -0,0 +1,47 @@
+import os
+import pstats
+import tempfile
+from unittest import TestCase
+
+from ledgerwallet.client import LedgerClient
+from ledgerwallet.metrics import SecureExchange
+from ledgerwallet.profiling import DeviceWaitTimer, HostDeviceProfile
+from ledgerwallet.transport.emulator import EmulatorDevice
+from ledgerwallet.utils import LedgerSecureIns
+
+
+class HostDeviceProfileTest(TestCase):
+    def test_profile(self):
+        client = LedgerClient(EmulatorDevice(target_id=0x31100003, latency=0.01))
+        profile = HostDeviceProfile()
+        client.add_observer(profile.timer)
+        profile.start()
+        for _ in range(5):
+            client.get_version_info()
+        profile.stop()
+
+        self.assertEqual(profile.timer.exchanges, 5)
+        self.assertGreaterEqual(profile.device_wait, 0.05)
+        self.assertGreater(profile.device_wait, profile.host)
+        self.assertAlmostEqual(profile.host + profile.device_wait, profile.wall)
+        summary = profile.summary()
+        self.assertIn("device wait", summary)
+        self.assertIn("5 APDU exchanged", summary)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "ledgerctl.prof")
+            profile.dump(filename)
+            functions = {name for _, _, name in pstats.Stats(filename).stats}
+            self.assertIn("get_version_info", functions)
+
+    def test_secure_exchanges(self):
+        timer = DeviceWaitTimer()
+        # Counted by raw_exchange
+        timer.on_secure_exchange(
+            SecureExchange(LedgerSecureIns.GET_VERSION, 1, 32, 10, 32, 0x9000, 0.5)
+        )
+        # Exchanged by a daemon
+        timer.on_secure_exchange(
+            SecureExchange(LedgerSecureIns.GET_VERSION, 1, None, 10, None, 0x9000, 0.5)
+        )
+        self.assertEqual((timer.exchanges, timer.wait), (1, 0.5))
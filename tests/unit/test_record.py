@@ -0,0 +1,82 @@
+import io
+from unittest import TestCase
+
+from ledgerwallet.client import LedgerClient
+from ledgerwallet.transport.emulator import EmulatorDevice
+from ledgerwallet.transport.record import (
+    DIRECTION_COMMAND,
+    DIRECTION_RESPONSE,
+    RecordingDevice,
+    ReplayDevice,
+    ReplayMismatch,
+    TraceFormatError,
+    TraceWriter,
+    read_exchanges,
+    read_trace,
+)
+
+
+class UnclosableBytesIO(io.BytesIO):
+    def close(self):
+        pass
+
+
+class RecordReplayTest(TestCase):
+    def setUp(self):
+        self.trace = UnclosableBytesIO()
+        device = RecordingDevice(EmulatorDevice(latency=0.01), self.trace)
+        client = LedgerClient(device, lock=False)
+        self.version_info = client.get_version_info()
+        client.raw_exchange(bytes.fromhex("e042000000"))
+        client.close()
+        self.trace.seek(0)
+
+    def test_record(self):
+        records = list(read_trace(self.trace))
+        self.assertEqual(
+            [record.direction for record in records],
+            [DIRECTION_COMMAND, DIRECTION_RESPONSE] * 2,
+        )
+        self.assertEqual(records[0].data, bytes.fromhex("e001000000"))
+        self.assertEqual(records[1].status_word, 0x9000)
+        self.assertEqual(records[3].status_word, 0x6D00)
+        self.assertIsNone(records[2].status_word)
+        timestamps = [record.timestamp for record in records]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertGreaterEqual(records[1].timestamp - records[0].timestamp, 10**7)
+
+    def test_replay(self):
+        client = LedgerClient(ReplayDevice(self.trace, latency_scale=0), lock=False)
+        self.assertEqual(client.get_version_info(), self.version_info)
+        with self.assertRaises(ReplayMismatch):
+            client.raw_exchange(bytes.fromhex("e043000000"))
+        with self.assertRaises(ReplayMismatch):
+            client.get_version_info()
+
+    def test_replay_not_strict(self):
+        device = ReplayDevice(self.trace, latency_scale=0, strict=False)
+        device.exchange(b"")
+        self.assertEqual(device.exchange(b"\xe0\x43\x00\x00\x00"), b"\x6d\x00")
+
+    def test_shared_writer(self):
+        trace = UnclosableBytesIO()
+        writer = TraceWriter(trace)
+        for _ in range(2):
+            device = RecordingDevice(EmulatorDevice(), writer)
+            LedgerClient(device, lock=False).get_version_info()
+            device.close()
+        writer.close()
+        trace.seek(0)
+        self.assertEqual(len(list(read_trace(trace))), 4)
+
+    def test_read_exchanges(self):
+        exchanges = list(read_exchanges(self.trace))
+        self.assertEqual(len(exchanges), 2)
+        self.assertEqual(exchanges[1][0].data[1], 0x42)
+
+    def test_invalid_trace(self):
+        with self.assertRaises(TraceFormatError):
+            list(read_trace(io.BytesIO(b"not a trace")))
+        truncated = io.BytesIO(self.trace.getvalue()[:-1])
+        with self.assertRaises(TraceFormatError):
+            list(read_trace(truncated))
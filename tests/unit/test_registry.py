@@ -0,0 +1,100 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from ledgerwallet.capabilities import DeviceCapabilities
+from ledgerwallet.registry import DeviceNotFoundException, DeviceRegistry
+from ledgerwallet.transport import HidDevice, TcpDevice
+from ledgerwallet.utils import VersionInfo
+
+VERSION_INFO = VersionInfo.build(
+    dict(target_id=0x33100004, se_version="1.1.0", flags=0, mcu_version="4.0")
+)
+
+
+class DeviceRegistryTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = str(Path(self.tmp_dir.name) / "devices.json")
+        self.registry = DeviceRegistry(self.filename)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_register_and_reload(self):
+        device = HidDevice(b"1-1:1.0", "0001", "Nano S Plus")
+        self.registry.register("dev", device, VERSION_INFO)
+
+        registry = DeviceRegistry(self.filename)
+        entry = registry.get("dev")
+        self.assertEqual(entry.transport, "hid")
+        self.assertEqual(entry.path, "1-1:1.0")
+        self.assertEqual(entry.serial_number, "0001")
+        self.assertEqual(entry.target_id, 0x33100004)
+        self.assertEqual(entry.get_version_info().se_version, "1.1.0")
+
+    def test_register_capabilities(self):
+        capabilities = DeviceCapabilities.from_version_info(
+            VersionInfo.parse(VERSION_INFO), 0.002
+        )
+        self.registry.register(
+            "dev", TcpDevice("127.0.0.1:9999"), VERSION_INFO, capabilities
+        )
+        entry = DeviceRegistry(self.filename).get("dev")
+        self.assertEqual(entry.capabilities.to_dict(), capabilities.to_dict())
+
+    def test_register_tcp(self):
+        self.registry.register("speculos", TcpDevice("127.0.0.1:9999"))
+        device = DeviceRegistry(self.filename).find_device("speculos")
+        self.assertIsInstance(device, TcpDevice)
+        self.assertEqual(device.get_name(), "tcp:127.0.0.1:9999")
+
+    def test_find_device_same_path(self):
+        self.registry.register("dev", HidDevice(b"1-1:1.0", "0001", "Nano S Plus"))
+        connected = [
+            HidDevice(b"1-2:1.0", "0001", "Nano X"),
+            HidDevice(b"1-1:1.0", "0001", "Nano S Plus"),
+        ]
+        with patch.object(HidDevice, "enumerate_devices", return_value=connected):
+            device = self.registry.find_device("dev")
+        self.assertIs(device, connected[1])
+
+    def test_find_device_moved(self):
+        self.registry.register(
+            "dev", HidDevice(b"1-1:1.0", "0001", "Nano S Plus"), VERSION_INFO
+        )
+        connected = [HidDevice(b"1-4:1.0", "0001", "Nano S Plus")]
+        with patch.object(HidDevice, "enumerate_devices", return_value=connected):
+            device = self.registry.find_device("dev")
+        self.assertIs(device, connected[0])
+        self.assertTrue(self.registry.is_relocated("dev", device))
+        # The new path is only persisted once the device has been identified
+        self.assertEqual(DeviceRegistry(self.filename).get("dev").path, "1-1:1.0")
+        with self.assertRaises(DeviceNotFoundException):
+            self.registry.confirm_device("dev", device, 0x31100004)
+        self.assertEqual(DeviceRegistry(self.filename).get("dev").path, "1-1:1.0")
+        self.registry.confirm_device("dev", device, 0x33100004)
+        self.assertEqual(DeviceRegistry(self.filename).get("dev").path, "1-4:1.0")
+
+    def test_find_device_errors(self):
+        self.registry.register("dev", HidDevice(b"1-1:1.0", "0001", "Nano S Plus"))
+        with self.assertRaises(DeviceNotFoundException):
+            self.registry.find_device("unknown")
+        with patch.object(HidDevice, "enumerate_devices", return_value=[]):
+            with self.assertRaises(DeviceNotFoundException):
+                self.registry.find_device("dev")
+        connected = [
+            HidDevice(b"1-2:1.0", "0001", "Nano S Plus"),
+            HidDevice(b"1-3:1.0", "0001", "Nano S Plus"),
+        ]
+        with patch.object(HidDevice, "enumerate_devices", return_value=connected):
+            with self.assertRaises(DeviceNotFoundException):
+                self.registry.find_device("dev")
+
+    def test_remove(self):
+        self.registry.register("dev", TcpDevice("127.0.0.1:9999"))
+        self.registry.remove("dev")
+        self.assertNotIn("dev", DeviceRegistry(self.filename))
+        with self.assertRaises(DeviceNotFoundException):
+            self.registry.remove("dev")
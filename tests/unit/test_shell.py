@@ -0,0 +1,72 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from ledgerwallet.ledgerctl import ShellSession, cli, run_shell_command
+from ledgerwallet.transport.emulator import EmulatorDevice
+from ledgerwallet.transport.record import read_trace
+
+APP_DIR = Path(__file__).parent.parent / "app"
+
+
+class ShellSessionTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.trace = os.path.join(tmp_dir.name, "shell.trace")
+        metrics = os.path.join(tmp_dir.name, "shell.prom")
+        self.ctx = cli.make_context(
+            "ledgerctl",
+            ["--no-daemon", "--record", self.trace, "--metrics-file", metrics, "shell"],
+        )
+        self.devices = patch("ledgerwallet.ledgerctl.enumerate_devices")
+        self.enumerate_devices = self.devices.start()
+        self.addCleanup(self.devices.stop)
+        self.enumerate_devices.side_effect = lambda: [
+            EmulatorDevice(target_id=0x31100003)
+        ]
+
+    def test_reconnect(self):
+        with self.ctx:
+            self.ctx.invoke(cli.callback, **self.ctx.params)
+            session = ShellSession(self.ctx, reconnect_timeout=5.0)
+            client = session.get_client()
+            client.get_version_info()
+            session.disconnect(reconnect=True)
+            # The device is away for a while after 'run'
+            self.enumerate_devices.side_effect = [
+                [],
+                [EmulatorDevice(target_id=0x31100003)],
+            ]
+            with patch("time.sleep"):
+                reopened = session.get_client()
+            self.assertIsNot(reopened, client)
+            reopened.get_version_info()
+            session.disconnect()
+            # Both connections are observed
+            metrics = self.ctx.meta["metrics"]
+            self.assertEqual(metrics.latency["GET_VERSION"].count, 2)
+
+        # Both connections are recorded to the same trace
+        self.assertEqual(len(list(read_trace(self.trace))), 4)
+
+    def test_install_force(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(APP_DIR)
+        # The device keeps its apps across connections
+        device = EmulatorDevice(target_id=0x31100003)
+        self.enumerate_devices.side_effect = lambda: [device]
+        with self.ctx:
+            self.ctx.invoke(cli.callback, **self.ctx.params)
+            session = ShellSession(self.ctx, reconnect_timeout=None)
+            self.assertTrue(run_shell_command(self.ctx, session, "install app.json"))
+            client = session.get_client()
+            self.assertTrue(
+                run_shell_command(self.ctx, session, "install --force app.json")
+            )
+            # The connection has been reopened for the session
+            self.assertIsNot(session.client, client)
+            self.assertTrue(run_shell_command(self.ctx, session, "list"))
+            session.disconnect()
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+# Modules only needed by some commands, which must not slow down the others
+HEAVY_MODULES = [
+    "PIL",
+    "requests",
+    "hid",
+    "intelhex",
+    "google.protobuf",
+    "cryptography",
+    "tabulate",
+]
+
+SCRIPT = """
+import sys
+from ledgerwallet import ledgerctl
+if {args!r}:
+    ledgerctl.cli({args!r}, standalone_mode=False)
+print("loaded:" + ",".join(m for m in {modules!r} if m in sys.modules))
+"""
+
+
+def loaded_modules(args) -> list:
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(args=args, modules=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    loaded = output.strip().splitlines()[-1][len("loaded:") :]
+    return [m for m in loaded.split(",") if m]
+
+
+class StartupTest(TestCase):
+    def test_import(self):
+        self.assertEqual(loaded_modules([]), [])
+
+    def test_help(self):
+        self.assertEqual(loaded_modules(["--help"]), [])
+        self.assertEqual(loaded_modules(["install", "--help"]), [])
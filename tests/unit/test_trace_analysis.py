@@ -0,0 +1,113 @@
+import io
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.trace_analysis import (
+    Distribution,
+    analyze_exchanges,
+    analyze_file,
+    read_apdu_log,
+)
+from ledgerwallet.transport.record import (
+    DIRECTION_COMMAND,
+    DIRECTION_RESPONSE,
+    TraceWriter,
+    read_exchanges,
+)
+
+GET_VERSION = bytes.fromhex("e001000000")
+SECURE = bytes.fromhex("e000000020") + bytes(32)
+OK = bytes.fromhex("9000")
+
+
+def write_trace(out, exchanges):
+    writer = TraceWriter(out)
+    for start, end, command, response in exchanges:
+        writer.write(DIRECTION_COMMAND, command, writer.start + start)
+        writer.write(DIRECTION_RESPONSE, response, writer.start + end)
+    writer.close()
+
+
+class TraceAnalysisTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.filename = str(Path(self.directory.name) / "session.trace")
+        write_trace(
+            self.filename,
+            [
+                (0, 1000, GET_VERSION, b"\x42" * 20 + OK),
+                (1500, 4500, SECURE, OK),
+                (5000, 6000, SECURE, bytes(16) + OK),
+                (8000, 18000, SECURE, b"\x6a\x80"),
+            ],
+        )
+
+    def test_analyze_trace(self):
+        analysis = analyze_file(self.filename, slowest=2)
+        self.assertTrue(analysis.timed)
+        self.assertEqual(analysis.count, 4)
+        self.assertEqual(analysis.duration, 18000)
+        self.assertEqual(analysis.device_time, 15000)
+        self.assertEqual(
+            (analysis.gaps.count, analysis.gaps.min, analysis.gaps.max), (3, 500, 2000)
+        )
+        self.assertEqual(analysis.gaps.percentile(50), 500)
+        self.assertEqual(analysis.host_time, 3000)
+
+        secure = analysis.by_ins[0]
+        self.assertEqual(secure.count, 3)
+        self.assertEqual(secure.errors, 1)
+        self.assertEqual(secure.latency_percentile(50), 3000)
+        self.assertEqual(secure.latency_percentile(100), 10000)
+        self.assertEqual(secure.command_bytes, 3 * len(SECURE))
+        self.assertEqual(analysis.by_ins[1].response_bytes, 22)
+
+        self.assertEqual(analysis.secure_count, 3)
+        self.assertEqual(analysis.scp_overhead, 4 * 15)
+        self.assertEqual(
+            [exchange.number for exchange in analysis.slowest_exchanges()], [3, 1]
+        )
+
+    def test_analyze_log(self):
+        log = io.StringIO(
+            "=> e001000000\n<= 42424242"
+            + OK.hex()
+            + "\nunrelated line\nINFO => e0d8000000\n<= 6d00\n"
+        )
+        analysis = analyze_exchanges(read_apdu_log(log), timed=False)
+        self.assertFalse(analysis.timed)
+        self.assertEqual(analysis.count, 2)
+        self.assertEqual(analysis.by_ins[0xD8].errors, 1)
+        self.assertIsNone(analysis.by_ins[1].latency_percentile(50))
+        self.assertEqual(analysis.slowest_exchanges(), [])
+
+    def test_log_and_trace_match(self):
+        log = Path(self.directory.name) / "session.log"
+        with open(log, "w") as f:
+            for command, response in read_exchanges(self.filename):
+                f.write(
+                    "=> {}\n<= {}\n".format(command.data.hex(), response.data.hex())
+                )
+        from_log = analyze_file(str(log))
+        from_trace = analyze_file(self.filename)
+        self.assertEqual(from_log.total_bytes, from_trace.total_bytes)
+        self.assertEqual(from_log.scp_overhead, from_trace.scp_overhead)
+
+
+class DistributionTest(TestCase):
+    def test_bounded(self):
+        distribution = Distribution(size=100)
+        for value in range(10000):
+            distribution.add(value)
+        self.assertEqual(len(distribution._samples), 100)
+        self.assertEqual(distribution.count, 10000)
+        self.assertEqual(distribution.total, sum(range(10000)))
+        self.assertEqual(distribution.percentile(0), 0)
+        self.assertEqual(distribution.percentile(100), 9999)
+        # Estimated from a uniform sample
+        self.assertAlmostEqual(distribution.percentile(50), 5000, delta=1500)
+
+    def test_empty(self):
+        self.assertIsNone(Distribution().percentile(50))
@@ -0,0 +1,180 @@
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase
+
+from ledgerwallet.client import LedgerClient
+from ledgerwallet.hsmscript import HsmScript
+from ledgerwallet.hsmserver import HsmServer
+from ledgerwallet.manifest_json import AppManifestJson
+from ledgerwallet.proto.LedgerHSMServer_pb2 import Response
+from ledgerwallet.tracing import (
+    NOOP_SPAN,
+    TraceFormat,
+    Tracer,
+    chrome_trace,
+    otlp_trace,
+    set_tracer,
+    span,
+    traced,
+    write_trace,
+)
+from ledgerwallet.transport.emulator import EmulatorDevice
+
+APP_DIR = Path(__file__).parent.parent / "app"
+
+
+class FakeResponse(object):
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def post(self, url, data):
+        return FakeResponse(self.responses.pop(0).SerializeToString())
+
+
+class TracingTest(TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+        set_tracer(self.tracer)
+        self.addCleanup(set_tracer, None)
+
+    def spans(self):
+        return {s.name: s for s in self.tracer.spans}
+
+    def test_disabled(self):
+        set_tracer(None)
+
+        @traced("function")
+        def function():
+            return 42
+
+        self.assertIs(span("operation"), NOOP_SPAN)
+        with span("operation") as operation:
+            operation.set_attribute("key", "value")
+        self.assertEqual(function(), 42)
+        self.assertEqual(self.tracer.spans, [])
+
+    def test_nesting(self):
+        @traced("child")
+        def child():
+            raise ValueError("invalid")
+
+        with span("parent", key="value"):
+            with self.assertRaises(ValueError):
+                child()
+            sibling = span("sibling")
+            sibling.end()
+
+        spans = self.spans()
+        self.assertIsNone(spans["parent"].parent_id)
+        self.assertEqual(spans["parent"].attributes, {"key": "value"})
+        self.assertEqual(spans["child"].parent_id, spans["parent"].span_id)
+        self.assertEqual(spans["child"].error, "ValueError: invalid")
+        self.assertEqual(spans["sibling"].parent_id, spans["parent"].span_id)
+        self.assertGreaterEqual(spans["parent"].duration, spans["child"].duration)
+
+    def test_threads(self):
+        with span("main"):
+            thread = threading.Thread(target=lambda: span("thread").end())
+            thread.start()
+            thread.join()
+        spans = self.spans()
+        self.assertIsNone(spans["thread"].parent_id)
+        self.assertNotEqual(spans["thread"].thread_id, spans["main"].thread_id)
+
+    def test_install(self):
+        # Icon paths of manifests are relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(APP_DIR)
+        manifest = AppManifestJson(str(APP_DIR / "app.json"))
+        client = LedgerClient(EmulatorDevice(target_id=0x31100003))
+        client.install_app(manifest)
+
+        spans = self.spans()
+        install_id = spans["install_app"].span_id
+        for name in (
+            "install_app.prepare",
+            "install_app.create_app",
+            "install_app.segment",
+            "install_app.commit",
+        ):
+            self.assertEqual(spans[name].parent_id, install_id)
+        # The secure channel is opened by CREATE_APP
+        self.assertEqual(
+            spans["authenticate"].parent_id, spans["install_app.create_app"].span_id
+        )
+        for name in ("reset", "nonce", "device_certificates", "mutual_authenticate"):
+            self.assertEqual(
+                spans["authenticate." + name].parent_id, spans["authenticate"].span_id
+            )
+        self.assertEqual(spans["install_app.segment"].attributes, {"offset": 0})
+
+    def test_hsm_query(self):
+        server = HsmServer(HsmScript("listApps", {}), url="http://localhost")
+        server.session = FakeSession(
+            [Response(id="1", response=b"\x01\x02"), Response(exception="denied")]
+        )
+        self.assertEqual(server.query(), b"\x01\x02")
+        with self.assertRaises(Exception):
+            server.query()
+
+        ok, error = self.tracer.spans
+        self.assertEqual(ok.name, "HsmServer.query")
+        self.assertEqual(ok.attributes["script"], "listApps")
+        self.assertIsNone(ok.error)
+        self.assertEqual(error.error, "Exception: HSM Error: denied")
+
+
+class TraceExportTest(TestCase):
+    def setUp(self):
+        self.tracer = Tracer("test")
+        with self.tracer.start_span("parent", apps=2):
+            with self.tracer.start_span("child", app="app", ratio=0.5, ok=True):
+                pass
+
+    def test_chrome(self):
+        events = chrome_trace(self.tracer)["traceEvents"]
+        self.assertEqual([e["name"] for e in events], ["parent", "child"])
+        parent, child = events
+        self.assertEqual(parent["ph"], "X")
+        self.assertEqual(parent["args"], {"apps": 2})
+        self.assertGreaterEqual(child["ts"], parent["ts"])
+        self.assertLessEqual(child["ts"] + child["dur"], parent["ts"] + parent["dur"])
+
+    def test_otlp(self):
+        resource_spans = otlp_trace(self.tracer)["resourceSpans"][0]
+        self.assertEqual(
+            resource_spans["resource"]["attributes"],
+            [{"key": "service.name", "value": {"stringValue": "test"}}],
+        )
+        parent, child = resource_spans["scopeSpans"][0]["spans"]
+        self.assertEqual(len(parent["traceId"]), 32)
+        self.assertEqual(parent["traceId"], child["traceId"])
+        self.assertNotIn("parentSpanId", parent)
+        self.assertEqual(child["parentSpanId"], parent["spanId"])
+        self.assertLessEqual(
+            int(parent["startTimeUnixNano"]), int(child["startTimeUnixNano"])
+        )
+        attributes = {a["key"]: a["value"] for a in child["attributes"]}
+        self.assertEqual(attributes["app"], {"stringValue": "app"})
+        self.assertEqual(attributes["ratio"], {"doubleValue": 0.5})
+        self.assertEqual(attributes["ok"], {"boolValue": True})
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for trace_format in TraceFormat:
+                filename = os.path.join(tmp_dir, trace_format.value + ".json")
+                write_trace(self.tracer, filename, trace_format)
+                with open(filename) as f:
+                    trace = json.load(f)
+                if trace_format == TraceFormat.CHROME:
+                    self.assertIn("traceEvents", trace)
+                else:
+                    self.assertIn("resourceSpans", trace)
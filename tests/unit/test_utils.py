@@ -1,5 +1,7 @@
 from unittest import TestCase
 
+from construct import Int8ub, Struct, Switch
+
 from ledgerwallet import utils
 
 
@@ -74,3 +76,47 @@ class UtilsModuleTest(TestCase):
         self.assertIsNone(parsed.language)
         self.assertIsNone(parsed._recover_state_len)
         self.assertIsNone(parsed.recover_state)
+
+    def test_parse_version_info(self):
+        payloads = [
+            utils.VersionInfo.build(
+                dict(target_id=0x31100004, se_version="0", flags=0, mcu_version="0")
+            ),
+            utils.VersionInfo.build(
+                dict(
+                    target_id=0x33000004,
+                    se_version="1.2.3",
+                    flags=dict(is_onboarded=True, pin_validated=True),
+                    mcu_version="2.3.4",
+                    mcu_bl_version="5.6.7",
+                    hw_version="\x01",
+                    language="\x00",
+                    _recover_state_len=0x01,
+                    recover_state=0x02,
+                )
+            ),
+        ]
+        for payload in payloads:
+            reference = utils.VersionInfo.parse(payload)
+            parsed = utils.parse_version_info(payload)
+            for name in utils.DeviceVersionInfo.__slots__:
+                self.assertEqual(getattr(parsed, name), reference[name])
+            self.assertEqual(str(parsed.target_id), str(reference.target_id))
+            self.assertEqual(parsed, utils.parse_version_info(payload))
+        self.assertTrue(parsed.flags.pin_validated)
+
+    def test_compiled(self):
+        struct = Struct(value=Int8ub)
+        self.assertIs(utils.compiled(struct), utils.compiled(struct))
+        self.assertEqual(utils.compiled(struct).parse(b"\x2a").value, 42)
+        # Switch on a lambda cannot be compiled, the construct itself is used
+        struct = Struct(value=Switch(lambda ctx: 1, {1: Int8ub}))
+        self.assertIs(utils.compiled(struct), struct)
+
+    def test_percentile(self):
+        self.assertEqual(utils.percentile([5], 99), 5)
+        self.assertEqual(utils.percentile([1, 2, 3, 4], 0), 1)
+        self.assertEqual(utils.percentile([1, 2, 3, 4], 50), 2.5)
+        self.assertEqual(utils.percentile([1, 2, 3, 4], 100), 4)
+        with self.assertRaises(ValueError):
+            utils.percentile([], 50)